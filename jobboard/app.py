@@ -2,10 +2,34 @@
 # app.py - основной файл проекта JobBoard с Flask-WTF, CSRF и сбросом пароля
 
 import os
+import re
+import json
+import base64
+import zlib
+import io
+import csv
+import queue
 import sqlite3
-from datetime import timedelta
+import threading
+import time
+import bisect
+import functools
+import hashlib
+import hmac
+import atexit
+import mimetypes
+import multiprocessing
+import click
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from markupsafe import Markup
+from datetime import datetime, timedelta, timezone
 from flask import (Flask, g, render_template, request, redirect,
-                   url_for, session, flash, jsonify, abort, current_app)
+                   url_for, session, flash, jsonify, abort, current_app, Response,
+                   has_app_context, before_render_template, template_rendered, send_from_directory)
+from werkzeug.utils import safe_join
+from werkzeug.http import is_resource_modified
 from werkzeug.security import generate_password_hash, check_password_hash
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 
@@ -13,135 +37,952 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, TextAreaField, SubmitField
 from wtforms.validators import DataRequired, Length, Email, Optional, EqualTo
 
+import archive
+import assets
+import mailer
+import passwords
+import schema
+import similar
+import suggest
+from schema import save_job_tags
+
 BASE_DIR = os.path.dirname(__file__)
-DB_PATH = os.path.join(BASE_DIR, 'jobs.db')
+DB_PATH = os.environ.get('JOBS_DB', os.path.join(BASE_DIR, 'jobs.db'))
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET', 'change-this-secret')
 app.permanent_session_lifetime = timedelta(days=30)
 app.config['DATABASE'] = DB_PATH
+app.config['PAGE_SIZE'] = 20       # вакансий на странице по умолчанию
+app.config['MAX_PAGE_SIZE'] = 100  # верхняя граница для ?limit=
+app.config['STREAM_BATCH_SIZE'] = 500  # строк за один fetchmany при потоковой выгрузке
+# Пул соединений SQLite (на процесс-воркер) и их настройки
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 8))
+app.config['DB_POOL_TIMEOUT'] = 10.0              # сек. ожидания свободного соединения
+app.config['DB_BUSY_TIMEOUT'] = 5000              # мс, PRAGMA busy_timeout
+app.config['DB_CACHE_SIZE'] = -32000              # PRAGMA cache_size (<0 — в KiB), ~32 МБ
+app.config['DB_MMAP_SIZE'] = 256 * 1024 * 1024    # PRAGMA mmap_size
+app.config['DB_STATEMENT_CACHE'] = 256            # подготовленных выражений на соединение
+# Потоковые выгрузки (фид, CSV, профиль) читают через отдельный маленький пул
+# соединений только для чтения: медленный клиент не занимает пул страниц
+app.config['STREAM_POOL_SIZE'] = int(os.environ.get('STREAM_POOL_SIZE', 4))
+app.config['STREAM_POOL_TIMEOUT'] = 1.0           # сек.; свободного нет — 503 до начала ответа
+# Групповой коммит: все записи идут через один поток-писатель (DB_WRITER=1)
+app.config['DB_WRITER'] = os.environ.get('DB_WRITER', '0') == '1'
+app.config['DB_WRITER_BATCH'] = 128               # операций в одной транзакции, не больше
+app.config['DB_WRITER_DELAY'] = 0.002             # сек. ожидания попутных операций перед коммитом
+app.config['DB_WRITER_QUEUE'] = 4096              # операций в очереди, дальше — 503
+app.config['DB_WRITER_TIMEOUT'] = 30.0            # сек. ожидания подтверждения
+app.config['DB_WRITER_SYNCHRONOUS'] = 'FULL'      # fsync один на пачку — можно позволить FULL
+app.config['DB_MIGRATE_ON_STARTUP'] = os.environ.get('DB_MIGRATE_ON_STARTUP', '1') != '0'  # 0 — только `flask db-upgrade`
+app.config['USER_CACHE_TTL'] = 30                 # сек. жизни записи в кэше пользователей; 0 — выключен
+app.config['USER_CACHE_SIZE'] = 4096
+app.config['FRAGMENT_CACHE_SIZE'] = 2048          # отрендеренных фрагментов страниц
+app.config['FRAGMENT_CACHE_TTL'] = 10             # сек.; ключи версионные, TTL только освобождает память
+# Хэширование паролей: метод/стоимость werkzeug и пул процессов для него
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config['HASH_WORKERS'] = int(os.environ.get('HASH_WORKERS', os.cpu_count() or 1))  # 0 — считать в потоке запроса
+app.config['HASH_QUEUE_SIZE'] = 64                # задач в работе + в очереди, дальше — 503
+app.config['HASH_TIMEOUT'] = 10.0                 # сек. ожидания результата
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600    # сек.; для хэшированных файлов из static/dist/
+# Почта: письма ставятся в таблицу outbox, доставляют фоновые потоки (mailer.py).
+# Без MAIL_SERVER письма печатаются в консоль сервера.
+app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER')
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 25))
+app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
+app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
+app.config['MAIL_STARTTLS'] = os.environ.get('MAIL_STARTTLS', '0') == '1'
+app.config['MAIL_SENDER'] = os.environ.get('MAIL_SENDER', 'JobBoard <noreply@jobboard.local>')
+app.config['MAIL_WORKERS'] = int(os.environ.get('MAIL_WORKERS', 2))  # 0 — доставляет только `flask send-mail`
+app.config['MAIL_BATCH'] = 20                     # писем за один заход потока
+app.config['MAIL_MAX_ATTEMPTS'] = 8               # после этого письмо — 'failed'
+app.config['MAIL_RETRY_BASE'] = 30                # сек. до первой повторной попытки, дальше x2
+app.config['MAIL_RETRY_MAX'] = 3600               # сек., потолок задержки
+app.config['MAIL_POLL_INTERVAL'] = 5              # сек.; письма из других процессов находятся опросом
+app.config['MAIL_TIMEOUT'] = 30                   # сек. на SMTP-операцию
+app.config['CHANGE_LOG_RETENTION_DAYS'] = 30     # записи об удалениях в job_changes; старше — курсор 410
+# Похожие вакансии: TF-IDF индекс (similar.py), собирается `flask build-similar`
+app.config['SIMILAR_INDEX_DIR'] = os.environ.get('SIMILAR_INDEX_DIR', os.path.join(BASE_DIR, 'similar_index'))
+app.config['SIMILAR_K'] = 5                       # похожих вакансий на странице
+app.config['SIMILAR_MAX_DELTA'] = 20000           # изменений после сборки, которые догоняем в памяти
+app.config['SIMILAR_CACHE_SIZE'] = 4096           # списков похожих (по job_id и версии индекса)
+app.config['SIMILAR_REFRESH_INTERVAL'] = 5.0      # сек.; как часто индекс похожих догоняет журнал изменений
+app.config['SUGGEST_REFRESH_INTERVAL'] = 5.0     # сек.; как часто индекс подсказок читает журнал изменений
+app.config['SUGGEST_LIMIT'] = 8                   # подсказок по умолчанию (?limit= до 20)
+app.config['ARCHIVE_DATABASE'] = os.environ.get('ARCHIVE_DB')  # None — рядом с DATABASE, '<имя>-archive.db'
+app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))  # дней без правок и откликов
+app.config['ARCHIVE_MAX_AGE_DAYS'] = int(os.environ.get('ARCHIVE_MAX_AGE_DAYS', 0))  # старше — в архив в любом случае; 0 — выключено
+app.config['ARCHIVE_BATCH'] = 500                 # вакансий за одну пару транзакций переноса
+app.config['SLOW_QUERY_MS'] = 100                 # запросы дольше — в лог вместе с EXPLAIN QUERY PLAN
+# /metrics: с METRICS_TOKEN — по заголовку 'Authorization: Bearer <токен>',
+# без заголовка — только с адресов METRICS_ALLOW (за прокси это адрес прокси)
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+app.config['METRICS_ALLOW'] = os.environ.get('METRICS_ALLOW', '127.0.0.1,::1').split(',')
 # Flask-WTF CSRF uses app.secret_key by default
 
 # serializer for tokens
 serializer = URLSafeTimedSerializer(app.secret_key)
 
 # ---------- Database helpers ----------
+def open_connection(path, readonly=False):
+    # Соединение открывается один раз и живёт в пуле: WAL позволяет читателям
+    # не ждать писателя, кэш страниц и подготовленных выражений переживают запрос.
+    conn = sqlite3.connect(path, timeout=app.config['DB_BUSY_TIMEOUT'] / 1000,
+                           check_same_thread=False,
+                           cached_statements=app.config['DB_STATEMENT_CACHE'])
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute(f"PRAGMA busy_timeout = {int(app.config['DB_BUSY_TIMEOUT'])}")
+    conn.execute(f"PRAGMA cache_size = {int(app.config['DB_CACHE_SIZE'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(app.config['DB_MMAP_SIZE'])}")
+    if readonly:
+        conn.execute('PRAGMA query_only = ON')
+    return conn
+
+class PoolTimeout(Exception):
+    pass
+
+class ConnectionPool:
+    """Ограниченный пул соединений одного процесса.
+
+    Свободные соединения хранятся в LIFO-очереди: поток получает самое «тёплое»
+    соединение. Перед выдачей соединение проверяется, после возврата —
+    откатывается незавершённая транзакция.
+    """
+
+    def __init__(self, path, size, readonly=False):
+        self.path = path
+        self.size = size
+        self.readonly = readonly
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f'no free database connection in {timeout}s')
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return open_connection(self.path, self.readonly)
+                if self._healthy(conn):
+                    return conn
+                conn.close()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        try:
+            if not discard and conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            discard = True
+        if discard:
+            conn.close()
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    @staticmethod
+    def _healthy(conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    path = app.config['DATABASE']
+    # пул не наследуется через fork и пересоздаётся при смене пути к БД
+    if _pool is None or _pool.path != path or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.path != path or _pool.pid != os.getpid():
+                _pool = ConnectionPool(path, app.config['DB_POOL_SIZE'])
+    return _pool
+
+_stream_pool = None
+
+def get_stream_pool():
+    global _stream_pool
+    path = app.config['DATABASE']
+    if _stream_pool is None or _stream_pool.path != path or _stream_pool.pid != os.getpid():
+        with _pool_lock:
+            if _stream_pool is None or _stream_pool.path != path or _stream_pool.pid != os.getpid():
+                _stream_pool = ConnectionPool(path, app.config['STREAM_POOL_SIZE'], readonly=True)
+    return _stream_pool
+
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(app.config['DATABASE'])
-        db.row_factory = sqlite3.Row
+        try:
+            db = g._database = get_pool().acquire(app.config['DB_POOL_TIMEOUT'])
+        except PoolTimeout:
+            abort(503)
     return db
 
 @app.teardown_appcontext
 def close_connection(exception):
-    db = getattr(g, '_database', None)
+    db = g.pop('_database', None)
     if db is not None:
-        db.close()
+        get_pool().release(db, discard=isinstance(exception, sqlite3.DatabaseError))
 
 def init_db():
-    # Создаём БД и минимальные данные только если файла ещё нет
-    if not os.path.exists(app.config['DATABASE']):
-        conn = sqlite3.connect(app.config['DATABASE'])
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                is_employer INTEGER DEFAULT 0,
-                email TEXT,
-                avatar TEXT,
-                about TEXT
-            )
-        ''')
-        c.execute('''
-            CREATE TABLE jobs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                author_id INTEGER,
-                title TEXT NOT NULL,
-                description TEXT NOT NULL,
-                tags TEXT,
-                salary TEXT,
-                created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (author_id) REFERENCES users(id)
-            )
-        ''')
-        c.execute('''
-            CREATE TABLE responses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER,
-                user_id INTEGER,
-                text TEXT,
-                contact TEXT,
-                created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (job_id) REFERENCES jobs(id),
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        conn.commit()
-        # Добавим тестовые записи для удобства
+    # Схема описана в schema.py и доводится до последней версии миграций при
+    # старте (DB_MIGRATE_ON_STARTUP) или командой `flask --app app db-upgrade`.
+    # Демо-данные добавляем только в новую БД: базовые таблицы -> данные ->
+    # остальные миграции (они же проиндексируют демо-вакансии).
+    conn = open_connection(app.config['DATABASE'])
+    try:
+        fresh = schema.schema_version(conn) == 0 and not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone()
+        if not (fresh or app.config['DB_MIGRATE_ON_STARTUP']):
+            pending = schema.pending_migrations(conn)
+            if pending:
+                app.logger.warning('database schema is behind (%d pending migrations): run `flask --app app db-upgrade`',
+                                   len(pending))
+            return
+        if fresh:
+            schema.migrate(conn, target=1, log=app.logger.info)
+            c = conn.cursor()
+            # Добавим тестовые записи для удобства
+            try:
+                pwd_hash = generate_password_hash('password123', method=app.config['PASSWORD_HASH_METHOD'])
+                c.execute("INSERT INTO users (username, password, is_employer, email, about) VALUES (?, ?, ?, ?, ?)",
+                          ('employer1', pwd_hash, 1, 'employer@example.com', 'Тестовый работодатель'))
+                employer_id = c.lastrowid
+                c.execute("INSERT INTO users (username, password, is_employer, email, about) VALUES (?, ?, ?, ?, ?)",
+                          ('worker1', pwd_hash, 0, 'worker@example.com', 'Тестовый соискатель'))
+                worker_id = c.lastrowid
+                c.execute("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
+                          (employer_id, 'Бариста (подработка)', 'Требуется бариста на неполный рабочий день. Обучение бесплатно, гибкий график.', 'кафе,бариста', 'от 170 ₽/ч'))
+                job1_id = c.lastrowid
+                c.execute("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
+                          (employer_id, 'Курьер (самокат)', 'Курьерская доставка по району. Оплата за доставку + бонусы.', 'курьер,доставка', 'по договорённости'))
+                job2_id = c.lastrowid
+                c.execute("INSERT INTO responses (job_id, user_id, text, contact) VALUES (?, ?, ?, ?)",
+                          (job1_id, worker_id, 'Есть опыт, могу по вечерам.', 'worker@example.com'))
+                # Дополнительные демо-вакансии для более полного наполнения БД
+                c.execute("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
+                          (employer_id, 'Front-end разработчик (junior)',
+                           'Ищем начинающего front-end разработчика. Знание HTML/CSS/JS; React/Vue приветствуются.',
+                           'frontend,react,javascript', '50 000–80 000 ₽'))
+                job3_id = c.lastrowid
+                c.execute("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
+                          (employer_id, 'Python-разработчик (удалённо)',
+                           'Разработка бэкенда на Flask/Django. Опыт 1-3 года. Тестирование и CI — плюс.',
+                           'python,backend,flask', 'от 70 000 ₽'))
+                job4_id = c.lastrowid
+                c.execute("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
+                          (employer_id, 'Контент-менеджер',
+                           'Наполнение сайта, работа с текстом и изображениями, базовая верстка.',
+                           'контент,редактор,маркетинг', '30 000–45 000 ₽'))
+                job5_id = c.lastrowid
+                # Пример отклика на одну из новых вакансий
+                c.execute("INSERT INTO responses (job_id, user_id, text, contact) VALUES (?, ?, ?, ?)",
+                          (job3_id, worker_id, 'Есть базовые знания React, готов обучаться и работать неполный день.', 'worker@example.com'))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+        # новая БД маленькая — ей можно всё; у существующей тяжёлые миграции
+        # (schema.OFFLINE_MIGRATIONS) откладываются до `flask db-upgrade`,
+        # остальные применяются
+        schema.migrate(conn, log=app.logger.info, offline=fresh)
+        pending = schema.pending_migrations(conn)
+        if pending:
+            app.logger.warning('schema v%d (%s) rebuilds the database file and is not applied on startup: '
+                               'run `flask --app app db-upgrade` in a maintenance window', pending[0][0], pending[0][1])
+    finally:
+        conn.close()
+
+@app.cli.command('db-upgrade')
+@click.option('--to', 'target', type=int, default=None, help='migrate up to this schema version')
+def db_upgrade_command(target):
+    """Применить недостающие миграции схемы (schema.py)."""
+    conn = open_connection(app.config['DATABASE'])
+    try:
+        before = schema.schema_version(conn)
+        pending = schema.pending_migrations(conn, target)
+        after = schema.migrate(conn, target)
+    finally:
+        conn.close()
+    if not pending:
+        print(f'Schema is up to date (v{after})')
+    else:
+        print(f'Schema upgraded: v{before} -> v{after} ({len(pending)} migrations)')
+
+# ---------- Full-text search ----------
+# Сам индекс jobs_fts и его триггеры описаны в schema.py.
+
+# веса bm25 по колонкам: совпадение в заголовке важнее, чем в описании
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0)
+
+def fts_query(q):
+    # Превращаем пользовательский ввод в безопасный MATCH-запрос: каждое слово —
+    # строка в кавычках с префиксным поиском, слова объединяются через AND.
+    words = re.findall(r"[\w+#]+", q.casefold().replace('ё', 'е'))
+    if not words:
+        return None
+    return ' '.join(f'"{w}"*' for w in words)
+
+@app.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Пересобрать полнотекстовый индекс вакансий (jobs_fts)."""
+    conn = open_connection(app.config['DATABASE'])
+    try:
+        with conn:
+            schema.rebuild_search_index(conn)
+        total = conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+    finally:
+        conn.close()
+    print(f'Search index rebuilt: {total} jobs')
+
+# Процессы пула хэширования (spawn, PasswordHasher) при запуске `python app.py`
+# заново импортируют главный модуль под именем __mp_main__ — им нужна только
+# функция хэширования, не БД.
+if __name__ != '__mp_main__':
+    init_db()
+
+# ---------- Instrumentation ----------
+# Все обращения к БД идут через query_db/execute_db, поэтому статистику по SQL
+# собираем там: время, число строк и шаблон выражения (параметры — всегда «?»).
+# На уровне запроса — заголовок Server-Timing, в целом по процессу —
+# гистограммы для Prometheus на /metrics.
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя ячейка — +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+class Metrics:
+    """Счётчики и гистограммы процесса в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._help = {}
+        self._buckets = {}
+
+    def describe(self, name, kind, text, buckets=SECONDS_BUCKETS):
+        self._help[name] = (kind, text)
+        self._buckets[name] = buckets
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            hist = self._histograms.get((name, labels))
+            if hist is None:
+                hist = self._histograms[(name, labels)] = Histogram(self._buckets.get(name, SECONDS_BUCKETS))
+            hist.observe(value)
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + value
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self._gauges[(name, labels)] = value
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        esc = lambda v: str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        return '{' + ','.join(f'{k}="{esc(v)}"' for k, v in pairs) + '}'
+
+    def render(self):
+        with self._lock:
+            histograms = {k: (h.buckets, list(h.counts), h.sum) for k, h in self._histograms.items()}
+            counters = dict(self._counters)
+            counters.update(self._gauges)
+        lines = []
+        for name in sorted({n for n, _ in histograms} | {n for n, _ in counters}):
+            kind, text = self._help.get(name, ('untyped', ''))
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (n, labels), (buckets, counts, total) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{self._labels(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{self._labels(labels)} {total:.6f}')
+                lines.append(f'{name}_count{self._labels(labels)} {cumulative}')
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f'{name}{self._labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+metrics.describe('jobboard_sql_duration_seconds', 'histogram', 'SQL statement execution time by statement template.')
+metrics.describe('jobboard_sql_rows_total', 'counter', 'Rows returned (SELECT) or affected (writes) by statement template.')
+metrics.describe('jobboard_slow_queries_total', 'counter', 'Statements slower than SLOW_QUERY_MS.')
+metrics.describe('jobboard_request_duration_seconds', 'histogram', 'Request handling time by route.')
+metrics.describe('jobboard_request_db_seconds', 'histogram', 'Time spent in SQL per request by route.')
+metrics.describe('jobboard_request_queries', 'histogram', 'SQL statements per request by route.', COUNT_BUCKETS)
+metrics.describe('jobboard_requests_total', 'counter', 'Requests by route, method and status.')
+metrics.describe('jobboard_not_modified_total', 'counter', '304 responses served from validators, by route.')
+metrics.describe('jobboard_writer_batch_size', 'histogram', 'Write operations per group commit.', COUNT_BUCKETS)
+metrics.describe('jobboard_writer_commit_seconds', 'histogram', 'Group commit duration, including execution of its operations.')
+metrics.describe('jobboard_similar_query_seconds', 'histogram', 'Similar-jobs index query time (cache misses).')
+metrics.describe('jobboard_mail_deliveries_total', 'counter', 'Outbox delivery attempts by result (sent, retry, failed).')
+metrics.describe('jobboard_mail_batch_size', 'histogram', 'Messages per mail worker batch.', COUNT_BUCKETS)
+metrics.describe('jobboard_mail_batch_seconds', 'histogram', 'Time to deliver one mail worker batch over SMTP.')
+metrics.describe('jobboard_mail_queue_depth', 'gauge', 'Outbox messages by status (pending, sending).')
+metrics.describe('jobboard_mail_oldest_due_seconds', 'gauge', 'Age of the oldest message that is due but not yet claimed.')
+metrics.describe('jobboard_archive_reads_total', 'counter', 'Lookups that fell through to the archive database, by page.')
+
+@functools.lru_cache(maxsize=1024)
+def statement_template(query):
+    # схлопываем пробелы/переводы строк, чтобы одинаковые выражения давали одну метку
+    return ' '.join(query.split())
+
+def record_query(conn, query, args, elapsed, rows):
+    template = statement_template(query)
+    if has_app_context():
+        g._sql_count = g.get('_sql_count', 0) + 1
+        g._sql_time = g.get('_sql_time', 0.0) + elapsed
+    labels = (('statement', template),)
+    metrics.observe('jobboard_sql_duration_seconds', labels, elapsed)
+    metrics.inc('jobboard_sql_rows_total', labels, max(rows, 0))
+    if elapsed * 1000 >= app.config['SLOW_QUERY_MS']:
+        metrics.inc('jobboard_slow_queries_total', labels)
         try:
-            from werkzeug.security import generate_password_hash
-            pwd_hash = generate_password_hash('password123')
-            c.execute("INSERT INTO users (username, password, is_employer, email, about) VALUES (?, ?, ?, ?, ?)",
-                      ('employer1', pwd_hash, 1, 'employer@example.com', 'Тестовый работодатель'))
-            employer_id = c.lastrowid
-            c.execute("INSERT INTO users (username, password, is_employer, email, about) VALUES (?, ?, ?, ?, ?)",
-                      ('worker1', pwd_hash, 0, 'worker@example.com', 'Тестовый соискатель'))
-            worker_id = c.lastrowid
-            c.execute("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
-                      (employer_id, 'Бариста (подработка)', 'Требуется бариста на неполный рабочий день. Обучение бесплатно, гибкий график.', 'кафе,бариста', 'от 170 ₽/ч'))
-            job1_id = c.lastrowid
-            c.execute("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
-                      (employer_id, 'Курьер (самокат)', 'Курьерская доставка по району. Оплата за доставку + бонусы.', 'курьер,доставка', 'по договорённости'))
-            job2_id = c.lastrowid
-            c.execute("INSERT INTO responses (job_id, user_id, text, contact) VALUES (?, ?, ?, ?)",
-                      (job1_id, worker_id, 'Есть опыт, могу по вечерам.', 'worker@example.com'))
-            # Дополнительные демо-вакансии для более полного наполнения БД
-            c.execute("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
-                      (employer_id, 'Front-end разработчик (junior)',
-                       'Ищем начинающего front-end разработчика. Знание HTML/CSS/JS; React/Vue приветствуются.',
-                       'frontend,react,javascript', '50 000–80 000 ₽'))
-            job3_id = c.lastrowid
-            c.execute("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
-                      (employer_id, 'Python-разработчик (удалённо)',
-                       'Разработка бэкенда на Flask/Django. Опыт 1-3 года. Тестирование и CI — плюс.',
-                       'python,backend,flask', 'от 70 000 ₽'))
-            job4_id = c.lastrowid
-            c.execute("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
-                      (employer_id, 'Контент-менеджер',
-                       'Наполнение сайта, работа с текстом и изображениями, базовая верстка.',
-                       'контент,редактор,маркетинг', '30 000–45 000 ₽'))
-            job5_id = c.lastrowid
-            # Пример отклика на одну из новых вакансий
-            c.execute("INSERT INTO responses (job_id, user_id, text, contact) VALUES (?, ?, ?, ?)",
-                      (job3_id, worker_id, 'Есть базовые знания React, готов обучаться и работать неполный день.', 'worker@example.com'))
-            conn.commit()
-        except Exception:
-            conn.rollback()
-        finally:
-            conn.close()
+            plan = '; '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, args))
+        except sqlite3.Error as exc:
+            plan = f'<explain failed: {exc}>'
+        # параметры не логируем: среди них бывают хэши паролей и контакты
+        app.logger.warning('Slow query %.1f ms, %d rows: %s | plan: %s',
+                           elapsed * 1000, rows, template, plan)
+
+@before_render_template.connect_via(app)
+def _render_started(sender, template, context, **extra):
+    g.setdefault('_render_stack', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def _render_finished(sender, template, context, **extra):
+    stack = g.get('_render_stack')
+    if stack:
+        g._render_time = g.get('_render_time', 0.0) + time.perf_counter() - stack.pop()
+
+@app.before_request
+def start_request_timer():
+    g._request_started = time.perf_counter()
 
-init_db()
+@app.after_request
+def add_request_metrics(response):
+    started = g.get('_request_started')
+    if started is None:
+        return response
+    total = time.perf_counter() - started
+    queries = g.get('_sql_count', 0)
+    db_time = g.get('_sql_time', 0.0)
+    render_time = g.get('_render_time', 0.0)
+    response.headers['Server-Timing'] = (
+        f'db;dur={db_time * 1000:.2f};desc="{queries} queries", '
+        f'render;dur={render_time * 1000:.2f}, app;dur={total * 1000:.2f}'
+    )
+    route = (('route', request.url_rule.rule if request.url_rule else 'unmatched'),)
+    metrics.observe('jobboard_request_duration_seconds', route, total)
+    metrics.observe('jobboard_request_db_seconds', route, db_time)
+    metrics.observe('jobboard_request_queries', route, queries)
+    metrics.inc('jobboard_requests_total', route + (('method', request.method), ('status', response.status_code)))
+    return response
 
 # ---------- Utility DB functions ----------
 def query_db(query, args=(), one=False):
-    cur = get_db().execute(query, args)
+    conn = get_db()
+    started = time.perf_counter()
+    cur = conn.execute(query, args)
     rv = cur.fetchall()
     cur.close()
+    record_query(conn, query, args, time.perf_counter() - started, len(rv))
     return (rv[0] if rv else None) if one else rv
 
+def iter_query_batches(query, args=(), size=None):
+    """Итератор пачек строк (fetchmany по size): результат не материализуется целиком.
+
+    Читает через своё соединение из пула потоковых чтений (get_stream_pool):
+    тело ответа дочитывается, пока клиент его качает, и держать всё это время
+    соединение пула страниц нельзя. Соединение берётся сразу при вызове —
+    если свободного нет, 503 до начала ответа — и возвращается, когда
+    итератор исчерпан или закрыт.
+    """
+    batches = _read_batches(query, args, size or app.config['STREAM_BATCH_SIZE'])
+    try:
+        next(batches)  # взять соединение сейчас, а не на первой пачке
+    except PoolTimeout:
+        abort(503)
+    return batches
+
+def _read_batches(query, args, size):
+    pool = get_stream_pool()
+    conn = pool.acquire(app.config['STREAM_POOL_TIMEOUT'])
+    elapsed = 0.0
+    rows_total = 0
+    cur = None
+    try:
+        yield None
+        started = time.perf_counter()
+        cur = conn.execute(query, args)
+        while True:
+            rows = cur.fetchmany(size)
+            elapsed += time.perf_counter() - started
+            if not rows:
+                break
+            rows_total += len(rows)
+            yield rows
+            started = time.perf_counter()
+    finally:
+        if cur is not None:
+            cur.close()
+            # в метрики — только время в SQLite, без времени потребителя между пачками
+            record_query(conn, query, args, elapsed, rows_total)
+        pool.release(conn)
+
+def iter_query(query, args=(), size=None):
+    """Как query_db, но генератор строк, читающий курсор пачками.
+
+    В отличие от iter_query_batches соединение берётся на первой строке:
+    шаблон дочитывает такие генераторы по очереди, и страница держит не
+    больше одного потокового соединения за раз.
+    """
+    for rows in iter_query_batches(query, args, size):
+        yield from rows
+
 def execute_db(query, args=()):
-    conn = get_db()
-    cur = conn.execute(query, args)
-    conn.commit()
-    return cur
+    def run(conn):
+        started = time.perf_counter()
+        cur = conn.execute(query, args)
+        record_query(conn, query, args, time.perf_counter() - started, cur.rowcount)
+        return cur
+    return transaction(run)
+
+def transaction(fn):
+    """Выполнить fn(conn) одной транзакцией и вернуть её результат.
+
+    С DB_WRITER fn уходит в фоновый поток-писатель и коммитится вместе с
+    соседними операциями; иначе выполняется на соединении запроса. Исключение
+    из fn откатывает только её изменения и пробрасывается вызывающему.
+    fn не должна обращаться к g/request: она может выполняться в другом потоке.
+    """
+    if not app.config['DB_WRITER']:
+        conn = get_db()
+        with conn:
+            return fn(conn)
+    started = time.perf_counter()
+    try:
+        return get_writer().submit(fn, app.config['DB_WRITER_TIMEOUT'])
+    finally:
+        if has_app_context():  # CLI и фоновые потоки вызывают без контекста
+            g._sql_count = g.get('_sql_count', 0) + 1
+            g._sql_time = g.get('_sql_time', 0.0) + time.perf_counter() - started
+
+# ---------- Group commit ----------
+# SQLite допускает одного писателя, и каждый COMMIT — это fsync. Вместо того
+# чтобы каждый запрос сам брал блокировку записи и коммитил, операции ставятся
+# в очередь одному потоку-писателю; он выполняет накопившиеся операции в одной
+# транзакции (каждую — в своём SAVEPOINT) и коммитит их разом. Запрос получает
+# ответ только после COMMIT, так что подтверждение остаётся честным.
+class WriterBusy(Exception):
+    pass
+
+class GroupCommitWriter:
+    def __init__(self, path, batch_size, delay, queue_size):
+        self.path = path
+        self.batch_size = batch_size
+        self.delay = delay
+        self.pid = os.getpid()
+        self._queue = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, timeout=None):
+        future = Future()
+        try:
+            self._queue.put((future, fn), timeout=timeout)
+        except queue.Full:
+            raise WriterBusy('write queue is full') from None
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # операция может ещё закоммититься — вызывающий получает 503 и не знает исхода
+            raise WriterBusy(f'write not committed in {timeout}s') from None
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        conn = open_connection(self.path)
+        # fsync на каждом групповом коммите: подтверждённая запись переживёт сбой питания
+        conn.execute(f"PRAGMA synchronous = {app.config['DB_WRITER_SYNCHRONOUS']}")
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                stop = self._fill(batch)
+                self._commit(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _fill(self, batch):
+        # добираем то, что накопилось за время предыдущего коммита, и ждём
+        # ещё не дольше delay; None — сигнал остановки после этой пачки
+        deadline = time.monotonic() + self.delay
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return False
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    def _commit(self, conn, batch):
+        started = time.perf_counter()
+        done = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for future, fn in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT op')
+                try:
+                    result = fn(conn)
+                except Exception as exc:
+                    conn.execute('ROLLBACK TO op')
+                    conn.execute('RELEASE op')
+                    future.set_exception(exc)
+                    continue
+                conn.execute('RELEASE op')
+                done.append((future, result))
+            conn.commit()
+        except sqlite3.Error as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            for future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for future, result in done:
+            future.set_result(result)
+        metrics.observe('jobboard_writer_batch_size', (), len(batch))
+        metrics.observe('jobboard_writer_commit_seconds', (), time.perf_counter() - started)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    path = app.config['DATABASE']
+    if _writer is None or _writer.path != path or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.path != path or _writer.pid != os.getpid():
+                if _writer is not None and _writer.pid == os.getpid():
+                    _writer.close()
+                _writer = GroupCommitWriter(path, app.config['DB_WRITER_BATCH'],
+                                            app.config['DB_WRITER_DELAY'], app.config['DB_WRITER_QUEUE'])
+    return _writer
+
+@atexit.register
+def _close_writer():
+    # дописываем то, что уже в очереди: вызывающие ждут подтверждения
+    if _writer is not None and _writer.pid == os.getpid():
+        _writer.close()
+
+@app.errorhandler(WriterBusy)
+def writer_busy(exc):
+    return ('Сервис временно перегружен, повторите попытку через несколько секунд.',
+            503, {'Retry-After': '5', 'Content-Type': 'text/plain; charset=utf-8'})
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш с ограниченным размером и временем жизни записей."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# Межзапросный кэш строк users по id. Записи живут USER_CACHE_TTL секунд и
+# сбрасываются явно при изменении профиля или пароля (invalidate_user).
+user_cache = TTLCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+
+def load_user(user_id):
+    use_cache = app.config['USER_CACHE_TTL'] > 0
+    user = user_cache.get(user_id) if use_cache else None
+    if user is None:
+        user = query_db('SELECT * FROM users WHERE id = ?', (user_id,), one=True)
+        if user is not None and use_cache:
+            user_cache.set(user_id, user)
+    return user
+
+def invalidate_user(user_id):
+    user_cache.pop(user_id)
+    g.pop('_current_user', None)
 
 def current_user():
-    if 'user_id' in session:
-        return query_db('SELECT * FROM users WHERE id = ?', (session['user_id'],), one=True)
-    return None
+    # В пределах запроса пользователь загружается один раз и хранится в g
+    if 'user_id' not in session:
+        return None
+    user_id = session['user_id']
+    memo = g.get('_current_user')
+    if memo is None or memo[0] != user_id:
+        memo = g._current_user = (user_id, load_user(user_id))
+    return memo[1]
+
+# ---------- Pagination ----------
+# Курсор — непрозрачная для клиента строка (base64 от JSON). Для ленты это
+# ('n' | 'p', created, id): направление и ключ крайней строки страницы, поэтому
+# любая страница — это range-scan по idx_jobs_created_id независимо от глубины.
+# Результаты поиска упорядочены по bm25, для них курсор хранит смещение ('o', offset).
+def encode_cursor(*values):
+    raw = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token, kinds):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        abort(400)
+    if not isinstance(values, list) or not values or values[0] not in kinds:
+        abort(400)
+    return values
+
+def page_limit():
+    try:
+        limit = int(request.args.get('limit', app.config['PAGE_SIZE']))
+    except ValueError:
+        abort(400)
+    return max(1, min(limit, app.config['MAX_PAGE_SIZE']))
+
+# Ключ сортировки: пары (SQL-выражение, поле строки выдачи), по убыванию
+NEWEST_FIRST = (('jobs.created', 'created'), ('jobs.id', 'id'))
+
+def keyset_page(select, where='', args=(), limit=20, cursor=None, key=NEWEST_FIRST):
+    """Страница ленты по ключу key (по умолчанию — новые сверху, (jobs.created, jobs.id)).
+
+    Возвращает (rows, next_cursor, prev_cursor).
+    """
+    token = decode_cursor(cursor, ('n', 'p'))
+    if token and len(token) != len(key) + 1:
+        abort(400)
+    backwards = bool(token) and token[0] == 'p'
+    conds, params = ([where], list(args)) if where else ([], [])
+    columns = ', '.join(expr for expr, _ in key)
+    if token:
+        conds.append('(%s) %s (%s)' % (columns, '>' if backwards else '<', ', '.join('?' * len(key))))
+        params += token[1:]
+    order = 'ASC' if backwards else 'DESC'
+    sql = select + (' WHERE ' + ' AND '.join(conds) if conds else '') + \
+        ' ORDER BY ' + ', '.join(f'{expr} {order}' for expr, _ in key) + ' LIMIT ?'
+    rows = query_db(sql, (*params, limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+    first, last = rows[0], rows[-1]
+    more_after = has_more if not backwards else True
+    more_before = has_more if backwards else bool(token)
+    next_cursor = encode_cursor('n', *(last[field] for _, field in key)) if more_after else None
+    prev_cursor = encode_cursor('p', *(first[field] for _, field in key)) if more_before else None
+    return rows, next_cursor, prev_cursor
+
+def offset_page(sql, args=(), limit=20, cursor=None):
+    """Страница для выдачи, упорядоченной не по (created, id) — например, по рангу поиска."""
+    token = decode_cursor(cursor, ('o',))
+    offset = token[1] if token and len(token) == 2 and isinstance(token[1], int) else 0
+    rows = query_db(sql + ' LIMIT ? OFFSET ?', (*args, limit + 1, offset))
+    next_cursor = encode_cursor('o', offset + limit) if len(rows) > limit else None
+    prev_cursor = encode_cursor('o', max(offset - limit, 0)) if offset > 0 else None
+    return rows[:limit], next_cursor, prev_cursor
+
+# ---------- Salary filters ----------
+# Вилка хранится как salary_min/salary_max (одна из границ может быть NULL),
+# сравниваем по «верхней» и «нижней» границе — на обе есть индексы
+# (salary_currency, salary_period, COALESCE(...)) из schema.py. Выражения
+# должны совпадать с индексными буквально, иначе SQLite индекс не возьмёт.
+SALARY_TOP = 'COALESCE(jobs.salary_max, jobs.salary_min)'
+SALARY_BOTTOM = 'COALESCE(jobs.salary_min, jobs.salary_max)'
+HIGHEST_PAID = ((SALARY_TOP, 'salary_top'), ('jobs.id', 'id'))
+SALARY_CURRENCY_CODES = [code for code, _ in schema.SALARY_CURRENCIES]
+SALARY_PERIOD_CODES = [code for code, _ in schema.SALARY_PERIODS]
+
+def salary_filter():
+    """?salary_from=&salary_to=&currency=&period=&sort=salary -> кортеж фильтра или None.
+
+    Сравнивать суммы можно только в одной валюте и за один период, поэтому
+    любой фильтр (и сортировка по зарплате) ограничивает выдачу ими:
+    по умолчанию — рубли в месяц.
+    """
+    sort = request.args.get('sort') or 'new'
+    if sort not in ('new', 'salary'):
+        abort(400)
+    try:
+        low = int(request.args['salary_from']) if request.args.get('salary_from') else None
+        high = int(request.args['salary_to']) if request.args.get('salary_to') else None
+    except ValueError:
+        abort(400)
+    if low is None and high is None and sort != 'salary':
+        return None
+    currency = request.args.get('currency', 'RUB').upper()
+    period = request.args.get('period', 'month')
+    if currency not in SALARY_CURRENCY_CODES or period not in SALARY_PERIOD_CODES:
+        abort(400)
+    return low, high, currency, period, sort == 'salary'
+
+def salary_where(salary):
+    low, high, currency, period, _ = salary
+    conds, args = ['jobs.salary_currency = ?', 'jobs.salary_period = ?'], [currency, period]
+    if low is not None:
+        conds.append(f'{SALARY_TOP} >= ?')
+        args.append(low)
+    if high is not None:
+        conds.append(f'{SALARY_BOTTOM} <= ?')
+        args.append(high)
+    return ' AND '.join(conds), args
+
+def salary_query_args(salary):
+    # обратно в параметры URL — для ссылок пагинации
+    if not salary:
+        return {}
+    low, high, currency, period, by_salary = salary
+    return {'salary_from': low, 'salary_to': high, 'currency': currency, 'period': period,
+            'sort': 'salary' if by_salary else None}
+
+# ---------- Password hashing ----------
+# scrypt/pbkdf2 — десятки-сотни миллисекунд чистого CPU. Считаем их в отдельных
+# процессах, чтобы поток запроса (и GIL) не блокировался. Очередь ограничена:
+# если задач больше HASH_QUEUE_SIZE, запрос сразу получает 503 (HashingBusy).
+class HashingBusy(Exception):
+    pass
+
+class PasswordHasher:
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    # spawn: дочерние процессы не наследуют соединения и потоки родителя;
+                    # главный модуль они импортируют как __mp_main__ — init_db() там пропускается
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=app.config['HASH_WORKERS'],
+                        mp_context=multiprocessing.get_context('spawn'))
+                    self._slots = threading.BoundedSemaphore(app.config['HASH_QUEUE_SIZE'])
+                    self._pid = os.getpid()
+        return self._executor
+
+    def run(self, fn, *args):
+        if app.config['HASH_WORKERS'] <= 0:
+            return fn(*args)
+        executor = self._ensure_executor()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            slots.release()
+            self._executor = None  # пересоздадим при следующем вызове
+            raise HashingBusy()
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda f: slots.release())
+        try:
+            return future.result(timeout=app.config['HASH_TIMEOUT'])
+        except FutureTimeout:
+            raise HashingBusy()
+        except BrokenProcessPool:
+            self._executor = None
+            raise HashingBusy()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+hasher = PasswordHasher()
+
+def hash_password(password):
+    return hasher.run(generate_password_hash, password, app.config['PASSWORD_HASH_METHOD'])
+
+def verify_password(pwhash, password):
+    return hasher.run(check_password_hash, pwhash, password)
+
+def password_needs_rehash(pwhash):
+    # 'scrypt:32768:8:1$salt$hash' — сравниваем метод и параметры с текущими
+    # настройками, дополненными значениями werkzeug по умолчанию (passwords.py)
+    return passwords.needs_rehash(pwhash, app.config['PASSWORD_HASH_METHOD'])
+
+@app.errorhandler(HashingBusy)
+def hashing_busy(exc):
+    return ('Сервис временно перегружен, повторите попытку через несколько секунд.',
+            503, {'Retry-After': '5', 'Content-Type': 'text/plain; charset=utf-8'})
 
 # ---------- Forms ----------
 class RegistrationForm(FlaskForm):
@@ -181,33 +1022,275 @@ def confirm_token(token: str, expiration=3600):
     return email
 
 def send_reset_email(email: str, token: str):
-    # Для разработки: печатаем ссылку в консоль; позже можно подключить SMTP
     reset_url = url_for('reset_password', token=token, _external=True)
-    print(f'[Password reset] To: {email}\nReset link: {reset_url}')
-    # Также показываем пользователю краткое уведомление
-    flash('Письмо со ссылкой для сброса пароля отправлено (проверьте консоль сервера)', 'info')
+    enqueue_mail(email, 'Сброс пароля — JobBoard',
+                 f'Чтобы задать новый пароль, перейдите по ссылке (действует 1 час):\n{reset_url}\n\n'
+                 'Если вы не запрашивали сброс, просто проигнорируйте это письмо.')
+    if app.config['MAIL_SERVER']:
+        flash('Письмо со ссылкой для сброса пароля отправлено', 'info')
+    else:
+        flash('Письмо со ссылкой для сброса пароля отправлено (проверьте консоль сервера)', 'info')
+
+# ---------- Mail outbox ----------
+# Запрос только вставляет письмо в outbox (это часть его транзакции, в том
+# числе через групповой коммит) и будит поток доставки. SMTP-соединения,
+# пачки и повторы с задержкой — в mailer.MailPool, вне потока запроса.
+def enqueue_mail(recipient, subject, body):
+    outbox_id = transaction(lambda conn: mailer.enqueue(conn, recipient, subject, body))
+    if app.config['MAIL_WORKERS']:
+        get_mailer().wake()
+    return outbox_id
+
+def make_transport():
+    if not app.config['MAIL_SERVER']:
+        return mailer.ConsoleTransport()
+    return mailer.SMTPTransport(app.config['MAIL_SERVER'], app.config['MAIL_PORT'],
+                                app.config['MAIL_USERNAME'], app.config['MAIL_PASSWORD'],
+                                app.config['MAIL_STARTTLS'], app.config['MAIL_TIMEOUT'])
+
+def make_mail_pool(workers):
+    path = app.config['DATABASE']
+    pool = mailer.MailPool(lambda: open_connection(path), make_transport, metrics, app.config['MAIL_SENDER'],
+                           workers=workers, batch_size=app.config['MAIL_BATCH'],
+                           max_attempts=app.config['MAIL_MAX_ATTEMPTS'],
+                           retry_base=app.config['MAIL_RETRY_BASE'], retry_max=app.config['MAIL_RETRY_MAX'],
+                           poll_interval=app.config['MAIL_POLL_INTERVAL'])
+    pool.path = path
+    pool.pid = os.getpid()
+    return pool
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+def get_mailer():
+    global _mailer
+    path = app.config['DATABASE']
+    if _mailer is None or _mailer.path != path or _mailer.pid != os.getpid():
+        with _mailer_lock:
+            if _mailer is None or _mailer.path != path or _mailer.pid != os.getpid():
+                if _mailer is not None and _mailer.pid == os.getpid():
+                    _mailer.close()
+                _mailer = make_mail_pool(app.config['MAIL_WORKERS'])
+    return _mailer
+
+@app.before_request
+def start_mailer():
+    # письма, оставшиеся в outbox с прошлого запуска, уходят без нового enqueue
+    if app.config['MAIL_WORKERS']:
+        get_mailer()
+
+@atexit.register
+def _close_mailer():
+    # недоставленное остаётся в outbox до следующего запуска
+    if _mailer is not None and _mailer.pid == os.getpid():
+        _mailer.close(timeout=5)
+
+@app.cli.command('send-mail')
+@click.option('--once', is_flag=True, help='deliver what is due now and exit')
+@click.option('--workers', type=int, default=None, help='delivery threads (default MAIL_WORKERS or 1)')
+def send_mail_command(once, workers):
+    """Доставлять письма из outbox (отдельным процессом, при MAIL_WORKERS=0)."""
+    if once:
+        sent = make_mail_pool(0).drain()
+        print(f'Outbox drained: {sent} messages processed')
+        return
+    pool = make_mail_pool(workers or app.config['MAIL_WORKERS'] or 1)
+    print('Delivering mail from outbox, Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.close()
+
+def update_mail_gauges():
+    try:
+        depth, oldest = mailer.queue_depth(get_db())
+    except sqlite3.OperationalError:
+        return  # outbox ещё не создана: миграции не применены
+    for status in ('pending', 'sending'):
+        metrics.set('jobboard_mail_queue_depth', (('status', status),), depth.get(status, 0))
+    metrics.set('jobboard_mail_oldest_due_seconds', (), round(oldest, 3))
 
 # ---------- Context processor ----------
 @app.context_processor
 def inject_user():
     return {'user': current_user()}
 
-# ---------- Routes ----------
-@app.route('/')
-def index():
-    q = request.args.get('q', '').strip()
+# ---------- Static assets ----------
+# static/dist/ собирается scripts/build_assets.py: файлы с хэшем содержимого в
+# имени и сжатые копии рядом. url_for('static', filename='style.css') сам
+# подставляет хэшированное имя из манифеста (если сборки нет — исходное).
+_asset_manifest = {'mtime': None, 'files': {}}
+
+def asset_manifest():
+    # в проде манифест читается один раз (новая сборка = перезапуск),
+    # в debug — перечитывается, когда файл меняется
+    path = os.path.join(app.static_folder, assets.DIST_DIR, assets.MANIFEST)
+    if _asset_manifest['mtime'] is None or app.debug:
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = 0
+        if mtime != _asset_manifest['mtime']:
+            _asset_manifest.update(mtime=mtime, files=assets.load_manifest(app.static_folder))
+    return _asset_manifest['files']
+
+@app.url_defaults
+def hashed_static_url(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = asset_manifest().get(values['filename'], values['filename'])
+
+@app.template_global()
+def asset_url(filename):
+    """URL файла из static/; для ещё не завендоренной зависимости — её адрес на CDN."""
+    cdn = assets.VENDOR_ASSETS.get(filename)
+    if cdn and filename not in asset_manifest() and \
+            not os.path.exists(os.path.join(app.static_folder, *filename.split('/'))):
+        return cdn
+    return url_for('static', filename=filename)
+
+def static_file(filename):
+    # Замена стандартного static-view: отдаём заранее сжатый .br/.gz, если
+    # клиент его принимает, а хэшированные файлы — с «вечным» кэшем.
+    kwargs = {}
+    if filename.startswith(assets.DIST_DIR + '/'):
+        kwargs['max_age'] = app.config['ASSET_MAX_AGE']
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding] and \
+                os.path.isfile(safe_join(app.static_folder, filename + suffix) or ''):
+            response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype, **kwargs)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(app.static_folder, filename, mimetype=mimetype, **kwargs)
+    response.vary.add('Accept-Encoding')
+    if kwargs:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = static_file
+
+# ---------- Fragment cache ----------
+# Отрендеренные фрагменты страниц (список карточек, тело вакансии) кэшируются
+# с ключом по тем же версиям из БД, что и ETag (listing_versions() для ленты,
+# jobs.rev и версия профилей для вакансии): их двигают триггеры, поэтому
+# запись из любого воркера или соединения сразу меняет ключ, и под новым ETag
+# никогда не окажется старое тело. Навбар и всё, что зависит от пользователя,
+# не кэшируется.
+fragment_cache = TTLCache(app.config['FRAGMENT_CACHE_SIZE'], app.config['FRAGMENT_CACHE_TTL'])
+
+# ---------- Conditional requests ----------
+# Ленту, страницу вакансии и фид опрашивают боты, и почти всегда данные не
+# менялись. Валидаторы (ETag/Last-Modified) берутся из версий, которые
+# поддерживают триггеры (schema.VERSION_SCHEMA), одним запросом по первичному
+# ключу — и если клиент прислал совпадающие, отвечаем 304 до тяжёлых JOIN и
+# рендеринга. В ETag входят зритель (навбар, кнопки) и версия кода/шаблонов.
+def _code_version():
+    # после деплоя с новыми шаблонами старые ETag не должны давать 304
+    folder = os.path.join(app.root_path, app.template_folder)
+    paths = [__file__] + [os.path.join(folder, name) for name in os.listdir(folder)]
+    return int(max(os.stat(p).st_mtime for p in paths))
+
+CODE_VERSION = _code_version()
+
+def not_modified(parts, last_modified, personal=True):
+    """Вернуть готовый 304, если у клиента актуальная версия, иначе None.
+
+    Валидаторы запоминаются в g и ставятся на полный ответ в add_validators().
+    """
+    if personal and session.get('_flashes'):
+        return None  # флэш-сообщение надо показать, а значит — отрендерить страницу
+    viewer = session.get('user_id') if personal else None
+    raw = repr((CODE_VERSION, viewer, *parts)).encode()
+    etag = hashlib.sha1(raw).hexdigest()[:24]
+    if isinstance(last_modified, str):
+        last_modified = datetime.strptime(last_modified, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    # страница зависит от сессии (шапка, зритель) — только личный кэш; и решает
+    # только ETag: зрителя и версию индекса похожих Last-Modified не видит, и
+    # If-Modified-Since без If-None-Match отдал бы устаревший 304
+    g._validators = (etag, last_modified, personal)
+    if is_resource_modified(request.environ, etag=etag, last_modified=None if personal else last_modified):
+        return None
+    metrics.inc('jobboard_not_modified_total', (('route', request.url_rule.rule),))
+    response = Response(status=304)
+    _set_validators(response, *g._validators)
+    return response
+
+def _set_validators(response, etag, last_modified, private):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # кэшировать можно, но перед использованием — всегда спрашивать сервер
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+
+@app.after_request
+def add_validators(response):
+    validators = g.pop('_validators', None)
+    if validators and response.status_code == 200:
+        _set_validators(response, *validators)
+    return response
+
+def listing_versions():
+    # версия ленты и профилей (имя автора в карточках) — для /, /api/jobs
+    rows = query_db("SELECT name, version, updated FROM data_versions WHERE name IN ('jobs', 'users')")
+    return tuple((r['name'], r['version']) for r in rows), max(r['updated'] for r in rows)
+
+def _load_job_cards(q, tag, limit, cursor, salary=None):
+    salary_sql, salary_args = salary_where(salary) if salary else ('', [])
+    by_salary = bool(salary) and salary[4]
+    columns = f"SELECT jobs.*, users.username as author, {SALARY_TOP} AS salary_top"
     if q:
-        like = f'%{q}%'
-        jobs = query_db(
-            "SELECT jobs.*, users.username as author FROM jobs LEFT JOIN users ON jobs.author_id = users.id "
-            "WHERE jobs.title LIKE ? OR jobs.description LIKE ? ORDER BY jobs.created DESC",
-            (like, like)
+        match = fts_query(q)
+        tag_filter = " AND jobs.id IN (SELECT job_id FROM job_tags WHERE tag = ?)" if tag else ""
+        salary_cond = " AND " + salary_sql if salary else ""
+        order = f"{SALARY_TOP} DESC, jobs.id DESC" if by_salary else "bm25(jobs_fts, ?, ?, ?), jobs.created DESC"
+        jobs, next_cursor, prev_cursor = offset_page(
+            columns + " FROM jobs_fts "
+            "JOIN jobs ON jobs.id = jobs_fts.rowid LEFT JOIN users ON jobs.author_id = users.id "
+            "WHERE jobs_fts MATCH ?" + tag_filter + salary_cond + " ORDER BY " + order,
+            (match, *([tag] if tag else []), *salary_args, *(() if by_salary else SEARCH_WEIGHTS)), limit, cursor
+        ) if match else ([], None, None)
+    elif tag:
+        jobs, next_cursor, prev_cursor = keyset_page(
+            columns + " FROM job_tags "
+            "JOIN jobs ON jobs.id = job_tags.job_id LEFT JOIN users ON jobs.author_id = users.id",
+            " AND ".join(["job_tags.tag = ?"] + ([salary_sql] if salary else [])), (tag, *salary_args),
+            limit, cursor, HIGHEST_PAID if by_salary else NEWEST_FIRST
         )
     else:
-        jobs = query_db(
-            "SELECT jobs.*, users.username as author FROM jobs LEFT JOIN users ON jobs.author_id = users.id ORDER BY jobs.created DESC"
+        jobs, next_cursor, prev_cursor = keyset_page(
+            columns + " FROM jobs LEFT JOIN users ON jobs.author_id = users.id",
+            salary_sql, salary_args, limit, cursor, HIGHEST_PAID if by_salary else NEWEST_FIRST
         )
-    return render_template('index.html', jobs=jobs, search=q)
+    page_args = {'q': q or None, 'tag': tag or None, **salary_query_args(salary)}
+    cards = render_template('_job_cards.html', jobs=jobs, page_args=page_args,
+                            next_cursor=next_cursor, prev_cursor=prev_cursor)
+    return {'cards': Markup(cards), 'top_tags': top_tags(12)}
+
+# ---------- Routes ----------
+@app.route('/')
+def index():
+    q = request.args.get('q', '').strip()
+    tag = request.args.get('tag', '').strip().casefold()
+    limit = page_limit()
+    cursor = request.args.get('cursor')
+    salary = salary_filter()
+    versions, updated = listing_versions()
+    cached = not_modified(versions, updated)
+    if cached is not None:
+        return cached
+    key = ('index', versions, q, tag, limit, cursor, salary)
+    page = fragment_cache.get(key)
+    if page is None:
+        page = _load_job_cards(q, tag, limit, cursor, salary)
+        fragment_cache.set(key, page)
+    return render_template('index.html', search=q, tag=tag, salary=salary_query_args(salary),
+                           currencies=SALARY_CURRENCY_CODES, **page)
 
 # Registration / Login / Logout
 @app.route('/register', methods=['GET', 'POST'])
@@ -222,7 +1305,7 @@ def register():
         try:
             execute_db(
                 "INSERT INTO users (username, password, is_employer, email) VALUES (?, ?, ?, ?)",
-                (username, generate_password_hash(password), is_employer, email)
+                (username, hash_password(password), is_employer, email)
             )
         except sqlite3.IntegrityError:
             flash('Имя пользователя уже занято', 'danger')
@@ -246,9 +1329,16 @@ def login():
         remember = form.remember.data
 
         user = query_db("SELECT id, username, password, is_employer FROM users WHERE username = ?", (username,), one=True)
-        if user is None or not check_password_hash(user['password'], password):
+        if user is None or not verify_password(user['password'], password):
             flash('Неверный логин или пароль', 'danger')
             return redirect(url_for('login'))
+        if password_needs_rehash(user['password']):
+            # пароль известен только сейчас — переводим хэш на актуальные параметры
+            try:
+                execute_db("UPDATE users SET password = ? WHERE id = ?", (hash_password(password), user['id']))
+                invalidate_user(user['id'])
+            except HashingBusy:
+                pass  # не страшно, обновим при следующем входе
 
         session.clear()
         session['user_id'] = user['id']
@@ -297,7 +1387,8 @@ def reset_password(token):
         if not user:
             flash('Пользователь не найден', 'danger')
             return redirect(url_for('register'))
-        execute_db("UPDATE users SET password = ? WHERE id = ?", (generate_password_hash(new_password), user['id']))
+        execute_db("UPDATE users SET password = ? WHERE id = ?", (hash_password(new_password), user['id']))
+        invalidate_user(user['id'])
         flash('Пароль успешно изменён. Войдите с новым паролем.', 'success')
         return redirect(url_for('login'))
     return render_template('reset_password.html', form=form)
@@ -319,20 +1410,151 @@ def add_job():
         if not title or not description:
             flash('Заполните обязательные поля', 'danger')
             return redirect(url_for('add_job'))
-        execute_db("INSERT INTO jobs (author_id, title, description, tags, salary) VALUES (?, ?, ?, ?, ?)",
-                   (user['id'], title, description, tags, salary))
+        salary_min, salary_max, currency, period = schema.parse_salary(salary)
+        def insert_job(conn):  # вакансия и её теги — одной транзакцией
+            cur = conn.execute("INSERT INTO jobs (author_id, title, description, tags, salary, salary_min, salary_max, "
+                               "salary_currency, salary_period) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               (user['id'], title, description, tags, salary, salary_min, salary_max, currency, period))
+            save_job_tags(conn, cur.lastrowid, tags)
+        transaction(insert_job)
+        get_similar_index().refresh_soon()
+        get_suggest_index().refresh_soon()
         flash('Вакансия опубликована', 'success')
         return redirect(url_for('index'))
     return render_template('add_job.html')
 
 @app.route('/job/<int:job_id>', methods=['GET'])
 def job_detail(job_id):
-    job = query_db("SELECT jobs.*, users.username AS author, users.avatar AS author_avatar, users.id AS author_id "
-                   "FROM jobs LEFT JOIN users ON jobs.author_id = users.id WHERE jobs.id = ?", (job_id,), one=True)
+    row = query_db("SELECT jobs.rev, COALESCE(jobs.updated, jobs.created) AS updated, "
+                   "(SELECT MAX(id) FROM responses WHERE job_id = jobs.id) AS last_response_id, "
+                   "(SELECT version FROM data_versions WHERE name = 'users') AS users_version "
+                   "FROM jobs WHERE jobs.id = ?", (job_id,), one=True)
+    if row is None:
+        return archived_job_detail(job_id)
+    # индекс обновляется фоновым потоком; до первой загрузки версия None и список пуст
+    similar_version = get_similar_index().version
+    cached = not_modified((job_id, row['rev'], row['last_response_id'], row['users_version'], similar_version),
+                          row['updated'])
+    if cached is not None:
+        return cached
+    key = ('job', job_id, row['rev'], row['users_version'])
+    cached = fragment_cache.get(key)
+    if cached is None:
+        job = query_db("SELECT jobs.*, users.username AS author, users.avatar AS author_avatar, users.id AS author_id "
+                       "FROM jobs LEFT JOIN users ON jobs.author_id = users.id WHERE jobs.id = ?", (job_id,), one=True)
+        if not job:
+            abort(404)
+        cached = (job, Markup(render_template('_job_body.html', job=job)))
+        fragment_cache.set(key, cached)
+    job, job_body = cached
+    responses = query_db("SELECT responses.*, users.username as user_name FROM responses LEFT JOIN users ON responses.user_id = users.id WHERE job_id = ? ORDER BY responses.created DESC", (job_id,))
+    return render_template('job_detail.html', job=job, job_body=job_body, responses=responses,
+                           similar=similar_jobs(job_id, similar_version))
+
+# ---------- Archive ----------
+# Старые вакансии с откликами `flask archive-jobs` переносит в отдельный файл
+# (archive.py). Страница вакансии и профиль читают его «насквозь»: архив
+# подключается к соединению пула через ATTACH при первом обращении и остаётся
+# подключённым, пока живёт соединение. Горячие запросы архив не трогают.
+def archive_path():
+    return app.config['ARCHIVE_DATABASE'] or os.path.splitext(app.config['DATABASE'])[0] + '-archive.db'
+
+def attach_archive():
+    """Подключить архив к соединению запроса; False — архива ещё нет."""
+    return archive.attach(get_db(), archive_path())
+
+def archived_job_detail(job_id):
+    # архивная вакансия не меняется: валидаторы — момент переноса и версия
+    # профилей (аватар автора); откликнуться и удалить отклик уже нельзя
+    if not attach_archive():
+        abort(404)
+    job = query_db("SELECT a.*, users.username AS author, users.avatar AS author_avatar, "
+                   "(SELECT version FROM data_versions WHERE name = 'users') AS users_version "
+                   "FROM archive.jobs a LEFT JOIN users ON a.author_id = users.id WHERE a.id = ?", (job_id,), one=True)
     if not job:
         abort(404)
-    responses = query_db("SELECT responses.*, users.username as user_name FROM responses LEFT JOIN users ON responses.user_id = users.id WHERE job_id = ? ORDER BY responses.created DESC", (job_id,))
-    return render_template('job_detail.html', job=job, responses=responses)
+    metrics.inc('jobboard_archive_reads_total', ())
+    cached = not_modified((job_id, 'archived', job['archived_at'], job['users_version']), job['archived_at'])
+    if cached is not None:
+        return cached
+    responses = query_db("SELECT r.*, users.username AS user_name FROM archive.responses r "
+                         "LEFT JOIN users ON r.user_id = users.id WHERE r.job_id = ? ORDER BY r.created DESC", (job_id,))
+    return render_template('job_detail.html', job=job, job_body=Markup(render_template('_job_body.html', job=job)),
+                           responses=responses, similar=[], archived=True)
+
+@app.cli.command('archive-jobs')
+@click.option('--days', type=int, default=None, help='archive jobs idle this many days (default ARCHIVE_AFTER_DAYS)')
+@click.option('--max-age', type=int, default=None,
+              help='also archive jobs older than this many days (default ARCHIVE_MAX_AGE_DAYS, 0 = off)')
+def archive_jobs_command(days, max_age):
+    """Перенести старые вакансии с откликами в архивную БД и ужать горячую."""
+    days = app.config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    max_age = app.config['ARCHIVE_MAX_AGE_DAYS'] if max_age is None else max_age
+    path = archive_path()
+    conn = open_connection(app.config['DATABASE'])
+    try:
+        jobs, responses, freed = archive.archive_jobs(conn, path, days, max_age, app.config['ARCHIVE_BATCH'])
+    finally:
+        conn.close()
+    print(f'Archived {jobs} jobs and {responses} responses to {path}; {freed} free pages returned to the OS')
+
+# ---------- Similar jobs ----------
+# Индекс открывается (mmap) и догоняет журнал job_changes фоновым потоком;
+# запрос только читает готовый снимок. Его версия — часть ключа кэша и ETag
+# страницы вакансии; пока индекс загружается, похожих вакансий на ней нет.
+_similar = None
+_similar_lock = threading.Lock()
+
+def get_similar_index():
+    global _similar
+    root, path = app.config['SIMILAR_INDEX_DIR'], app.config['DATABASE']
+    if _similar is None or (_similar.root, _similar.path, _similar.pid) != (root, path, os.getpid()):
+        with _similar_lock:
+            if _similar is None or (_similar.root, _similar.path, _similar.pid) != (root, path, os.getpid()):
+                _similar = similar.SimilarIndex(root, lambda: open_connection(path),
+                                                app.config['SIMILAR_REFRESH_INTERVAL'],
+                                                app.config['SIMILAR_MAX_DELTA'], log=app.logger.warning)
+                _similar.path = path
+                _similar.pid = os.getpid()
+    return _similar
+
+@app.before_request
+def start_similar_index():
+    # открытие и догонка индекса идут в фоне — начинаем до первой страницы вакансии
+    get_similar_index()
+
+similar_cache = TTLCache(app.config['SIMILAR_CACHE_SIZE'], 24 * 3600)
+
+def similar_jobs(job_id, version):
+    if version is None:
+        return []  # индекс ещё загружается
+    key = (job_id, version)
+    cached = similar_cache.get(key)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    ranked = get_similar_index().query(job_id, app.config['SIMILAR_K'])
+    metrics.observe('jobboard_similar_query_seconds', (), time.perf_counter() - started)
+    rows = {}
+    if ranked:
+        ids = [job for job, _ in ranked]
+        rows = {r['id']: r for r in query_db(
+            f"SELECT id, title, salary, tags FROM jobs WHERE id IN ({','.join('?' * len(ids))})", ids)}
+    # удалённые после сборки индекса вакансии просто выпадают
+    cached = [dict(rows[job]) for job, _ in ranked if job in rows]
+    similar_cache.set(key, cached)
+    return cached
+
+@app.cli.command('build-similar')
+def build_similar_command():
+    """Пересобрать индекс похожих вакансий (similar.py) в SIMILAR_INDEX_DIR."""
+    root = app.config['SIMILAR_INDEX_DIR']
+    os.makedirs(root, exist_ok=True)
+    conn = open_connection(app.config['DATABASE'])
+    try:
+        similar.build(conn, root)
+    finally:
+        conn.close()
 
 @app.route('/respond/<int:job_id>', methods=['POST'])
 def respond(job_id):
@@ -345,8 +1567,11 @@ def respond(job_id):
     if not text:
         flash('Напишите сообщение с откликом', 'danger')
         return redirect(url_for('job_detail', job_id=job_id))
-    execute_db("INSERT INTO responses (job_id, user_id, text, contact) VALUES (?, ?, ?, ?)",
-               (job_id, user['id'], text, contact))
+    try:
+        execute_db("INSERT INTO responses (job_id, user_id, text, contact) VALUES (?, ?, ?, ?)",
+                   (job_id, user['id'], text, contact))
+    except sqlite3.IntegrityError:
+        abort(404)  # вакансии уже нет
     flash('Отклик отправлен', 'success')
     return redirect(url_for('job_detail', job_id=job_id))
 
@@ -363,8 +1588,13 @@ def delete_job(job_id):
     if job['author_id'] != user['id']:
         flash('Нет прав удалять эту вакансию', 'danger')
         return redirect(url_for('index'))
-    execute_db("DELETE FROM jobs WHERE id = ?", (job_id,))
-    execute_db("DELETE FROM responses WHERE job_id = ?", (job_id,))
+    def delete(conn):
+        # сначала отклики: с foreign_keys = ON вакансию с откликами удалить нельзя
+        conn.execute("DELETE FROM responses WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+    transaction(delete)
+    get_similar_index().refresh_soon()
+    get_suggest_index().refresh_soon()
     flash('Вакансия удалена', 'info')
     return redirect(url_for('index'))
 
@@ -399,19 +1629,320 @@ def profile(username):
         about = request.form.get('about', '').strip()
         avatar = request.form.get('avatar', '').strip() or None
         execute_db("UPDATE users SET about = ?, avatar = ? WHERE id = ?", (about, avatar, user['id']))
+        invalidate_user(user['id'])
         flash('Профиль обновлён', 'success')
         return redirect(url_for('profile', username=username))
     # responses by this user
-    responses = query_db("SELECT responses.*, jobs.title as job_title FROM responses LEFT JOIN jobs ON responses.job_id = jobs.id WHERE responses.user_id = ? ORDER BY responses.created DESC", (profile_user['id'],))
-    jobs = query_db("SELECT * FROM jobs WHERE author_id = ? ORDER BY created DESC", (profile_user['id'],))
+    responses_sql = ("SELECT responses.id, responses.job_id, responses.created AS created, jobs.title AS job_title, 0 AS archived "
+                     "FROM responses LEFT JOIN jobs ON responses.job_id = jobs.id WHERE responses.user_id = ?")
+    jobs_sql = "SELECT id, title, created, response_count, 0 AS archived FROM jobs WHERE author_id = ?"
+    args = (profile_user['id'],)
+    if attach_archive():
+        # старые отклики и публикации — из архива; строка, оставшаяся и в горячей БД, главнее
+        responses_sql += (" UNION ALL SELECT r.id, r.job_id, r.created, a.title, 1 FROM archive.responses r "
+                          "LEFT JOIN archive.jobs a ON r.job_id = a.id WHERE r.user_id = ? "
+                          "AND NOT EXISTS (SELECT 1 FROM main.responses h WHERE h.id = r.id)")
+        jobs_sql += (" UNION ALL SELECT id, title, created, response_count, 1 FROM archive.jobs a WHERE author_id = ? "
+                     "AND NOT EXISTS (SELECT 1 FROM main.jobs h WHERE h.id = a.id)")
+        args *= 2
+    # соединение запроса, а не потоковый пул: шаблон всё равно дочитывает оба
+    # списка до конца, а медленные выгрузки не должны отнимать у профиля соединения
+    responses = query_db(responses_sql + " ORDER BY created DESC", args)
+    jobs = query_db(jobs_sql + " ORDER BY created DESC", args)
     return render_template('profile.html', profile=profile_user, responses=responses, jobs=jobs)
 
+DASHBOARD_DAYS = 30
+
+def employer_dashboard(author_id, days=DASHBOARD_DAYS):
+    # Только агрегаты: счётчики из jobs (idx_jobs_author) и дневные суммы из
+    # job_response_daily (по первичному ключу job_id, day) — responses не читаем.
+    today = datetime.now(timezone.utc).date()
+    day_list = [(today - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1)]
+    jobs = query_db("SELECT id, title, created, response_count, last_response_at FROM jobs "
+                    "WHERE author_id = ? ORDER BY created DESC", (author_id,))
+    rows = query_db("SELECT d.job_id, d.day, d.n FROM jobs JOIN job_response_daily d ON d.job_id = jobs.id "
+                    "WHERE jobs.author_id = ? AND d.day >= ?", (author_id, day_list[0]))
+    per_job = {}
+    totals = dict.fromkeys(day_list, 0)
+    for r in rows:
+        per_job.setdefault(r['job_id'], dict.fromkeys(day_list, 0))[r['day']] = r['n']
+        totals[r['day']] += r['n']
+    return {
+        'days': day_list,
+        'daily': [totals[d] for d in day_list],
+        'total': sum(j['response_count'] for j in jobs),
+        'jobs': [{'id': j['id'], 'title': j['title'], 'created': j['created'],
+                  'response_count': j['response_count'], 'last_response_at': j['last_response_at'],
+                  'daily': list(per_job.get(j['id'], dict.fromkeys(day_list, 0)).values())} for j in jobs],
+    }
+
+@app.route('/dashboard')
+def dashboard():
+    user = current_user()
+    if not user or not user['is_employer']:
+        flash('Дашборд доступен только работодателям', 'warning')
+        return redirect(url_for('login'))
+    data = employer_dashboard(user['id'])
+    peak = max(data['daily']) or 1
+    return render_template('dashboard.html', data=data, peak=peak)
+
+@app.route('/api/dashboard')
+def api_dashboard():
+    user = current_user()
+    if not user or not user['is_employer']:
+        abort(403)
+    return jsonify(employer_dashboard(user['id']))
+
+# Выгрузка для работодателя: CSV пишется по мере чтения курсора (память не
+# растёт с числом откликов). Строки идут по возрастанию id, и id — первая
+# колонка: оборванную выгрузку можно продолжить с ?after=<последний id>,
+# тогда BOM и заголовок не повторяются и ответ дописывается в конец файла.
+EXPORTS = {
+    'responses': (
+        ('id', 'job_id', 'job_title', 'applicant', 'contact', 'text', 'created'),
+        "SELECT r.id, r.job_id, j.title AS job_title, u.username AS applicant, r.contact, r.text, r.created "
+        "FROM jobs j JOIN responses r ON r.job_id = j.id LEFT JOIN users u ON u.id = r.user_id "
+        "WHERE j.author_id = ? AND r.id > ? ORDER BY r.id"),
+    'jobs': (
+        ('id', 'title', 'salary', 'tags', 'created', 'response_count', 'last_response_at'),
+        "SELECT id, title, salary, tags, created, response_count, last_response_at "
+        "FROM jobs WHERE author_id = ? AND id > ? ORDER BY id"),
+}
+
+def _csv_cell(value):
+    # защита от CSV-инъекций: Excel исполняет ячейки, начинающиеся с =, +, -, @
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + value
+    return value
+
+def _encode_csv(columns, batches, header):
+    buf = io.StringIO()
+    writer = csv.writer(buf)  # диалект excel: запятые, кавычки, \r\n
+    if header:
+        buf.write('\ufeff')  # BOM: Excel иначе читает UTF-8 как ANSI и ломает кириллицу
+        writer.writerow(columns)
+    for rows in batches:
+        writer.writerows([_csv_cell(v) for v in r] for r in rows)
+        yield buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+@app.route('/export/<kind>.csv')
+def export_csv(kind):
+    user = current_user()
+    if not user or not user['is_employer']:
+        abort(403)
+    if kind not in EXPORTS:
+        abort(404)
+    try:
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        abort(400)
+    columns, sql = EXPORTS[kind]
+    body = _encode_csv(columns, iter_query_batches(sql, (user['id'], after)), header=after == 0)
+    headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'private, no-store',
+               'Content-Disposition': f'attachment; filename="{kind}.csv"'}
+    if request.accept_encodings.best_match(['gzip']) == 'gzip':
+        body = _gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype='text/csv', headers=headers)
+
+@app.cli.command('reconcile-responses')
+def reconcile_responses_command():
+    """Пересчитать response_count/last_response_at и дневной агрегат откликов."""
+    conn = open_connection(app.config['DATABASE'])
+    try:
+        repaired = schema.reconcile_response_counts(conn)
+    finally:
+        conn.close()
+    print(f'Response counters reconciled: {repaired} jobs repaired')
+
+def top_tags(limit):
+    # читается из агрегата tag_counts по индексу idx_tag_counts_n, без скана job_tags
+    return query_db("SELECT tag, n FROM tag_counts ORDER BY n DESC, tag LIMIT ?", (limit,))
+
 # API
+API_JOB_FIELDS = ("jobs.id, title, description, tags, salary, salary_min, salary_max, salary_currency, salary_period, "
+                  "created, users.username as author")
+API_JOB_FROM = " FROM jobs LEFT JOIN users ON jobs.author_id = users.id"
+API_JOB_COLUMNS = "SELECT " + API_JOB_FIELDS + API_JOB_FROM
+
+def _encode_feed(batches, fmt):
+    # Генератор: читаем курсор пачками и сразу отдаём закодированные строки,
+    # так что в памяти никогда не лежит больше одной пачки.
+    first = True
+    if fmt == 'stream':
+        yield b'['
+    for rows in batches:
+        if fmt == 'ndjson':
+            chunk = ''.join(json.dumps(dict(r), ensure_ascii=False) + '\n' for r in rows)
+        else:
+            chunk = ('' if first else ',') + ','.join(json.dumps(dict(r), ensure_ascii=False) for r in rows)
+        first = False
+        yield chunk.encode('utf-8')
+    if fmt == 'stream':
+        yield b']'
+
+def _gzip_stream(chunks, level=6):
+    # wbits=31 — gzip-контейнер, сжимаем на лету по мере генерации
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = z.compress(chunk)
+        if data:
+            yield data
+    yield z.flush()
+
+def stream_jobs_feed(fmt):
+    """Полная выгрузка вакансий: ?format=ndjson (по объекту на строку) или
+    ?format=stream (JSON-массив, отдаваемый чанками). Память не зависит от размера ленты."""
+    body = _encode_feed(iter_query_batches(API_JOB_COLUMNS + " ORDER BY jobs.created DESC, jobs.id DESC"), fmt)
+    headers = {'Vary': 'Accept-Encoding'}
+    if request.accept_encodings.best_match(['gzip']) == 'gzip':
+        body = _gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return Response(body, mimetype=mimetype, headers=headers)
+
 @app.route('/api/jobs')
 def api_jobs():
-    jobs = query_db("SELECT jobs.id, title, description, tags, salary, created, users.username as author FROM jobs LEFT JOIN users ON jobs.author_id = users.id ORDER BY jobs.created DESC")
-    out = [dict(j) for j in jobs]
-    return jsonify(out)
+    fmt = request.args.get('format')
+    versions, updated = listing_versions()
+    # потоковые форматы сжимаются на лету — у gzip-тела должен быть свой ETag
+    cached = not_modified((versions, fmt, request.accept_encodings.best_match(['gzip'])), updated, personal=False)
+    if cached is not None:
+        return cached
+    if fmt in ('ndjson', 'stream'):
+        return stream_jobs_feed(fmt)
+    if fmt not in (None, 'json'):
+        abort(400)
+    limit = page_limit()
+    salary = salary_filter()
+    where, args = salary_where(salary) if salary else ('', ())
+    if salary and salary[4]:
+        # ключ сортировки нужен в строке для курсора, но в ответ его не отдаём
+        select = f"SELECT {API_JOB_FIELDS}, {SALARY_TOP} AS salary_top" + API_JOB_FROM
+        jobs, next_cursor, prev_cursor = keyset_page(select, where, args, limit, request.args.get('cursor'), HIGHEST_PAID)
+        jobs = [{k: j[k] for k in j.keys() if k != 'salary_top'} for j in jobs]
+    else:
+        jobs, next_cursor, prev_cursor = keyset_page(API_JOB_COLUMNS, where, args, limit, request.args.get('cursor'))
+    link_args = {'limit': limit, **salary_query_args(salary)}
+    return jsonify({
+        'jobs': [dict(j) for j in jobs],
+        'next': url_for('api_jobs', cursor=next_cursor, _external=True, **link_args) if next_cursor else None,
+        'prev': url_for('api_jobs', cursor=prev_cursor, _external=True, **link_args) if prev_cursor else None,
+    })
+
+# Журнал изменений (schema.CHANGE_LOG_SCHEMA): ?since=0 — полный снимок
+# постранично, дальше партнёр опрашивает с курсором из ответа и получает
+# только изменившиеся вакансии — по одной записи на вакансию, в её текущем виде.
+API_CHANGES_COLUMNS = (f"SELECT c.seq, c.job_id, c.op, {API_JOB_FIELDS} FROM job_changes c "
+                       "LEFT JOIN jobs ON jobs.id = c.job_id LEFT JOIN users ON jobs.author_id = users.id ")
+
+@app.route('/api/jobs/changes')
+def api_job_changes():
+    limit = page_limit()
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        abort(400)
+    if since < 0:
+        abort(400)
+    log = query_db("SELECT (SELECT seq FROM sqlite_sequence WHERE name = 'job_changes') AS head, "
+                   "(SELECT seq FROM job_changes_horizon WHERE id = 1) AS horizon", one=True)
+    head, horizon = log['head'] or 0, log['horizon']
+    if since > head or 0 < since < horizon:
+        # записи после курсора уже сжаты (или курсор из другой базы) — нужна полная синхронизация
+        return jsonify({'error': 'cursor expired', 'horizon': horizon,
+                        'resync': url_for('api_job_changes', since=0, limit=limit, _external=True)}), 410
+    cached = not_modified((head, horizon, since, limit), None, personal=False)
+    if cached is not None:
+        return cached
+    rows = query_db(API_CHANGES_COLUMNS +
+                    "WHERE c.seq > ? AND NOT EXISTS "
+                    "(SELECT 1 FROM job_changes d WHERE d.job_id = c.job_id AND d.seq > c.seq) "
+                    "ORDER BY c.seq LIMIT ?", (since, limit))
+    changes = []
+    for r in rows:
+        job = {k: r[k] for k in r.keys() if k not in ('seq', 'job_id', 'op')} if r['id'] is not None else None
+        changes.append({'seq': r['seq'], 'op': r['op'] if job is not None else 'delete',
+                        'id': r['job_id'], 'job': job})
+    cursor = changes[-1]['seq'] if changes else head
+    return jsonify({
+        'changes': changes,
+        'cursor': cursor,
+        'next': url_for('api_job_changes', since=cursor, limit=limit, _external=True) if len(changes) == limit else None,
+    })
+
+@app.cli.command('compact-changes')
+@click.option('--days', type=int, default=None, help='keep delete records this many days (default CHANGE_LOG_RETENTION_DAYS)')
+def compact_changes_command(days):
+    """Сжать журнал изменений вакансий (job_changes)."""
+    days = app.config['CHANGE_LOG_RETENTION_DAYS'] if days is None else days
+    conn = open_connection(app.config['DATABASE'])
+    try:
+        removed, horizon = schema.compact_job_changes(conn, days)
+    finally:
+        conn.close()
+    print(f'Change log compacted: {removed} entries removed, cursors before {horizon} expired')
+
+def metrics_allowed():
+    token = app.config['METRICS_TOKEN']
+    auth = request.headers.get('Authorization', '')
+    if token and auth.startswith('Bearer '):
+        return hmac.compare_digest(auth[len('Bearer '):].encode(), token.encode())
+    return request.remote_addr in app.config['METRICS_ALLOW']
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # тайминги маршрутов и внутренние счётчики — не для посторонних
+    if not metrics_allowed():
+        abort(403)
+    update_mail_gauges()
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# ---------- Suggestions ----------
+# Индекс подсказок (suggest.py) живёт в памяти процесса и обновляется фоновым
+# потоком по журналу job_changes; /api/suggest к базе не обращается.
+_suggest = None
+_suggest_lock = threading.Lock()
+
+def get_suggest_index():
+    global _suggest
+    path = app.config['DATABASE']
+    if _suggest is None or _suggest.path != path or _suggest.pid != os.getpid():
+        with _suggest_lock:
+            if _suggest is None or _suggest.path != path or _suggest.pid != os.getpid():
+                _suggest = suggest.SuggestIndex(lambda: open_connection(path), app.config['SUGGEST_REFRESH_INTERVAL'],
+                                                log=app.logger.info)
+                _suggest.path = path
+                _suggest.pid = os.getpid()
+    return _suggest
+
+@app.before_request
+def start_suggest_index():
+    # загрузка занимает время — начинаем её до первого запроса подсказок
+    get_suggest_index()
+
+@app.route('/api/suggest')
+def api_suggest():
+    q = request.args.get('q', '')[:100]
+    try:
+        limit = max(1, min(int(request.args.get('limit', app.config['SUGGEST_LIMIT'])), 20))
+    except ValueError:
+        abort(400)
+    items = get_suggest_index().lookup(q, limit)
+    response = jsonify({'q': q, 'suggestions': [{'text': text, 'kind': kind} for text, kind in items]})
+    # одинаковы для всех пользователей; короткий max-age — новые вакансии появятся быстро
+    response.cache_control.public = True
+    response.cache_control.max_age = 30
+    return response
+
+@app.route('/api/tags')
+def api_tags():
+    limit = page_limit()
+    return jsonify([{'tag': t['tag'], 'count': t['n']} for t in top_tags(limit)])
 
 # ---------- Run ----------
 if __name__ == '__main__':
@@ -0,0 +1,154 @@
+# archive.py - перенос старых вакансий и откликов в архивный файл SQLite
+#
+# jobs и responses растут бесконечно, а живой доске нужны только недавние
+# вакансии. archive_jobs() пачками переносит вакансии без активности дольше
+# срока (и, если задан, старше предельного возраста) вместе с откликами в
+# отдельный файл — к соединению он подключается как схема archive
+# (ATTACH по требованию). Таблицы архива называются так же (archive.jobs,
+# archive.responses), повторяют столбцы горячих и дополнительно хранят
+# archived_at. Горячая БД после переноса ужимается incremental_vacuum, так что
+# её файл, индексы и кэш страниц остаются размером с рабочий набор.
+#
+# Перенос пачки — две транзакции: копия в архив, затем удаление из горячей БД
+# только тех вакансий, чья копия в архиве совпадает по rev. В WAL коммит по
+# нескольким файлам не атомарен, поэтому порядок важен: после сбоя между
+# шагами строка окажется в обоих файлах (горячая копия главнее, следующий
+# запуск перенесёт её заново), но не потеряется. Триггеры на удаление из jobs
+# сами чистят FTS, теги, дневные агрегаты и пишут 'delete' в job_changes.
+
+import os
+from datetime import datetime, timedelta, timezone
+
+SCHEMA = 'archive'
+BATCH = 500            # вакансий за одну пару транзакций
+VACUUM_PAGES = 2000    # страниц за один incremental_vacuum (одна короткая блокировка записи)
+
+# индексы архива — под чтения «насквозь» из app.py: отклики вакансии,
+# отклики и публикации в профиле
+ARCHIVE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS archive.idx_responses_job ON responses(job_id, created)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_responses_user ON responses(user_id, created)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_jobs_author ON jobs(author_id, created)',
+]
+
+def is_attached(conn):
+    return any(row[1] == SCHEMA for row in conn.execute('PRAGMA database_list'))
+
+def attach(conn, path, create=False):
+    """Подключить архив как схему archive; False — архивного файла ещё нет.
+
+    Вызывается вне транзакции. Кэш страниц архива остаётся по умолчанию
+    маленьким: холодные чтения не вытесняют горячую БД.
+    """
+    if is_attached(conn):
+        return True
+    if not create and not os.path.exists(path):
+        return False
+    conn.execute(f'ATTACH DATABASE ? AS {SCHEMA}', (path,))
+    return True
+
+def detach(conn):
+    if is_attached(conn):
+        conn.execute(f'DETACH DATABASE {SCHEMA}')
+
+def _columns(conn, schema, table):
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+def ensure_schema(conn):
+    """Создать таблицы архива или дописать столбцы, добавленные миграциями горячей БД."""
+    with conn:
+        for table in ('jobs', 'responses'):
+            hot = _columns(conn, 'main', table)
+            cold = {name for name, _ in _columns(conn, SCHEMA, table)}
+            if not cold:
+                # без NOT NULL/DEFAULT/внешних ключей: архив — копия, а не источник правды
+                cols = ', '.join(f'{name} {decl}' + (' PRIMARY KEY' if name == 'id' else '') for name, decl in hot)
+                conn.execute(f'CREATE TABLE {SCHEMA}.{table} ({cols}, archived_at TIMESTAMP)')
+            else:
+                for name, decl in hot:
+                    if name not in cold:
+                        conn.execute(f'ALTER TABLE {SCHEMA}.{table} ADD COLUMN {name} {decl}')
+        for sql in ARCHIVE_INDEXES:
+            conn.execute(sql)
+
+def _cutoff(days, now):
+    return (now - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S') if days else ''
+
+def _candidates(conn, idle, expire, after, limit):
+    # (created, id) — по idx_jobs_created_id; updated >= created, так что обе
+    # границы лежат в диапазоне created < max(idle, expire)
+    return conn.execute(
+        "SELECT id, created FROM main.jobs WHERE (created, id) > (?, ?) AND created < ? "
+        "AND (COALESCE(updated, created) < ? OR created < ?) ORDER BY created, id LIMIT ?",
+        (*after, max(idle, expire), idle, expire, limit)).fetchall()
+
+def _move(conn, ids):
+    marks = ','.join('?' * len(ids))
+    job_cols = ', '.join(name for name, _ in _columns(conn, 'main', 'jobs'))
+    resp_cols = ', '.join(name for name, _ in _columns(conn, 'main', 'responses'))
+    with conn:
+        # 1. копия: пишется только архивный файл (REPLACE — повтор после сбоя)
+        conn.execute(f'INSERT OR REPLACE INTO {SCHEMA}.jobs ({job_cols}, archived_at) '
+                     f'SELECT {job_cols}, CURRENT_TIMESTAMP FROM main.jobs WHERE id IN ({marks})', ids)
+        conn.execute(f'INSERT OR REPLACE INTO {SCHEMA}.responses ({resp_cols}, archived_at) '
+                     f'SELECT {resp_cols}, CURRENT_TIMESTAMP FROM main.responses WHERE job_id IN ({marks})', ids)
+    with conn:
+        # 2. удаление: новый отклик или правка между шагами меняет rev — такая вакансия остаётся
+        conn.execute('BEGIN IMMEDIATE')
+        moved = [row[0] for row in conn.execute(
+            f'SELECT id FROM main.jobs WHERE id IN ({marks}) AND EXISTS '
+            f'(SELECT 1 FROM {SCHEMA}.jobs a WHERE a.id = jobs.id AND a.rev = jobs.rev)', ids)]
+        if not moved:
+            return 0, 0
+        marks = ','.join('?' * len(moved))
+        # сначала отклики: с foreign_keys = ON вакансию с откликами удалить нельзя
+        responses = conn.execute(f'DELETE FROM main.responses WHERE job_id IN ({marks})', moved).rowcount
+        conn.execute(f'DELETE FROM main.jobs WHERE id IN ({marks})', moved)
+    return len(moved), responses
+
+def incremental_vacuum(conn, pages=VACUUM_PAGES):
+    """Вернуть ОС свободные страницы горячей БД порциями; вернуть число освобождённых."""
+    if conn.execute('PRAGMA main.auto_vacuum').fetchone()[0] != 2:
+        return 0  # режим включает миграция 10; без него освобождать нечего
+    freed = 0
+    free = conn.execute('PRAGMA main.freelist_count').fetchone()[0]
+    while free:
+        # pragma отдаёт строку на шаг — без fetchall() освободится одна страница
+        conn.execute(f'PRAGMA main.incremental_vacuum({min(free, pages)})').fetchall()
+        left = conn.execute('PRAGMA main.freelist_count').fetchone()[0]
+        if left >= free:
+            break  # файл занят другим писателем — доберём в следующий раз
+        freed += free - left
+        free = left
+    # файл в WAL укорачивается при контрольной точке
+    conn.execute('PRAGMA main.wal_checkpoint(TRUNCATE)').fetchall()
+    return freed
+
+def archive_jobs(conn, path, after_days, max_age_days=0, batch=BATCH, log=print, now=None):
+    """Перенести в архив path вакансии без активности after_days дней
+    (или старше max_age_days, если задан) вместе с откликами.
+
+    Возвращает (вакансий, откликов, освобождено страниц).
+    """
+    now = now or datetime.now(timezone.utc)
+    idle, expire = _cutoff(after_days, now), _cutoff(max_age_days, now)
+    attach(conn, path, create=True)
+    try:
+        conn.execute(f'PRAGMA {SCHEMA}.journal_mode = WAL')
+        ensure_schema(conn)
+        jobs = responses = 0
+        after = ('', 0)
+        while True:
+            rows = _candidates(conn, idle, expire, after, batch)
+            if not rows:
+                break
+            moved, n = _move(conn, [row[0] for row in rows])
+            jobs += moved
+            responses += n
+            after = tuple(rows[-1])
+            log(f'archived {jobs} jobs, {responses} responses')
+        freed = incremental_vacuum(conn)
+        conn.execute('PRAGMA main.optimize')
+    finally:
+        detach(conn)
+    return jobs, responses, freed
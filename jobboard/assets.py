@@ -0,0 +1,176 @@
+# assets.py - сборка статики: вендоринг CDN-зависимостей, хэши в именах, сжатие
+#
+# `python scripts/build_assets.py` скачивает файлы из VENDOR_ASSETS в
+# static/vendor/, затем копирует всю статику в static/dist/ под именами с
+# хэшем содержимого (style.css -> dist/style.1a2b3c4d5e.css), рядом кладёт
+# .gz и, если установлен пакет brotli, .br. Соответствие исходных имён
+# хэшированным — в static/dist/manifest.json; его читает app.py.
+#
+# Хэшированный файл никогда не меняется, поэтому его можно отдавать с
+# Cache-Control: immutable на год — новая версия получит новое имя.
+#
+# Сборка идёт поверх прежней: новые файлы дописываются рядом со старыми,
+# манифест подменяется атомарно, а файлы предыдущей сборки остаются до
+# следующей — приложение, ещё не перезапущенное после деплоя, продолжает
+# отдавать страницы со старыми именами без 404.
+
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import urllib.request
+
+try:
+    import brotli
+except ImportError:  # необязательная зависимость: без неё пишем только .gz
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+MANIFEST_PATH = f'{DIST_DIR}/{MANIFEST}'
+
+# путь в static/ -> URL на CDN. Шаблоны подключают их через asset_url(path),
+# который отдаёт CDN, пока файл не завендорен (например, в свежем клоне).
+VENDOR_ASSETS = {
+    'vendor/bootstrap/bootstrap.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js',
+    'vendor/bootstrap-icons/bootstrap-icons.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/bootstrap-icons.css',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/fonts/bootstrap-icons.woff2',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/fonts/bootstrap-icons.woff',
+    'vendor/animate/animate.min.css':
+        'https://cdnjs.cloudflare.com/ajax/libs/animate.css/4.1.1/animate.min.css',
+}
+
+# woff2/png/jpg уже сжаты — повторное сжатие только тратит место
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.ttf', '.eot', '.woff'}
+MIN_COMPRESS_SIZE = 256
+
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+def vendor(static_dir, log=print):
+    """Скачать недостающие файлы из VENDOR_ASSETS в static/."""
+    for path, url in VENDOR_ASSETS.items():
+        target = os.path.join(static_dir, *path.split('/'))
+        if os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            data = resp.read()
+        with open(target + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(target + '.tmp', target)
+        log(f'vendored {path} ({len(data)} bytes)')
+
+def _source_files(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        rel_root = os.path.relpath(root, static_dir).replace(os.sep, '/')
+        if rel_root == DIST_DIR or rel_root.startswith(DIST_DIR + '/'):
+            dirs[:] = []
+            continue
+        for name in sorted(files):
+            if name.endswith(('.gz', '.br', '.tmp')):
+                continue
+            yield name if rel_root == '.' else f'{rel_root}/{name}'
+
+def _hashed_name(path, data):
+    stem, ext = posixpath.splitext(path)
+    return f'{DIST_DIR}/{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+
+def _rewrite_css(path, data, manifest):
+    # url(./fonts/x.woff2?v=1) -> url(fonts/x.<hash>.woff2): ссылки внутри CSS
+    # тоже должны вести на хэшированные файлы, иначе их кэш не «вечный»
+    base = posixpath.dirname(path)
+    out_base = posixpath.dirname(_hashed_name(path, b''))
+
+    def replace(m):
+        ref = m.group(2).strip()
+        if ref.startswith(('data:', 'http:', 'https:', '//', '#')):
+            return m.group(0)
+        clean = re.split(r'[?#]', ref, maxsplit=1)[0]
+        target = posixpath.normpath(posixpath.join(base, clean))
+        if target not in manifest:
+            return m.group(0)
+        return f'url("{posixpath.relpath(manifest[target], out_base)}")'
+
+    return _CSS_URL.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+def _write(path, data):
+    # через .tmp + replace: читатель видит либо старый файл, либо целый новый
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+def _build_files(manifest):
+    # все файлы сборки в dist/ (пути относительно static/), включая сжатые копии
+    files = {MANIFEST_PATH}
+    for hashed in manifest.values():
+        files.update((hashed, hashed + '.gz', hashed + '.br'))
+    return files
+
+def _prune(static_dir, keep, log=print):
+    """Удалить из dist/ файлы, которых нет ни в одной из сборок keep."""
+    dist = os.path.join(static_dir, DIST_DIR)
+    removed = 0
+    for root, dirs, files in os.walk(dist, topdown=False):
+        for name in files:
+            full = os.path.join(root, name)
+            if os.path.relpath(full, static_dir).replace(os.sep, '/') not in keep:
+                os.remove(full)
+                removed += 1
+        if root != dist and not os.listdir(root):
+            os.rmdir(root)
+    if removed:
+        log(f'pruned {removed} files of older builds')
+    return removed
+
+def build(static_dir, log=print):
+    """Собрать static/dist/ и вернуть манифест {исходный путь: хэшированный}.
+
+    Файлы предыдущей сборки остаются (их удалит следующая сборка), всё более
+    старое удаляется.
+    """
+    dist = os.path.join(static_dir, DIST_DIR)
+    previous = load_manifest(static_dir)
+    manifest = {}
+    # CSS — последними: им нужны уже известные имена шрифтов и картинок
+    sources = sorted(_source_files(static_dir), key=lambda p: (p.endswith('.css'), p))
+    saved = raw = 0
+    for path in sources:
+        with open(os.path.join(static_dir, *path.split('/')), 'rb') as f:
+            data = f.read()
+        if path.endswith('.css'):
+            data = _rewrite_css(path, data, manifest)
+        hashed = _hashed_name(path, data)
+        manifest[path] = hashed
+        target = os.path.join(static_dir, *hashed.split('/'))
+        # имя = хэш содержимого: уже лежащий файл с тем же именем тот же самый
+        if not os.path.exists(target):
+            _write(target, data)
+        if posixpath.splitext(path)[1] in COMPRESSIBLE and len(data) >= MIN_COMPRESS_SIZE:
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            _write(target + '.gz', gz)
+            if brotli is not None and not os.path.exists(target + '.br'):
+                _write(target + '.br', brotli.compress(data, quality=11))
+            raw += len(data)
+            saved += len(data) - len(gz)
+    # манифест — последним: до его подмены приложение видит только старую сборку
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+    _prune(static_dir, _build_files(manifest) | _build_files(previous), log)
+    log(f'{len(manifest)} assets -> {DIST_DIR}/, gzip saves {saved} of {raw} bytes'
+        + ('' if brotli is not None else ' (brotli not installed: no .br files)'))
+    return manifest
+
+def load_manifest(static_dir):
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
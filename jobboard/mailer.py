@@ -0,0 +1,278 @@
+# mailer.py - фоновая доставка почты через таблицу outbox
+#
+# Обработчик запроса только вставляет письмо в outbox (enqueue) — это обычная
+# короткая запись в SQLite. Доставкой занимается MailPool: несколько потоков
+# забирают пачки готовых к отправке писем, шлют их по одному долгоживущему
+# SMTP-соединению на поток и записывают результат. Временные ошибки (4xx,
+# обрыв соединения) откладывают письмо с экспоненциальной задержкой,
+# постоянные (5xx) или исчерпанные попытки переводят его в 'failed'.
+#
+# Статусы: pending -> sending -> sent | pending (повтор) | failed.
+# 'sending' держится не дольше lease: если процесс упал посреди отправки,
+# письмо снова станет доступным (доставка «хотя бы один раз»; Message-ID
+# одинаков у всех попыток, так что получатель может отбросить дубль).
+#
+# Сбои доставки пишутся в логгер 'mailer' (модуль logging), а не в stdout:
+# они попадают в те же обработчики, что и остальные логи процесса.
+
+import logging
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from email.message import EmailMessage
+from email.utils import make_msgid, parseaddr
+
+log = logging.getLogger(__name__)
+
+def enqueue(conn, recipient, subject, body, now=None):
+    """Поставить письмо в очередь; вызывается внутри транзакции вызывающего."""
+    cur = conn.execute(
+        "INSERT INTO outbox (recipient, subject, body, next_attempt_at) VALUES (?, ?, ?, ?)",
+        (recipient, subject, body, time.time() if now is None else now))
+    return cur.lastrowid
+
+def claim(conn, limit, lease, now=None):
+    """Забрать до limit готовых писем, пометив их 'sending' на lease секунд."""
+    now = time.time() if now is None else now
+    with conn:
+        # письма, застрявшие в 'sending' у упавшего потока или процесса
+        conn.execute("UPDATE outbox SET status = 'pending' "
+                     "WHERE status = 'sending' AND next_attempt_at <= ?", (now,))
+        return conn.execute(
+            "UPDATE outbox SET status = 'sending', next_attempt_at = ? "
+            "WHERE id IN (SELECT id FROM outbox WHERE status = 'pending' AND next_attempt_at <= ? "
+            "             ORDER BY next_attempt_at LIMIT ?) "
+            "RETURNING id, recipient, subject, body, attempts",
+            (now + lease, now, limit)).fetchall()
+
+def queue_depth(conn, now=None):
+    """{status: число писем} для pending/sending и возраст самого старого готового письма."""
+    now = time.time() if now is None else now
+    depth = dict(conn.execute("SELECT status, COUNT(*) FROM outbox "
+                              "WHERE status IN ('pending', 'sending') GROUP BY status").fetchall())
+    oldest = conn.execute("SELECT MIN(next_attempt_at) FROM outbox "
+                          "WHERE status = 'pending' AND next_attempt_at <= ?", (now,)).fetchone()[0]
+    return depth, (now - oldest if oldest is not None else 0.0)
+
+def purge(conn, keep_seconds):
+    """Удалить доставленные письма старше keep_seconds."""
+    with conn:
+        return conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < datetime('now', ?)",
+                            (f'-{int(keep_seconds)} seconds',)).rowcount
+
+def backoff(attempts, base, cap):
+    # 1-я повторная попытка через base, дальше вдвое дольше, но не больше cap;
+    # разброс ±20% не даёт письмам, упавшим вместе, вместе и вернуться
+    return min(base * 2 ** (attempts - 1), cap) * random.uniform(0.8, 1.2)
+
+def is_permanent(exc):
+    """5xx от сервера — повтор не поможет; сеть и 4xx — стоит попробовать ещё."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    code = getattr(exc, 'smtp_code', None)
+    return isinstance(code, int) and code >= 500
+
+def build_message(row, sender):
+    msg = EmailMessage()
+    msg['From'] = sender
+    msg['To'] = row['recipient']
+    msg['Subject'] = row['subject']
+    # стабильный Message-ID: повторная доставка того же письма опознаётся как дубль
+    domain = parseaddr(sender)[1].rpartition('@')[2] or None
+    msg['Message-ID'] = make_msgid(idstring=f"outbox.{row['id']}", domain=domain)
+    msg.set_content(row['body'])
+    return msg
+
+class SMTPTransport:
+    """Одно SMTP-соединение, открываемое по требованию и переиспользуемое между письмами."""
+
+    def __init__(self, host, port=25, username=None, password=None, starttls=False, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._smtp = None
+
+    @property
+    def is_open(self):
+        return self._smtp is not None
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or '')
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+
+    def send(self, msg):
+        if self._smtp is None:
+            self._connect()
+        self._smtp.send_message(msg)
+
+    def close(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+class ConsoleTransport:
+    """Режим разработки без SMTP: письмо печатается в консоль сервера."""
+
+    is_open = False
+
+    def send(self, msg):
+        print(f"[Mail] To: {msg['To']}\nSubject: {msg['Subject']}\n\n{msg.get_content()}", flush=True)
+
+    def close(self):
+        pass
+
+class MailPool:
+    """Потоки, доставляющие письма из outbox.
+
+    connect() открывает соединение с БД для потока, transport() создаёт
+    транспорт (по одному на поток), metrics — объект с inc()/observe().
+    """
+
+    def __init__(self, connect, transport, metrics, sender, workers=2, batch_size=20, lease=300,
+                 max_attempts=8, retry_base=30, retry_max=3600, poll_interval=5, idle_timeout=30,
+                 keep_sent=7 * 24 * 3600):
+        self.connect = connect
+        self.transport = transport
+        self.metrics = metrics
+        self.sender = sender
+        self.batch_size = batch_size
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.keep_sent = keep_sent
+        self._wake = threading.Condition()
+        self._pending_wakeups = 0
+        self._stop = threading.Event()
+        self._next_purge = 0.0
+        self._threads = [threading.Thread(target=self._run, name=f'mailer-{i}', daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def wake(self):
+        """Разбудить поток: в outbox есть новое письмо."""
+        with self._wake:
+            self._pending_wakeups += 1
+            self._wake.notify()
+
+    def close(self, timeout=None):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+
+    def drain(self):
+        """Доставить в текущем потоке всё, что готово к отправке; вернуть число писем."""
+        conn = self.connect()
+        transport = self.transport()
+        total = 0
+        try:
+            while True:
+                batch = claim(conn, self.batch_size, self.lease)
+                if not batch:
+                    return total
+                self.deliver(conn, transport, batch)
+                total += len(batch)
+        finally:
+            transport.close()
+            conn.close()
+
+    def _idle(self, timeout):
+        # ждём wake() или опроса: письма мог поставить и другой процесс
+        with self._wake:
+            if not self._pending_wakeups and not self._stop.is_set():
+                self._wake.wait(timeout)
+            self._pending_wakeups = 0
+
+    def _run(self):
+        conn = self.connect()
+        transport = self.transport()
+        last_used = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                try:
+                    batch = claim(conn, self.batch_size, self.lease)
+                except sqlite3.Error as exc:
+                    log.warning('outbox claim failed: %s', exc)
+                    self._idle(self.poll_interval)
+                    continue
+                if batch:
+                    self.deliver(conn, transport, batch)
+                    last_used = time.monotonic()
+                    continue
+                if transport.is_open and time.monotonic() - last_used > self.idle_timeout:
+                    transport.close()
+                self._maybe_purge(conn)
+                self._idle(self.poll_interval)
+        except Exception:
+            log.exception('mail worker %s stopped', threading.current_thread().name)
+        finally:
+            transport.close()
+            conn.close()
+
+    def _maybe_purge(self, conn):
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + 3600
+        try:
+            purge(conn, self.keep_sent)
+        except sqlite3.Error as exc:
+            # займётся следующий поток или следующий час
+            log.info('outbox purge skipped: %s', exc)
+
+    def deliver(self, conn, transport, batch):
+        """Отправить пачку через transport и записать исход каждого письма."""
+        started = time.perf_counter()
+        sent, retry, failed = [], [], []
+        for row in batch:
+            attempts = row['attempts'] + 1
+            try:
+                transport.send(build_message(row, self.sender))
+            except Exception as exc:
+                error = f'{type(exc).__name__}: {exc}'[:500]
+                if not isinstance(exc, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                    # сеть или протокол: соединение могло оборваться — следующее письмо переподключится
+                    transport.close()
+                if is_permanent(exc) or attempts >= self.max_attempts:
+                    failed.append((attempts, error, row['id']))
+                else:
+                    delay = backoff(attempts, self.retry_base, self.retry_max)
+                    retry.append((attempts, time.time() + delay, error, row['id']))
+            else:
+                sent.append((attempts, row['id']))
+        with conn:
+            conn.executemany("UPDATE outbox SET status = 'sent', attempts = ?, last_error = NULL, "
+                             "sent_at = CURRENT_TIMESTAMP WHERE id = ?", sent)
+            conn.executemany("UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, "
+                             "last_error = ? WHERE id = ?", retry)
+            conn.executemany("UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? "
+                             "WHERE id = ?", failed)
+        self.metrics.observe('jobboard_mail_batch_size', (), len(batch))
+        self.metrics.observe('jobboard_mail_batch_seconds', (), time.perf_counter() - started)
+        for result, items in (('sent', sent), ('retry', retry), ('failed', failed)):
+            if items:
+                self.metrics.inc('jobboard_mail_deliveries_total', (('result', result),), len(items))
+        for _, error, outbox_id in failed:
+            log.error('giving up on outbox #%d: %s', outbox_id, error)
@@ -0,0 +1,20 @@
+# passwords.py - параметры хэшей паролей (без зависимостей от app.py)
+#
+# werkzeug дописывает в сохранённый хэш параметры по умолчанию: метод
+# 'pbkdf2:sha256' превращается в префикс 'pbkdf2:sha256:1000000', 'scrypt' —
+# в 'scrypt:32768:8:1'. Поэтому настроенный метод нельзя сравнивать с префиксом
+# хэша напрямую: сначала приводим его к тому виду, в каком werkzeug его сохранит.
+
+import functools
+
+from werkzeug.security import generate_password_hash
+
+@functools.lru_cache(maxsize=None)
+def hash_prefix(method):
+    """Префикс '<метод>:<параметры>', который werkzeug запишет для method."""
+    # один хэш на метод за жизнь процесса; соль и пароль на префикс не влияют
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+def needs_rehash(pwhash, method):
+    """True, если хэш посчитан не тем методом или не с теми параметрами."""
+    return pwhash.split('$', 1)[0] != hash_prefix(method)
@@ -0,0 +1,588 @@
+# schema.py - схема БД JobBoard и миграции
+#
+# Единственное место, где описана схема: её используют и app.py (при старте и
+# через `flask --app app db-upgrade`), и scripts/seed_db.py. Текущая версия
+# хранится в PRAGMA user_version, миграция N переводит БД из версии N-1 в N.
+# Выпущенные миграции не редактируем — только дописываем новые в конец.
+#
+# Каждый шаг миграции выполняется в своей короткой транзакции и должен быть
+# идемпотентным (IF NOT EXISTS, INSERT OR IGNORE): если процесс упал посреди
+# миграции, она просто повторится целиком при следующем запуске.
+
+import re
+import time
+
+# ---------- Base tables ----------
+BASE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS users (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           username TEXT UNIQUE NOT NULL,
+           password TEXT NOT NULL,
+           is_employer INTEGER DEFAULT 0,
+           email TEXT,
+           avatar TEXT,
+           about TEXT
+       )''',
+    '''CREATE TABLE IF NOT EXISTS jobs (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           author_id INTEGER,
+           title TEXT NOT NULL,
+           description TEXT NOT NULL,
+           tags TEXT,
+           salary TEXT,
+           created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           FOREIGN KEY (author_id) REFERENCES users(id)
+       )''',
+    '''CREATE TABLE IF NOT EXISTS responses (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           job_id INTEGER,
+           user_id INTEGER,
+           text TEXT,
+           contact TEXT,
+           created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           FOREIGN KEY (job_id) REFERENCES jobs(id),
+           FOREIGN KEY (user_id) REFERENCES users(id)
+       )''',
+]
+
+# Заливки существующих данных (FTS, теги) идут пачками по id, каждая пачка —
+# отдельная транзакция: писатели приложения ждут не дольше одной пачки.
+BACKFILL_BATCH = 10000
+
+def _id_batches(conn, table, batch=BACKFILL_BATCH):
+    hi = conn.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0] or 0
+    for lo in range(0, hi, batch):
+        yield lo, min(lo + batch, hi)
+
+# ---------- Full-text search ----------
+# jobs_fts — contentless FTS5-индекс по title/description/tags. unicode61 сам
+# приводит регистр (в т.ч. кириллицу), а «ё» → «е» нормализуем вручную, т.к.
+# токенизатор считает их разными буквами. Индекс поддерживается триггерами,
+# поэтому add_job/delete_job ничего о нём не знают.
+def _fts_norm(expr):
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+SEARCH_SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+           title, description, tags,
+           content='',
+           tokenize="unicode61 remove_diacritics 2 tokenchars '+#'",
+           prefix='2 3'
+       )''',
+    f'''CREATE TRIGGER IF NOT EXISTS jobs_fts_ai AFTER INSERT ON jobs BEGIN
+           INSERT INTO jobs_fts(rowid, title, description, tags)
+           VALUES (NEW.id, {_fts_norm('NEW.title')}, {_fts_norm('NEW.description')}, {_fts_norm("coalesce(NEW.tags, '')")});
+       END''',
+    f'''CREATE TRIGGER IF NOT EXISTS jobs_fts_ad AFTER DELETE ON jobs BEGIN
+           INSERT INTO jobs_fts(jobs_fts, rowid, title, description, tags)
+           VALUES ('delete', OLD.id, {_fts_norm('OLD.title')}, {_fts_norm('OLD.description')}, {_fts_norm("coalesce(OLD.tags, '')")});
+       END''',
+    f'''CREATE TRIGGER IF NOT EXISTS jobs_fts_au AFTER UPDATE OF title, description, tags ON jobs BEGIN
+           INSERT INTO jobs_fts(jobs_fts, rowid, title, description, tags)
+           VALUES ('delete', OLD.id, {_fts_norm('OLD.title')}, {_fts_norm('OLD.description')}, {_fts_norm("coalesce(OLD.tags, '')")});
+           INSERT INTO jobs_fts(rowid, title, description, tags)
+           VALUES (NEW.id, {_fts_norm('NEW.title')}, {_fts_norm('NEW.description')}, {_fts_norm("coalesce(NEW.tags, '')")});
+       END''',
+]
+
+_FTS_FILL = ("INSERT INTO jobs_fts(rowid, title, description, tags) "
+             f"""SELECT id, {_fts_norm('title')}, {_fts_norm('description')}, {_fts_norm("coalesce(tags, '')")} FROM jobs""")
+
+def rebuild_search_index(conn):
+    # contentless-таблица не поддерживает 'rebuild' — очищаем и заливаем заново
+    # (одной транзакцией вызывающего: поиск не видит полупустой индекс)
+    conn.execute("INSERT INTO jobs_fts(jobs_fts) VALUES ('delete-all')")
+    conn.execute(_FTS_FILL)
+    conn.execute("INSERT INTO jobs_fts(jobs_fts) VALUES ('optimize')")
+
+def _create_search_index(conn):
+    # Граница заливки фиксируется в той же транзакции, что и триггеры:
+    # всё, что вставят позже, проиндексирует триггер.
+    with conn:
+        hi = conn.execute('SELECT MAX(id) FROM jobs').fetchone()[0] or 0
+        for stmt in SEARCH_SCHEMA:
+            conn.execute(stmt)
+        conn.execute("INSERT INTO jobs_fts(jobs_fts) VALUES ('delete-all')")
+    for lo in range(0, hi, BACKFILL_BATCH):
+        with conn:
+            conn.execute(_FTS_FILL + ' WHERE id > ? AND id <= ?', (lo, min(lo + BACKFILL_BATCH, hi)))
+    with conn:
+        conn.execute("INSERT INTO jobs_fts(jobs_fts) VALUES ('optimize')")
+
+# ---------- Tags ----------
+# job_tags — нормализованные теги (по строке на пару вакансия/тег), jobs.tags
+# остаётся как есть для отображения. tag_counts — агрегат для фасетов,
+# поддерживается триггерами, поэтому топ тегов читается без пересчёта.
+TAG_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS job_tags (
+           job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+           tag TEXT NOT NULL,
+           PRIMARY KEY (tag, job_id)
+       ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS idx_job_tags_job ON job_tags(job_id)',
+    '''CREATE TABLE IF NOT EXISTS tag_counts (
+           tag TEXT PRIMARY KEY,
+           n INTEGER NOT NULL DEFAULT 0
+       )''',
+    'CREATE INDEX IF NOT EXISTS idx_tag_counts_n ON tag_counts(n DESC, tag)',
+    '''CREATE TRIGGER IF NOT EXISTS job_tags_ai AFTER INSERT ON job_tags BEGIN
+           INSERT INTO tag_counts(tag, n) VALUES (NEW.tag, 1)
+           ON CONFLICT(tag) DO UPDATE SET n = n + 1;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS job_tags_ad AFTER DELETE ON job_tags BEGIN
+           UPDATE tag_counts SET n = n - 1 WHERE tag = OLD.tag;
+           DELETE FROM tag_counts WHERE tag = OLD.tag AND n <= 0;
+       END''',
+    # внешние ключи в SQLite по умолчанию выключены — чистим теги триггером
+    '''CREATE TRIGGER IF NOT EXISTS jobs_tags_ad AFTER DELETE ON jobs BEGIN
+           DELETE FROM job_tags WHERE job_id = OLD.id;
+       END''',
+]
+
+def split_tags(tags):
+    # 'Python, Flask,python' -> ['python', 'flask']
+    seen = []
+    for t in (tags or '').split(','):
+        t = t.strip().casefold()
+        if t and t not in seen:
+            seen.append(t)
+    return seen
+
+def save_job_tags(conn, job_id, tags):
+    conn.executemany("INSERT OR IGNORE INTO job_tags (job_id, tag) VALUES (?, ?)",
+                     [(job_id, t) for t in split_tags(tags)])
+
+def _backfill_job_tags(conn):
+    # INSERT OR IGNORE не срабатывает на уже существующих парах (и не трогает
+    # tag_counts), поэтому повторный прогон безопасен
+    for lo, hi in _id_batches(conn, 'jobs'):
+        rows = conn.execute("SELECT id, tags FROM jobs WHERE id > ? AND id <= ? AND tags IS NOT NULL AND tags != ''",
+                            (lo, hi)).fetchall()
+        with conn:
+            for job_id, tags in rows:
+                save_job_tags(conn, job_id, tags)
+
+# ---------- Salary ----------
+# jobs.salary — свободный текст ('от 170 ₽/ч', '50 000–80 000 ₽', 'по договорённости').
+# При записи он разбирается в salary_min/salary_max/salary_currency/salary_period,
+# по которым уже можно фильтровать и сортировать индексом. Нераспознанное
+# (в т.ч. «договорная») остаётся NULL — такие вакансии в фильтр не попадают.
+SALARY_CURRENCIES = [
+    ('USD', re.compile(r'\$|usd|долл')),
+    ('EUR', re.compile(r'€|eur|евро')),
+    ('RUB', re.compile(r'₽|руб|rub|\bр\.')),
+]
+SALARY_PERIODS = [
+    ('hour', re.compile(r'/\s*ч|/\s*час|в\s*час|почасов|/\s*h(?:ou)?r?\b|per\s*hour|hourly')),
+    ('day', re.compile(r'/\s*(?:день|смен|сут|d(?:ay)?\b)|в\s*(?:день|смену)|per\s*(?:day|shift)|daily')),
+    ('month', re.compile(r'/\s*мес|в\s*мес|месяц|/\s*m(?:o|onth)?\b|per\s*month|monthly')),
+]
+# число с пробелами-разделителями тысяч и необязательным множителем «k»/«тыс.»
+_SALARY_AMOUNT = re.compile(r'(\d{1,3}(?:[ \u00a0\u202f]\d{3})+|\d+)(?:[.,](\d+))?\s*(k\b|к\b|тыс\w*\.?)?')
+_SALARY_UPTO = re.compile(r'(?:^|\s)(?:до|up\s*to|max)\s*\W*$')
+_SALARY_FROM = re.compile(r'(?:^|\s)(?:от|from|min)\s*\W*$')
+# график работы ('5/2', '2/2') — числа через косую черту никогда не зарплата
+_SALARY_SCHEDULE_BEFORE = re.compile(r'\d\s*/\s*$')
+_SALARY_SCHEDULE_AFTER = re.compile(r'\s*/\s*\d')
+# число считается суммой, если рядом валюта, «от»/«до» или тире диапазона
+_SALARY_CURRENCY_AFTER = re.compile(r'\s*(?:₽|руб|rub|р\.|\$|usd|€|eur|евро|долл)')
+_SALARY_CURRENCY_BEFORE = re.compile(r'[$€]\s*$')
+_SALARY_DASH = re.compile(r'\s*[-–—]\s*$')
+# без таких признаков число берём, только если оно похоже на сумму
+SALARY_FLOOR = 100
+
+def _salary_amounts(s):
+    # [(позиция, значение, множитель «тыс.», рядом признак суммы)]
+    amounts = []
+    for m in _SALARY_AMOUNT.finditer(s):
+        if _SALARY_SCHEDULE_BEFORE.search(s[:m.start()]) or _SALARY_SCHEDULE_AFTER.match(s, m.end(1)):
+            continue
+        value = float(re.sub(r'\D', '', m.group(1)) + '.' + (m.group(2) or '0'))
+        if value <= 0:
+            continue
+        prefix = s[:m.start()]
+        anchored = bool(m.group(3) or _SALARY_CURRENCY_AFTER.match(s, m.end())
+                        or _SALARY_CURRENCY_BEFORE.search(prefix)
+                        or _SALARY_UPTO.search(prefix) or _SALARY_FROM.search(prefix))
+        if amounts and _SALARY_DASH.fullmatch(s, amounts[-1][4], m.start()):
+            # '50 000–80 000': тире делает суммами обе границы
+            amounts[-1] = (*amounts[-1][:3], True, amounts[-1][4])
+            anchored = True
+        amounts.append((m.start(), value, bool(m.group(3)), anchored, m.end()))
+    return [a[:3] for a in amounts if a[3]] or [a[:3] for a in amounts if a[1] >= SALARY_FLOOR]
+
+def parse_salary(text):
+    """'50 000–80 000 ₽' -> (50000, 80000, 'RUB', 'month'); (None, None, None, None), если не разобрать."""
+    s = (text or '').casefold()
+    amounts = _salary_amounts(s)
+    if not amounts:
+        return None, None, None, None
+    if len(amounts) >= 2:
+        (_, a, a_k), (_, b, b_k) = amounts[:2]
+        # '80-120 тыс.' — множитель относится к обеим границам
+        low, high = sorted((round(a * 1000 if a_k or b_k else a), round(b * 1000 if b_k else b)))
+    else:
+        (pos, value, k), = amounts
+        value = round(value * 1000 if k else value)
+        prefix = s[:pos]
+        low, high = value, value
+        if _SALARY_UPTO.search(prefix):
+            low = None
+        elif _SALARY_FROM.search(prefix):
+            high = None
+    currency = next((code for code, rx in SALARY_CURRENCIES if rx.search(s)), 'RUB')
+    period = next((code for code, rx in SALARY_PERIODS if rx.search(s)), 'month')
+    return low, high, currency, period
+
+def _backfill_salaries(conn):
+    for lo, hi in _id_batches(conn, 'jobs'):
+        rows = conn.execute("SELECT id, salary FROM jobs WHERE id > ? AND id <= ? AND salary IS NOT NULL AND salary != ''",
+                            (lo, hi)).fetchall()
+        with conn:
+            conn.executemany("UPDATE jobs SET salary_min = ?, salary_max = ?, salary_currency = ?, salary_period = ? "
+                             "WHERE id = ?", [(*parse_salary(salary), job_id) for job_id, salary in rows])
+
+def _reparse_salaries(conn):
+    # после исправлений parse_salary: пишем только изменившиеся строки, чтобы
+    # не трогать rev и журнал изменений у остальных вакансий
+    for lo, hi in _id_batches(conn, 'jobs'):
+        rows = conn.execute("SELECT id, salary FROM jobs WHERE id > ? AND id <= ? AND salary IS NOT NULL AND salary != ''",
+                            (lo, hi)).fetchall()
+        with conn:
+            conn.executemany("UPDATE jobs SET salary_min = ?1, salary_max = ?2, salary_currency = ?3, salary_period = ?4 "
+                             "WHERE id = ?5 AND (salary_min IS NOT ?1 OR salary_max IS NOT ?2 "
+                             "OR salary_currency IS NOT ?3 OR salary_period IS NOT ?4)",
+                             [(*parse_salary(salary), job_id) for job_id, salary in rows])
+
+def _add_column(table, column, decl):
+    # ALTER TABLE ADD COLUMN не поддерживает IF NOT EXISTS — проверяем сами
+    def step(conn):
+        if not any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})')):
+            with conn:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {decl}')
+    return step
+
+# ---------- Response counters ----------
+# jobs.response_count/last_response_at и дневной агрегат job_response_daily
+# поддерживаются триггерами на responses, поэтому счётчики на карточках и
+# дашборд работодателя не читают таблицу откликов. Расхождения (ручные правки
+# БД, старые версии кода) чинит reconcile_response_counts().
+RESPONSE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS job_response_daily (
+           job_id INTEGER NOT NULL,
+           day TEXT NOT NULL,
+           n INTEGER NOT NULL DEFAULT 0,
+           PRIMARY KEY (job_id, day)
+       ) WITHOUT ROWID''',
+    '''CREATE TRIGGER IF NOT EXISTS responses_count_ai AFTER INSERT ON responses BEGIN
+           UPDATE jobs SET response_count = response_count + 1,
+                           last_response_at = CASE WHEN last_response_at IS NULL OR NEW.created > last_response_at
+                                                   THEN NEW.created ELSE last_response_at END
+           WHERE id = NEW.job_id;
+           INSERT INTO job_response_daily(job_id, day, n) VALUES (NEW.job_id, date(NEW.created), 1)
+           ON CONFLICT(job_id, day) DO UPDATE SET n = n + 1;
+       END''',
+    # последний отклик после удаления — один поиск по idx_responses_job(job_id, created)
+    '''CREATE TRIGGER IF NOT EXISTS responses_count_ad AFTER DELETE ON responses BEGIN
+           UPDATE jobs SET response_count = response_count - 1,
+                           last_response_at = (SELECT MAX(created) FROM responses WHERE job_id = OLD.job_id)
+           WHERE id = OLD.job_id;
+           UPDATE job_response_daily SET n = n - 1 WHERE job_id = OLD.job_id AND day = date(OLD.created);
+           DELETE FROM job_response_daily WHERE job_id = OLD.job_id AND day = date(OLD.created) AND n <= 0;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS jobs_response_daily_ad AFTER DELETE ON jobs BEGIN
+           DELETE FROM job_response_daily WHERE job_id = OLD.id;
+       END''',
+]
+
+def reconcile_response_counts(conn):
+    """Пересчитать счётчики откликов из responses пачками по id; вернуть число исправленных вакансий."""
+    repaired = 0
+    for lo, hi in _id_batches(conn, 'jobs'):
+        with conn:
+            repaired += conn.execute(
+                '''UPDATE jobs SET response_count = c.n, last_response_at = c.last
+                   FROM (SELECT jobs.id AS job_id,
+                                (SELECT COUNT(*) FROM responses WHERE job_id = jobs.id) AS n,
+                                (SELECT MAX(created) FROM responses WHERE job_id = jobs.id) AS last
+                         FROM jobs WHERE jobs.id > ? AND jobs.id <= ?) AS c
+                   WHERE jobs.id = c.job_id
+                     AND (jobs.response_count IS NOT c.n OR jobs.last_response_at IS NOT c.last)''',
+                (lo, hi)).rowcount
+            conn.execute('DELETE FROM job_response_daily WHERE job_id > ? AND job_id <= ?', (lo, hi))
+            conn.execute('''INSERT INTO job_response_daily(job_id, day, n)
+                            SELECT job_id, date(created), COUNT(*) FROM responses
+                            WHERE job_id > ? AND job_id <= ? AND job_id IN (SELECT id FROM jobs)
+                            GROUP BY job_id, date(created)''', (lo, hi))
+    with conn:
+        conn.execute('DELETE FROM job_response_daily WHERE job_id NOT IN (SELECT id FROM jobs)')
+    return repaired
+
+# ---------- Data versions ----------
+# Дешёвые валидаторы для ETag/Last-Modified: у каждой вакансии rev/updated
+# меняются при любом изменении строки (в т.ч. счётчика откликов), а
+# data_versions хранит глобальные версии ленты ('jobs') и того, что из
+# профилей видно в карточках ('users'). Всё поддерживается триггерами.
+VERSION_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS data_versions (
+           name TEXT PRIMARY KEY,
+           version INTEGER NOT NULL DEFAULT 0,
+           updated TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+       )''',
+    "INSERT OR IGNORE INTO data_versions (name) VALUES ('jobs'), ('users')",
+    # WHEN не даёт триггеру срабатывать на собственный UPDATE
+    '''CREATE TRIGGER IF NOT EXISTS jobs_rev_au AFTER UPDATE ON jobs WHEN NEW.rev IS OLD.rev BEGIN
+           UPDATE jobs SET rev = rev + 1, updated = CURRENT_TIMESTAMP WHERE id = NEW.id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS jobs_version_ai AFTER INSERT ON jobs BEGIN
+           UPDATE data_versions SET version = version + 1, updated = CURRENT_TIMESTAMP WHERE name = 'jobs';
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS jobs_version_ad AFTER DELETE ON jobs BEGIN
+           UPDATE data_versions SET version = version + 1, updated = CURRENT_TIMESTAMP WHERE name = 'jobs';
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS jobs_version_au AFTER UPDATE OF rev ON jobs WHEN NEW.rev IS NOT OLD.rev BEGIN
+           UPDATE data_versions SET version = version + 1, updated = CURRENT_TIMESTAMP WHERE name = 'jobs';
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS users_version_au AFTER UPDATE OF username, avatar ON users BEGIN
+           UPDATE data_versions SET version = version + 1, updated = CURRENT_TIMESTAMP WHERE name = 'users';
+       END''',
+]
+
+# ---------- Mail outbox ----------
+# Письма ставятся в очередь транзакцией запроса и доставляются потоками
+# mailer.MailPool. next_attempt_at (unix-время) — когда письмо можно брать:
+# для 'pending' это время следующей попытки, для 'sending' — конец аренды.
+OUTBOX_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS outbox (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           recipient TEXT NOT NULL,
+           subject TEXT NOT NULL,
+           body TEXT NOT NULL,
+           status TEXT NOT NULL DEFAULT 'pending',  -- pending | sending | sent | failed
+           attempts INTEGER NOT NULL DEFAULT 0,
+           next_attempt_at REAL NOT NULL,
+           last_error TEXT,
+           created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           sent_at TIMESTAMP
+       )''',
+    # выборка готовых писем и глубина очереди по статусам
+    'CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)',
+]
+
+# ---------- Change log ----------
+# job_changes — журнал изменений ленты для /api/jobs/changes: партнёры
+# забирают только то, что изменилось после их курсора (seq), а не весь
+# список. Пишется триггерами, поэтому add_job/delete_job о нём не знают.
+# В выдаче участвует только последняя запись по каждой вакансии, так что
+# compact_job_changes() может удалять устаревшие записи без потерь; старые
+# записи об удалении (tombstones) удаляются по сроку хранения, и курсоры
+# раньше job_changes_horizon.seq больше не обслуживаются (клиенту нужна
+# полная синхронизация). AUTOINCREMENT: seq не переиспользуется после удалений.
+_JOB_API_COLUMNS = ('title', 'description', 'tags', 'salary', 'salary_min', 'salary_max',
+                    'salary_currency', 'salary_period', 'author_id')
+
+CHANGE_LOG_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS job_changes (
+           seq INTEGER PRIMARY KEY AUTOINCREMENT,
+           job_id INTEGER NOT NULL,
+           op TEXT NOT NULL,  -- upsert | delete
+           changed TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+       )''',
+    # последняя запись по вакансии и сжатие журнала
+    'CREATE INDEX IF NOT EXISTS idx_job_changes_job ON job_changes(job_id, seq)',
+    '''CREATE TABLE IF NOT EXISTS job_changes_horizon (
+           id INTEGER PRIMARY KEY CHECK (id = 1),
+           seq INTEGER NOT NULL
+       )''',
+    'INSERT OR IGNORE INTO job_changes_horizon (id, seq) VALUES (1, 0)',
+    '''CREATE TRIGGER IF NOT EXISTS jobs_changes_ai AFTER INSERT ON jobs BEGIN
+           INSERT INTO job_changes (job_id, op) VALUES (NEW.id, 'upsert');
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS jobs_changes_ad AFTER DELETE ON jobs BEGIN
+           INSERT INTO job_changes (job_id, op) VALUES (OLD.id, 'delete');
+       END''',
+    # только поля, видимые в API: счётчик откликов меняет rev, но партнёрам он не нужен
+    f'''CREATE TRIGGER IF NOT EXISTS jobs_changes_au AFTER UPDATE OF {', '.join(_JOB_API_COLUMNS)} ON jobs
+       WHEN {' OR '.join(f'NEW.{c} IS NOT OLD.{c}' for c in _JOB_API_COLUMNS)} BEGIN
+           INSERT INTO job_changes (job_id, op) VALUES (NEW.id, 'upsert');
+       END''',
+    # author в выдаче — имя пользователя
+    '''CREATE TRIGGER IF NOT EXISTS users_changes_au AFTER UPDATE OF username ON users
+       WHEN NEW.username IS NOT OLD.username BEGIN
+           INSERT INTO job_changes (job_id, op) SELECT id, 'upsert' FROM jobs WHERE author_id = NEW.id;
+       END''',
+]
+
+def _backfill_job_changes(conn):
+    # по записи на каждую существующую вакансию: с since=0 журнал — полный снимок
+    for lo, hi in _id_batches(conn, 'jobs'):
+        with conn:
+            conn.execute("INSERT INTO job_changes (job_id, op) SELECT id, 'upsert' FROM jobs "
+                         "WHERE id > ? AND id <= ? "
+                         "AND NOT EXISTS (SELECT 1 FROM job_changes c WHERE c.job_id = jobs.id) ORDER BY id",
+                         (lo, hi))
+
+def compact_job_changes(conn, retention_days, batch=BACKFILL_BATCH):
+    """Сжать журнал изменений; вернуть (удалено записей, новый горизонт)."""
+    removed = 0
+    top = conn.execute('SELECT MAX(seq) FROM job_changes').fetchone()[0] or 0
+    for lo in range(0, top, batch):
+        # записи, перекрытые более поздней записью о той же вакансии
+        with conn:
+            removed += conn.execute(
+                "DELETE FROM job_changes WHERE seq > ? AND seq <= ? AND EXISTS ("
+                " SELECT 1 FROM job_changes d WHERE d.job_id = job_changes.job_id AND d.seq > job_changes.seq)",
+                (lo, lo + batch)).rowcount
+    # удаления старше срока хранения: курсоры до них становятся недействительными
+    with conn:
+        expired = conn.execute("SELECT MAX(seq) FROM job_changes WHERE op = 'delete' "
+                               "AND changed < datetime('now', ?)", (f'-{int(retention_days)} days',)).fetchone()[0]
+        if expired is not None:
+            removed += conn.execute("DELETE FROM job_changes WHERE op = 'delete' AND seq <= ?",
+                                    (expired,)).rowcount
+            conn.execute('UPDATE job_changes_horizon SET seq = MAX(seq, ?) WHERE id = 1', (expired,))
+        horizon = conn.execute('SELECT seq FROM job_changes_horizon WHERE id = 1').fetchone()[0]
+    return removed, horizon
+
+# ---------- Incremental vacuum ----------
+# Архивирование (archive.py) удаляет из горячей БД целые пачки вакансий;
+# с auto_vacuum = INCREMENTAL освободившиеся страницы можно вернуть ОС
+# порциями (PRAGMA incremental_vacuum), не перестраивая файл. Сменить режим у
+# уже созданной БД можно только полным VACUUM — один раз, при этой миграции;
+# он держит эксклюзивную блокировку на всё время перестройки, поэтому миграция
+# в OFFLINE_MIGRATIONS: при старте воркера она не применяется, только
+# `flask db-upgrade` (в окно обслуживания).
+def _enable_incremental_vacuum(conn):
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+
+# ---------- Migrations ----------
+# (версия, описание, шаги). Шаг — SQL-строка (выполняется в своей транзакции)
+# или функция conn -> None, которая сама управляет транзакциями.
+MIGRATIONS = [
+    (1, 'base tables', BASE_SCHEMA),
+    (2, 'full-text search index', [_create_search_index]),
+    (3, 'normalized tags and tag counts', TAG_SCHEMA + [_backfill_job_tags]),
+    (4, 'hot-path indexes', [
+        # лента вакансий: ORDER BY created DESC, id DESC + keyset-пагинация
+        'CREATE INDEX IF NOT EXISTS idx_jobs_created_id ON jobs(created, id)',
+        # отклики на странице вакансии (job_detail) и удаление вакансии
+        'CREATE INDEX IF NOT EXISTS idx_responses_job ON responses(job_id, created)',
+        # отклики пользователя в профиле
+        'CREATE INDEX IF NOT EXISTS idx_responses_user ON responses(user_id, created)',
+        # вакансии работодателя в профиле
+        'CREATE INDEX IF NOT EXISTS idx_jobs_author ON jobs(author_id, created)',
+        # сброс пароля по email
+        'CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)',
+    ]),
+    (5, 'structured salary columns', [
+        _add_column('jobs', 'salary_min', 'INTEGER'),
+        _add_column('jobs', 'salary_max', 'INTEGER'),
+        _add_column('jobs', 'salary_currency', 'TEXT'),
+        _add_column('jobs', 'salary_period', 'TEXT'),
+        _backfill_salaries,
+        # фильтр «от» и сортировка «выше зарплата»: верхняя граница вилки
+        'CREATE INDEX IF NOT EXISTS idx_jobs_salary_top ON jobs(salary_currency, salary_period, '
+        'COALESCE(salary_max, salary_min))',
+        # фильтр «до»: нижняя граница вилки
+        'CREATE INDEX IF NOT EXISTS idx_jobs_salary_bottom ON jobs(salary_currency, salary_period, '
+        'COALESCE(salary_min, salary_max))',
+    ]),
+    (6, 'response counters and daily aggregate', [
+        _add_column('jobs', 'response_count', 'INTEGER NOT NULL DEFAULT 0'),
+        _add_column('jobs', 'last_response_at', 'TIMESTAMP'),
+        *RESPONSE_SCHEMA,
+        # триггеры уже работают — пересчёт по пачкам даёт точные абсолютные значения
+        reconcile_response_counts,
+    ]),
+    (7, 'row revisions and data versions', [
+        _add_column('jobs', 'rev', 'INTEGER NOT NULL DEFAULT 0'),
+        _add_column('jobs', 'updated', 'TIMESTAMP'),  # NULL — не менялась с created
+        *VERSION_SCHEMA,
+    ]),
+    (8, 'mail outbox', OUTBOX_SCHEMA),
+    (9, 'job change log', CHANGE_LOG_SCHEMA + [_backfill_job_changes]),
+    (10, 'incremental auto-vacuum', [_enable_incremental_vacuum]),
+    (11, 'reparse salaries (work schedules are not amounts)', [_reparse_salaries]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Миграции, которые блокируют БД на время, пропорциональное её размеру.
+# migrate(..., offline=False) (старт приложения) их откладывает: версия схемы
+# идёт дальше, следующие миграции применяются, а отложенная записывается в
+# schema_deferred и ждёт явного `flask db-upgrade`. Поэтому от результата
+# офлайн-миграции не может зависеть ни одна следующая.
+OFFLINE_MIGRATIONS = {10}
+
+DEFERRED_SCHEMA = 'CREATE TABLE IF NOT EXISTS schema_deferred (version INTEGER PRIMARY KEY)'
+
+# Настройки соединения на время миграции: CREATE INDEX сортирует ключи во
+# внешней сортировке — с потоками-помощниками и большим кэшем она идёт в разы
+# быстрее, а значит, меньше держит блокировку записи. Читателей WAL не блокирует.
+BUILD_THREADS = 4
+BUILD_CACHE_SIZE = -262144   # KiB, ~256 МБ
+
+class SchemaTooNew(RuntimeError):
+    pass
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def deferred_migrations(conn):
+    """Версии офлайн-миграций, отложенных при старте приложения."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_deferred'").fetchone():
+        return set()
+    return {row[0] for row in conn.execute('SELECT version FROM schema_deferred')}
+
+def pending_migrations(conn, target=None):
+    target = LATEST_VERSION if target is None else target
+    current = schema_version(conn)
+    if current > LATEST_VERSION:
+        raise SchemaTooNew(f'database schema v{current} is newer than this code (v{LATEST_VERSION})')
+    deferred = deferred_migrations(conn)
+    return [m for m in MIGRATIONS if (current < m[0] or m[0] in deferred) and m[0] <= target]
+
+def migrate(conn, target=None, log=print, offline=True):
+    """Применить недостающие миграции (до target включительно), вернуть версию схемы.
+
+    offline=False — отложить OFFLINE_MIGRATIONS (остальные применяются).
+    """
+    pending = pending_migrations(conn, target)
+    deferred = deferred_migrations(conn)
+    if not offline:
+        pending = [m for m in pending if m[0] not in deferred]
+    if not pending:
+        return schema_version(conn)
+    cache_size = conn.execute('PRAGMA cache_size').fetchone()[0]
+    conn.execute(f'PRAGMA threads = {BUILD_THREADS}')
+    conn.execute(f'PRAGMA cache_size = {BUILD_CACHE_SIZE}')
+    try:
+        for version, description, steps in pending:
+            started = time.perf_counter()
+            if not offline and version in OFFLINE_MIGRATIONS:
+                with conn:
+                    conn.execute(DEFERRED_SCHEMA)
+                    conn.execute('INSERT OR IGNORE INTO schema_deferred (version) VALUES (?)', (version,))
+                    conn.execute(f'PRAGMA user_version = {version}')
+                log(f'schema v{version}: {description} deferred until `flask db-upgrade`')
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    with conn:
+                        conn.execute(step)
+            with conn:
+                if version in deferred:
+                    # отложенная миграция догоняется под уже более новой версией схемы
+                    conn.execute('DELETE FROM schema_deferred WHERE version = ?', (version,))
+                else:
+                    conn.execute(f'PRAGMA user_version = {version}')
+            log(f'schema v{version}: {description} ({time.perf_counter() - started:.1f}s)')
+    finally:
+        conn.execute('PRAGMA threads = 0')
+        conn.execute(f'PRAGMA cache_size = {cache_size}')
+    return schema_version(conn)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark for the JobBoard routes at several data scales.
+
+Builds (and caches) databases with `seed_db.py`'s generator, then drives the
+real Flask routes twice: in-process through the Flask test client and over
+HTTP through a local threaded server with a multi-threaded load driver.
+For every scale/mode/route it reports throughput, p50/p95/p99 latency,
+SQL statements per request and resident memory after each route.
+
+Usage:
+  python scripts/bench.py                          # scales 1k,100k
+  python scripts/bench.py --scales 1k,100k,1m --save bench/results.json
+  python scripts/bench.py --baseline bench/baseline.json --threshold 0.15
+
+With --baseline the run exits with status 1 if any route got slower (p95) or
+lost throughput by more than --threshold compared to the baseline file.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed_db  # noqa: E402
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+PASSWORD = 'password123'
+
+
+# ---------- Data ----------
+def build_database(scale, data_dir, seed, rebuild=False):
+    """Return the path of a cached seeded DB for `scale`, generating it if needed."""
+    jobs = SCALES[scale]
+    path = os.path.join(data_dir, f'bench-{scale}-seed{seed}.db')
+    if rebuild or not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        seed_db.main(['--db', path, '--users', str(max(jobs // 10, 100)), '--jobs', str(jobs),
+                      '--responses', str(jobs * 2), '--seed', str(seed)])
+    return path
+
+def working_copy(path, data_dir, scale):
+    # Прогон пишет в БД (отклики, логины), поэтому работаем с копией. Имя своё
+    # для каждого масштаба: пул приложения пересоздаётся только при смене пути.
+    dst = os.path.join(data_dir, f'bench-run-{scale}.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(dst + suffix):
+            os.remove(dst + suffix)
+    shutil.copyfile(path, dst)
+    return dst
+
+def sample_targets(db_path, rng, n=200):
+    conn = sqlite3.connect(db_path)
+    try:
+        max_id = conn.execute('SELECT MAX(id) FROM jobs').fetchone()[0]
+        job_ids = [row[0] for row in conn.execute(
+            'SELECT id FROM jobs WHERE id IN (%s)' % ','.join('?' * n),
+            [rng.randint(1, max_id) for _ in range(n)])]
+        employers = [row[0] for row in conn.execute(
+            'SELECT username FROM users WHERE is_employer = 1 LIMIT ?', (n,))]
+        worker = conn.execute('SELECT username FROM users WHERE is_employer = 0 LIMIT 1').fetchone()[0]
+    finally:
+        conn.close()
+    return job_ids, employers, worker
+
+def route_plan(job_ids, employers, worker, rng):
+    """Список сценариев: имя -> (метод, функция, выдающая путь, тело формы, нужен ли вход)."""
+    words = ['python', 'курьер', 'разработчик', 'бариста', 'remote', 'склад']
+    return {
+        '/': ('GET', lambda: '/', None, False),
+        '/?q=': ('GET', lambda: '/?' + urllib.parse.urlencode({'q': rng.choice(words)}), None, False),
+        '/job/<id>': ('GET', lambda: f'/job/{rng.choice(job_ids)}', None, False),
+        '/profile/<username>': ('GET', lambda: f'/profile/{rng.choice(employers)}', None, False),
+        '/api/jobs': ('GET', lambda: '/api/jobs', None, False),
+        '/login': ('POST', lambda: '/login', {'username': worker, 'password': PASSWORD}, False),
+        '/respond/<id>': ('POST', lambda: f'/respond/{rng.choice(job_ids)}',
+                          {'text': 'Benchmark response', 'contact': 'bench@example.com'}, True),
+    }
+
+
+# ---------- Measurement ----------
+class StatementCounter:
+    """Считает SQL-выражения, выполненные в обработчиках запросов.
+
+    Фоновые потоки приложения (писатель, почта, индекс подсказок) открывают
+    соединения той же функцией, но их выражения к запросам не относятся —
+    считаем только то, что выполняется внутри контекста запроса.
+    """
+
+    def __init__(self, app_module):
+        from flask import has_request_context
+
+        self.count = 0
+        self._lock = threading.Lock()
+        self._in_request = has_request_context
+        original = app_module.open_connection
+
+        def open_traced(*args, **kwargs):
+            conn = original(*args, **kwargs)
+            conn.set_trace_callback(self._trace)
+            return conn
+        app_module.open_connection = open_traced
+
+    def _trace(self, sql):
+        # строки с '--' — выражения внутри триггеров
+        if not sql.startswith('--') and self._in_request():
+            with self._lock:
+                self.count += 1
+
+def current_rss_kb():
+    """Resident memory of this process right now, in KiB (None if unknown).
+
+    Not ru_maxrss: that is the peak over the whole run, so every route and
+    scale after the biggest one would report the same number.
+    """
+    try:
+        with open('/proc/self/statm') as f:  # Linux
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + \
+                       [(name, ctypes.c_size_t) for name in (
+                           'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                           'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage',
+                           'PagefileUsage', 'PeakPagefileUsage')]
+        counters = Counters(cb=ctypes.sizeof(Counters))
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize // 1024
+        return None
+    try:
+        import psutil  # macOS и прочие: если установлен
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss // 1024
+
+def summarize(latencies, elapsed, errors, statements=None):
+    latencies = sorted(latencies)
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0] if latencies else 0.0
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(p50 * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'p99_ms': round(p99 * 1000, 3),
+        'rss_kb': current_rss_kb(),
+    }
+    if statements is not None:
+        result['sql_per_request'] = round(statements / len(latencies), 2) if latencies else 0.0
+    return result
+
+def bench_client(app, plan, counter, n):
+    results = {}
+    anon = app.test_client()
+    authed = app.test_client()
+    worker = plan['/login'][2]
+    authed.post('/login', data=worker)
+    for name, (method, path_fn, form, login) in plan.items():
+        client = authed if login else anon
+        latencies, errors = [], 0
+        statements_before = counter.count
+        started = time.perf_counter()
+        for _ in range(n):
+            t0 = time.perf_counter()
+            resp = client.open(path_fn(), method=method, data=form)
+            latencies.append(time.perf_counter() - t0)
+            if resp.status_code >= 400:
+                errors += 1
+            resp.close()
+        elapsed = time.perf_counter() - started
+        results[name] = summarize(latencies, elapsed, errors, counter.count - statements_before)
+        print(f'    client {name:22s} {results[name]["throughput_rps"]:>9} rps  '
+              f'p95 {results[name]["p95_ms"]:>8} ms  sql/req {results[name]["sql_per_request"]}')
+    return results
+
+def _http_login(port, form):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('POST', '/login', urllib.parse.urlencode(form),
+                 {'Content-Type': 'application/x-www-form-urlencoded'})
+    resp = conn.getresponse()
+    resp.read()
+    cookie = resp.getheader('Set-Cookie', '').split(';', 1)[0]
+    conn.close()
+    return cookie
+
+def bench_http(app, plan, counter, n, concurrency):
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # без access-лога на каждый запрос
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    port = server.server_port
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    results = {}
+    try:
+        cookie = _http_login(port, plan['/login'][2])
+        for name, (method, path_fn, form, login) in plan.items():
+            paths = [path_fn() for _ in range(n)]
+            body = urllib.parse.urlencode(form) if form else None
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+            if login:
+                headers['Cookie'] = cookie
+            latencies, errors = [], [0]
+            lock = threading.Lock()
+
+            def worker(chunk):
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                local = []
+                for path in chunk:
+                    t0 = time.perf_counter()
+                    try:
+                        conn.request(method, path, body, headers)
+                        resp = conn.getresponse()
+                        resp.read()
+                        failed = resp.status >= 400
+                        if resp.getheader('Connection', '').lower() == 'close':
+                            conn.close()
+                    except (OSError, http.client.HTTPException):
+                        failed = True
+                        conn.close()
+                    local.append(time.perf_counter() - t0)
+                    if failed:
+                        with lock:
+                            errors[0] += 1
+                conn.close()
+                with lock:
+                    latencies.extend(local)
+
+            chunks = [paths[i::concurrency] for i in range(concurrency)]
+            threads = [threading.Thread(target=worker, args=(c,)) for c in chunks if c]
+            statements_before = counter.count
+            started = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - started
+            results[name] = summarize(latencies, elapsed, errors[0], counter.count - statements_before)
+            print(f'    http   {name:22s} {results[name]["throughput_rps"]:>9} rps  '
+                  f'p95 {results[name]["p95_ms"]:>8} ms  errors {errors[0]}')
+    finally:
+        server.shutdown()
+        thread.join()
+    return results
+
+
+# ---------- Baseline comparison ----------
+def compare(results, baseline, threshold):
+    """Вернуть список регрессий относительно baseline (p95 вырос / rps упал больше порога)."""
+    regressions = []
+    for scale, modes in results.items():
+        for mode, routes in modes.items():
+            for route, cur in routes.items():
+                base = baseline.get(scale, {}).get(mode, {}).get(route)
+                if not base:
+                    continue
+                if base['p95_ms'] and cur['p95_ms'] > base['p95_ms'] * (1 + threshold):
+                    regressions.append(f'{scale} {mode} {route}: p95 {base["p95_ms"]} -> {cur["p95_ms"]} ms')
+                if base['throughput_rps'] and cur['throughput_rps'] < base['throughput_rps'] * (1 - threshold):
+                    regressions.append(f'{scale} {mode} {route}: throughput {base["throughput_rps"]} -> {cur["throughput_rps"]} rps')
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark JobBoard routes at several data scales.')
+    parser.add_argument('--scales', default='1k,100k', help=f'comma-separated, from {",".join(SCALES)}')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route and mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='HTTP load driver threads')
+    parser.add_argument('--modes', default='client,http', help='client, http or both')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.path.join(PROJECT_ROOT, 'bench_data'))
+    parser.add_argument('--rebuild', action='store_true', help='regenerate cached databases')
+    parser.add_argument('--no-cache', action='store_true', help='disable in-process page/user caches')
+    parser.add_argument('--save', help='write results JSON to this path')
+    parser.add_argument('--baseline', help='compare against this results JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative regression')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scales = [s.strip() for s in args.scales.split(',') if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        raise SystemExit(f'Unknown scale(s): {", ".join(unknown)}')
+    modes = [m.strip() for m in args.modes.split(',')]
+
+    dbs = {scale: build_database(scale, args.data_dir, args.seed, args.rebuild) for scale in scales}
+    # Приложение читает JOBS_DB при импорте — импортируем после подготовки данных
+    os.environ['JOBS_DB'] = working_copy(dbs[scales[0]], args.data_dir, scales[0])
+    import app as app_module
+
+    app = app_module.app
+    app.config['WTF_CSRF_ENABLED'] = False
+    counter = StatementCounter(app_module)
+    results = {}
+    for i, scale in enumerate(scales):
+        if i:
+            app.config['DATABASE'] = working_copy(dbs[scale], args.data_dir, scale)
+        app_module.init_db()
+        app_module.fragment_cache.clear()
+        app_module.user_cache.clear()
+        if args.no_cache:
+            app_module.fragment_cache.maxsize = 0
+            app.config['USER_CACHE_TTL'] = 0
+        rng = random.Random(args.seed)
+        job_ids, employers, worker = sample_targets(app.config['DATABASE'], rng)
+        plan = route_plan(job_ids, employers, worker, rng)
+        print(f'== scale {scale} ({SCALES[scale]} jobs)')
+        results[scale] = {}
+        if 'client' in modes:
+            results[scale]['client'] = bench_client(app, plan, counter, args.requests)
+        if 'http' in modes:
+            results[scale]['http'] = bench_http(app, plan, counter, args.requests, args.concurrency)
+    app_module.hasher.shutdown()
+
+    report = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'no_cache': args.no_cache,
+        },
+        'results': results,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print('Results saved to', args.save)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'REGRESSIONS (threshold {args.threshold:.0%}):')
+            for line in regressions:
+                print('  ' + line)
+            return 1
+        print(f'No regressions against {args.baseline} (threshold {args.threshold:.0%})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
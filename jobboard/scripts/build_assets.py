@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Build fingerprinted, precompressed static assets into `static/dist/`.
+
+Usage (PowerShell):
+  python scripts\build_assets.py              # vendor CDN files (once), then build
+  python scripts\build_assets.py --no-vendor  # offline: build from what is in static/
+
+Run it on every deploy; restart the app afterwards so it picks up the new
+`static/dist/manifest.json`. The build writes next to the previous one and
+swaps the manifest last, so an app still running on the old manifest keeps
+serving its hashed files; files of older builds are pruned. Install `brotli`
+to also get `.br` files.
+"""
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+import assets  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Vendor, fingerprint and precompress static assets.')
+    parser.add_argument('--static', default=os.path.join(PROJECT_ROOT, 'static'), help='static directory')
+    parser.add_argument('--no-vendor', action='store_true', help='do not download missing CDN files')
+    args = parser.parse_args(argv)
+    if not args.no_vendor:
+        assets.vendor(args.static)
+    assets.build(args.static)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,66 +6,255 @@ Usage (PowerShell):
   # or set a different DB path via JOBS_DB env var
   $env:JOBS_DB = 'C:\path\to\jobs.db'; python scripts\seed_db.py
 
+Generator mode for load testing — deterministic synthetic data of any size:
+  python scripts\seed_db.py --users 100000 --jobs 1000000 --responses 3000000 --seed 42
+
+Generated timestamps end at a fixed epoch (EPOCH, or `--epoch YYYY-MM-DD`),
+so the same seed gives the same database on any day.
+
 This script is safe for development: it removes the existing `jobs.db` file
 before creating a fresh database with schema and sample rows.
 """
+import argparse
+import itertools
 import os
+import random
 import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash
 
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 DB_PATH = os.environ.get('JOBS_DB', os.path.join(PROJECT_ROOT, 'jobs.db'))
+# Опорная дата синтетических данных: все created лежат в [EPOCH - years, EPOCH).
+# Не «сегодня» — иначе один seed давал бы каждый день другую БД и результаты
+# бенчмарков нельзя было бы сравнить.
+EPOCH = '2025-01-01'
+
+sys.path.insert(0, PROJECT_ROOT)
+import schema  # noqa: E402  (схема общая с app.py)
+
+
+# ---------- Synthetic data ----------
+# Словари для генератора. Порядок тегов важен: вес тега ~ 1 / rank**1.1
+# (распределение Ципфа), как на живой доске — несколько очень частых тегов
+# и длинный хвост редких.
+ROLES = [
+    ('Бариста', 'Barista', 'кафе'), ('Курьер', 'Courier', 'доставка'),
+    ('Официант', 'Waiter', 'кафе'), ('Продавец-консультант', 'Sales assistant', 'продажи'),
+    ('Python-разработчик', 'Python developer', 'python'), ('Front-end разработчик', 'Front-end developer', 'frontend'),
+    ('Backend-разработчик', 'Backend developer', 'backend'), ('Тестировщик', 'QA engineer', 'qa'),
+    ('Контент-менеджер', 'Content manager', 'контент'), ('SMM-специалист', 'SMM specialist', 'маркетинг'),
+    ('Дизайнер', 'Designer', 'дизайн'), ('Репетитор по математике', 'Math tutor', 'обучение'),
+    ('Администратор', 'Administrator', 'офис'), ('Грузчик', 'Loader', 'склад'),
+    ('Кладовщик', 'Warehouse worker', 'склад'), ('Оператор call-центра', 'Call center operator', 'поддержка'),
+    ('Водитель', 'Driver', 'доставка'), ('Промоутер', 'Promoter', 'маркетинг'),
+    ('Data analyst', 'Data analyst', 'аналитика'), ('DevOps-инженер', 'DevOps engineer', 'devops'),
+]
+MODIFIERS_RU = ['подработка', 'удалённо', 'junior', 'middle', 'вечерние смены', 'выходные', 'стажёр', 'гибкий график']
+MODIFIERS_EN = ['part-time', 'remote', 'junior', 'middle', 'evenings', 'weekends', 'intern', 'flexible hours']
+TAGS = [
+    'python', 'доставка', 'кафе', 'удалённо', 'гибкий график', 'javascript', 'react', 'продажи', 'склад',
+    'маркетинг', 'frontend', 'backend', 'flask', 'django', 'sql', 'обучение', 'контент', 'дизайн', 'qa',
+    'поддержка', 'офис', 'аналитика', 'devops', 'docker', 'linux', 'excel', 'figma', 'vue', 'typescript',
+    'go', 'java', 'php', 'ночные смены', 'студентам', 'без опыта', 'english', 'английский', 'водитель',
+    'самокат', 'бариста', 'официант', 'репетитор', 'smm', 'копирайтинг', 'перевод', 'фото', 'видео',
+]
+SENTENCES_RU = [
+    'Требуется {role} на неполный рабочий день.', 'Обучение бесплатно, гибкий график.',
+    'Оплата еженедельно, возможны бонусы.', 'Опыт не обязателен, всему научим.',
+    'Дружная команда и удобное расположение офиса.', 'Работа рядом с метро.',
+    'Оформление по договору ГПХ или самозанятость.', 'Рассмотрим студентов старших курсов.',
+    'Требуется знание {tag} на базовом уровне.', 'Будет плюсом опыт работы с {tag}.',
+    'Смены по 4–6 часов, график обсуждается.', 'Предоставляем форму и питание.',
+]
+SENTENCES_EN = [
+    'We are looking for a {role} to join our team.', 'Flexible schedule, paid training.',
+    'Weekly payouts and performance bonuses.', 'No prior experience required.',
+    'Basic knowledge of {tag} is required.', 'Experience with {tag} is a plus.',
+    'Friendly team and a modern office downtown.', 'Remote work is possible.',
+]
+REPLIES = [
+    'Здравствуйте! Есть опыт, могу приступить с понедельника.', 'Готов работать по вечерам и в выходные.',
+    'Интересная вакансия, хочу попробовать.', 'Hi! I have relevant experience and flexible hours.',
+    'Студент, ищу подработку, быстро учусь.', 'Есть опыт {tag}, резюме вышлю по запросу.',
+]
+
+def _zipf_weights(n, s=1.1):
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+TAG_WEIGHTS = list(itertools.accumulate(_zipf_weights(len(TAGS))))
+ROLE_WEIGHTS = list(itertools.accumulate(_zipf_weights(len(ROLES), 0.8)))
+
+
+def _spaced(n):
+    # 50000 -> '50 000'
+    return f'{n:,}'.replace(',', ' ')
+
+def random_salary(rng):
+    kind = rng.random()
+    if kind < 0.12:
+        return rng.choice(['по договорённости', 'договорная', '', 'negotiable'])
+    if kind < 0.35:
+        hourly = rng.randrange(150, 900, 10)
+        return rng.choice([f'от {hourly} ₽/ч', f'{hourly} ₽/час', f'{hourly}–{hourly + rng.randrange(50, 300, 10)} ₽/ч'])
+    low = rng.randrange(20, 250) * 1000
+    high = low + rng.randrange(5, 120) * 1000
+    return rng.choice([
+        f'от {_spaced(low)} ₽', f'до {_spaced(high)} ₽', f'{_spaced(low)}–{_spaced(high)} ₽',
+        f'{low // 1000}k–{high // 1000}k ₽', f'${low // 90}–${high // 90}', f'{_spaced(low)} руб.',
+    ])
+
+def random_job(rng, author_id, created):
+    ru_title, en_title, main_tag = rng.choices(ROLES, cum_weights=ROLE_WEIGHTS)[0]
+    english = rng.random() < 0.25
+    if english:
+        title = f'{en_title} ({rng.choice(MODIFIERS_EN)})'
+    else:
+        title = f'{ru_title} ({rng.choice(MODIFIERS_RU)})' if rng.random() < 0.7 else ru_title
+    tags = {main_tag}
+    tags.update(rng.choices(TAGS, cum_weights=TAG_WEIGHTS, k=rng.randint(1, 4)))
+    tag = rng.choice(sorted(tags))
+    sentences = SENTENCES_EN if english else SENTENCES_RU
+    description = ' '.join(s.format(role=(en_title if english else ru_title).lower(), tag=tag)
+                           for s in rng.sample(sentences, rng.randint(2, 5)))
+    return (author_id, title, description, ','.join(sorted(tags)), random_salary(rng), created)
+
+def _ts(dt):
+    # тот же формат, что у CURRENT_TIMESTAMP в SQLite
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+def _batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _bulk_insert(conn, sql, rows, total, label, batch_size):
+    started = time.perf_counter()
+    done = 0
+    for chunk in _batched(rows, batch_size):
+        conn.executemany(sql, chunk)
+        conn.commit()
+        done += len(chunk)
+        if total >= batch_size * 4:
+            print(f'  {label}: {done}/{total}', end='\r', flush=True)
+    elapsed = time.perf_counter() - started
+    print(f'  {label}: {done} rows in {elapsed:.1f}s' + ' ' * 20)
+
+def generate(conn, users, jobs, responses, seed, years=4, batch_size=50000, epoch=EPOCH):
+    """Детерминированно заполнить БД синтетическими данными (для нагрузочных тестов)."""
+    rng = random.Random(seed)
+    now = datetime.strptime(epoch, '%Y-%m-%d')
+    span = int(timedelta(days=365 * years).total_seconds())
+
+    # Быстрая заливка: журнал в памяти, без fsync, эксклюзивная блокировка.
+    # После загрузки возвращаем WAL — с ним работает приложение.
+    conn.execute('PRAGMA journal_mode = MEMORY')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA locking_mode = EXCLUSIVE')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA cache_size = -262144')
 
+    # Хэш считается один раз — у всех сгенерированных пользователей пароль 'password123'
+    pwd_hash = generate_password_hash('password123')
+    first_user_id = (conn.execute('SELECT MAX(id) FROM users').fetchone()[0] or 0) + 1
+    employer_ids = []
+    worker_ids = []
+
+    def user_rows():
+        for i in range(users):
+            uid = first_user_id + i
+            is_employer = 1 if rng.random() < 0.1 else 0
+            (employer_ids if is_employer else worker_ids).append(uid)
+            name = f'{"employer" if is_employer else "user"}{uid}'
+            yield (name, pwd_hash, is_employer, f'{name}@example.com', None)
+
+    print(f'Generating {users} users, {jobs} jobs, {responses} responses (seed={seed})')
+    _bulk_insert(conn, "INSERT INTO users (username, password, is_employer, email, about) VALUES (?, ?, ?, ?, ?)",
+                 user_rows(), users, 'users', batch_size)
+    if not employer_ids:
+        employer_ids = [row[0] for row in conn.execute('SELECT id FROM users WHERE is_employer = 1')]
+    if not worker_ids:
+        worker_ids = [row[0] for row in conn.execute('SELECT id FROM users WHERE is_employer = 0')]
+    if jobs and not employer_ids:
+        raise SystemExit('No employers to author jobs: increase --users')
+
+    first_job_id = (conn.execute('SELECT MAX(id) FROM jobs').fetchone()[0] or 0) + 1
+    job_created = []  # created (в секундах от начала окна) по порядку id — нужен откликам
+
+    def job_rows():
+        for _ in range(jobs):
+            offset = rng.randrange(span)
+            job_created.append(offset)
+            created = now - timedelta(seconds=span - offset)
+            yield random_job(rng, rng.choice(employer_ids), _ts(created))
+
+    _bulk_insert(conn, "INSERT INTO jobs (author_id, title, description, tags, salary, created) VALUES (?, ?, ?, ?, ?, ?)",
+                 job_rows(), jobs, 'jobs', batch_size)
+
+    if responses and (not job_created or not worker_ids):
+        raise SystemExit('Responses need generated jobs and workers: increase --jobs/--users')
+
+    def response_rows():
+        n_jobs = len(job_created)
+        for _ in range(responses):
+            # перекос популярности: на небольшую долю вакансий приходится большинство откликов
+            idx = min(int(n_jobs * rng.random() ** 3), n_jobs - 1)
+            user_id = rng.choice(worker_ids)
+            offset = min(job_created[idx] + rng.randrange(30 * 24 * 3600), span)
+            created = now - timedelta(seconds=span - offset)
+            text = rng.choice(REPLIES).format(tag=rng.choice(TAGS))
+            yield (first_job_id + idx, user_id, text, f'user{user_id}@example.com', _ts(created))
 
-SCHEMA_SQL = '''
-CREATE TABLE users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL,
-    is_employer INTEGER DEFAULT 0,
-    email TEXT,
-    avatar TEXT,
-    about TEXT
-);
-
-CREATE TABLE jobs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    author_id INTEGER,
-    title TEXT NOT NULL,
-    description TEXT NOT NULL,
-    tags TEXT,
-    salary TEXT,
-    created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (author_id) REFERENCES users(id)
-);
-
-CREATE TABLE responses (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    job_id INTEGER,
-    user_id INTEGER,
-    text TEXT,
-    contact TEXT,
-    created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (job_id) REFERENCES jobs(id),
-    FOREIGN KEY (user_id) REFERENCES users(id)
-);
-'''
-
-
-def main():
-    if os.path.exists(DB_PATH):
-        print(f'Removing existing DB: {DB_PATH}')
-        os.remove(DB_PATH)
-
-    conn = sqlite3.connect(DB_PATH)
+    _bulk_insert(conn, "INSERT INTO responses (job_id, user_id, text, contact, created) VALUES (?, ?, ?, ?, ?)",
+                 response_rows(), responses, 'responses', batch_size)
+
+    conn.execute('PRAGMA locking_mode = NORMAL')
+    conn.execute('PRAGMA journal_mode = WAL')
+
+
+def _epoch(value):
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected YYYY-MM-DD, got {value!r}')
+    return value
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Create jobs.db with demo or synthetic data.')
+    parser.add_argument('--users', type=int, default=0, help='number of synthetic users')
+    parser.add_argument('--jobs', type=int, default=0, help='number of synthetic jobs')
+    parser.add_argument('--responses', type=int, default=0, help='number of synthetic responses')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (same seed -> same data)')
+    parser.add_argument('--years', type=int, default=4, help='spread created timestamps over this many years')
+    parser.add_argument('--epoch', type=_epoch, default=EPOCH,
+                        help=f'YYYY-MM-DD the generated timestamps end at (default: {EPOCH})')
+    parser.add_argument('--batch-size', type=int, default=50000, help='rows per executemany/commit')
+    parser.add_argument('--db', default=DB_PATH, help='database path (default: JOBS_DB or ./jobs.db)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    db_path = args.db
+    if os.path.exists(db_path):
+        print(f'Removing existing DB: {db_path}')
+        os.remove(db_path)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    conn = sqlite3.connect(db_path)
     cur = conn.cursor()
-    # Create schema
-    for stmt in SCHEMA_SQL.strip().split(';'):
-        s = stmt.strip()
-        if not s:
-            continue
-        cur.execute(s)
+    # Create base tables only: search index, tags and secondary indexes are
+    # built by the remaining migrations after the bulk load (much faster than
+    # maintaining them row by row).
+    schema.migrate(conn, target=1)
 
     # Insert demo users
     pwd_hash = generate_password_hash('password123')
@@ -108,7 +297,12 @@ def main():
     cur.executemany("INSERT INTO responses (job_id, user_id, text, contact) VALUES (?, ?, ?, ?)", responses)
     conn.commit()
 
-    print('Database created and seeded at:', DB_PATH)
+    if args.users or args.jobs or args.responses:
+        generate(conn, args.users, args.jobs, args.responses, args.seed,
+                 years=args.years, batch_size=args.batch_size, epoch=args.epoch)
+
+    schema.migrate(conn)
+    print('Database created and seeded at:', db_path)
     # Optional: show counts
     cur.execute('SELECT COUNT(*) FROM users')
     print('Users:', cur.fetchone()[0])
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Local SMTP server stand-in for testing outbox delivery end to end.
+
+Accepts every message and writes it to --out as a numbered .eml file (and
+prints a one-line summary). Standard library only, so it works without
+aiosmtpd and on Python versions that no longer ship smtpd.
+
+Usage (PowerShell):
+  python scripts\\smtp_sink.py --port 1025 --out mail
+  $env:MAIL_SERVER = "127.0.0.1"; $env:MAIL_PORT = "1025"; python app.py
+
+Failure injection to exercise retries and backoff:
+  --fail-every 3     answer 451 (temporary) to every 3rd message
+  --reject user@x    answer 550 (permanent) for this recipient
+"""
+import argparse
+import itertools
+import os
+import socketserver
+import sys
+import threading
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    # один экземпляр на соединение; клиент может отправить по нему много писем
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.reply('220 smtp-sink ready')
+        sender, recipients = None, []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            verb = line[:4].upper()
+            if verb == 'EHLO':
+                self.reply('250-smtp-sink')
+                self.reply('250-8BITMIME')
+                self.reply('250 SMTPUTF8')
+            elif verb == 'HELO':
+                self.reply('250 smtp-sink')
+            elif verb == 'MAIL':
+                sender, recipients = line.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                rcpt = line.split(':', 1)[1].strip().strip('<>')
+                if rcpt in self.server.rejected:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(rcpt)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                if not recipients:
+                    self.reply('503 No valid recipients')
+                    continue
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = self.read_data()
+                self.server.store(self, sender, recipients, data)
+                sender, recipients = None, []
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def read_data(self):
+        lines = []
+        while True:
+            raw = self.rfile.readline()
+            if not raw or raw in (b'.\r\n', b'.\n'):
+                return b''.join(lines)
+            if raw.startswith(b'..'):
+                raw = raw[1:]  # dot-stuffing
+            lines.append(raw)
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, out_dir, fail_every=0, rejected=()):
+        super().__init__(address, SMTPHandler)
+        self.out_dir = out_dir
+        self.fail_every = fail_every
+        self.rejected = set(rejected)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self.connections = 0
+        os.makedirs(out_dir, exist_ok=True)
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def store(self, handler, sender, recipients, data):
+        with self._lock:
+            n = next(self._seq)
+        if self.fail_every and n % self.fail_every == 0:
+            handler.reply('451 Temporary failure, try again later')
+            print(f'#{n} deferred (451) -> {", ".join(recipients)}', flush=True)
+            return
+        path = os.path.join(self.out_dir, f'{n:06d}.eml')
+        with open(path, 'wb') as f:
+            f.write(data)
+        handler.reply('250 OK: queued')
+        subject = next((l for l in data.decode('utf-8', 'replace').splitlines()
+                        if l.lower().startswith('subject:')), 'Subject: ?')
+        print(f'#{n} {sender} -> {", ".join(recipients)} | {subject} '
+              f'(connection #{self.connections})', flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Accept SMTP mail and save it as .eml files.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--out', default='mail', help='directory for received messages')
+    parser.add_argument('--fail-every', type=int, default=0, help='answer 451 to every Nth message')
+    parser.add_argument('--reject', action='append', default=[], help='answer 550 for this recipient')
+    args = parser.parse_args(argv)
+    with SMTPSink((args.host, args.port), args.out, args.fail_every, args.reject) as server:
+        print(f'SMTP sink on {args.host}:{args.port}, saving to {args.out}/', flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
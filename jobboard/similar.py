@@ -0,0 +1,421 @@
+# similar.py - «похожие вакансии»: TF-IDF индекс на NumPy
+#
+# Вакансия — разреженный вектор: слова title/description (со стеммингом для
+# русского и английского) и теги целиком, хэшированные в N_FEATURES
+# признаков; веса — сублинейный tf * idf, вектор нормирован. Похожесть —
+# косинус, т.е. скалярное произведение.
+#
+# Индекс строится офлайн (`flask --app app build-similar`) в каталог
+# <root>/<версия>/ — CSR-матрица (строки — вакансии) и CSC-матрица (списки
+# вакансий по признаку) в .npy, которые открываются через mmap и не читаются
+# в память целиком. Файл <root>/CURRENT указывает на актуальную версию;
+# процессы замечают смену и переоткрывают индекс.
+#
+# Версия индекса — seq журнала job_changes (schema.CHANGE_LOG_SCHEMA), на
+# котором он построен. Всё, что изменилось позже, SimilarIndex.sync()
+# догоняет по журналу в небольшой сегмент в памяти (delta) и маскирует
+# устаревшие строки базового сегмента; запрос считает оба сегмента.
+# idf для новых векторов берётся из текущих df; полная пересборка (например,
+# по cron раз в сутки) заново согласует все веса и опустошает delta.
+#
+# Открытие индекса и догонка идут в фоновом потоке (как у suggest.py):
+# запрос страницы только читает текущий снимок и до первой загрузки
+# получает пустой список.
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+
+import numpy as np
+
+N_FEATURES = 1 << 18
+FIELD_WEIGHTS = {'title': 2.0, 'description': 1.0, 'tags': 3.0}
+QUERY_TERMS = 32          # признаков запроса с наибольшим весом — дальше вклад мал, а списки длинные
+CURRENT = 'CURRENT'
+
+_WORD = re.compile(r'[0-9a-zа-я]+')
+
+STOP_WORDS = frozenset('''
+    и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по
+    только ее мне было вот от меня еще нет о из ему теперь когда даже ну ли если уже
+    или ни быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей
+    может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего
+    раз тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь
+    этом один почти мой тем чтобы нее были куда зачем всех никогда можно при наконец
+    два об другой хоть после над больше тот через эти нас про всего них какая много
+    разве три эту моя впрочем хорошо свою этой перед иногда лучше чуть том нельзя
+    такой им более всегда конечно всю между наш ваш ваши наши также это
+    a an and are as at be by for from has have in is it its of on or that the to was
+    were will with we you our your us be can not no if this these those they their
+'''.split())
+
+_RU_SUFFIXES = sorted('''
+    иями ями ами ого его ому ему ыми ими ией иях ях ах ий ый ой ая яя ое ее ые ие
+    ам ям ом ем ов ев ей ию ья ье ьи ть ы и а я о е у ю ь й
+'''.split(), key=len, reverse=True)
+_EN_SUFFIXES = ('ing', 'ers', 'ed', 'es', 'er', 's')
+
+def _stem(word):
+    # не морфология, а отсечение окончаний: «разработчика», «разработчиков» и
+    # «разработчик» дают один признак; короткие слова не трогаем
+    suffixes = _RU_SUFFIXES if 'а' <= word[0] <= 'я' else _EN_SUFFIXES
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+def tokens(text):
+    text = (text or '').lower().replace('ё', 'е')
+    return [_stem(w) for w in _WORD.findall(text) if len(w) > 1 and w not in STOP_WORDS]
+
+def _feature(token):
+    # crc32, а не hash(): признак должен совпадать между процессами и запусками
+    return zlib.crc32(token.encode('utf-8')) % N_FEATURES
+
+def term_counts(title, description, tags):
+    """{признак: взвешенная частота} по полям вакансии."""
+    counts = {}
+    for field, text in (('title', title), ('description', description)):
+        weight = FIELD_WEIGHTS[field]
+        for token in tokens(text):
+            f = _feature(token)
+            counts[f] = counts.get(f, 0.0) + weight
+    for tag in (tags or '').split(','):
+        tag = tag.strip().lower().replace('ё', 'е')
+        if tag:
+            f = _feature('#' + tag)
+            counts[f] = counts.get(f, 0.0) + FIELD_WEIGHTS['tags']
+    return counts
+
+def _features(counts):
+    feats = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    order = np.argsort(feats)
+    return feats[order], (1.0 + np.log(tf[order])).astype(np.float32)
+
+def vectorize(feats, tf, df, n_docs):
+    """Нормированный tf-idf вектор из признаков и их сублинейных частот."""
+    if not len(feats):
+        return feats, tf
+    idf = np.log((1.0 + n_docs) / (1.0 + df[feats])) + 1.0
+    weights = (tf * idf).astype(np.float32)
+    return feats, weights / np.linalg.norm(weights)
+
+class Segment:
+    """Неизменяемый набор векторов: CSR по вакансиям и CSC по признакам."""
+
+    ARRAYS = ('doc_ids', 'row_ptr', 'row_feat', 'row_w', 'col_ptr', 'col_doc', 'col_w')
+
+    def __init__(self, doc_ids, row_ptr, row_feat, row_w, col_ptr, col_doc, col_w):
+        self.doc_ids = doc_ids    # id вакансий по возрастанию
+        self.row_ptr = row_ptr
+        self.row_feat = row_feat
+        self.row_w = row_w
+        self.col_ptr = col_ptr
+        self.col_doc = col_doc
+        self.col_w = col_w
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @classmethod
+    def from_rows(cls, doc_ids, row_ptr, row_feat, row_w):
+        # CSC из CSR: стабильная сортировка элементов по признаку
+        rows = np.repeat(np.arange(len(doc_ids), dtype=np.int32), np.diff(row_ptr))
+        order = np.argsort(row_feat, kind='stable')
+        col_ptr = np.zeros(N_FEATURES + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_feat, minlength=N_FEATURES), out=col_ptr[1:])
+        return cls(doc_ids, row_ptr, row_feat, row_w, col_ptr, rows[order], row_w[order])
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        """Сегмент из {job_id: (feats, weights)} — для delta в памяти."""
+        ids = sorted(vectors)
+        lengths = [len(vectors[i][0]) for i in ids]
+        row_ptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=row_ptr[1:])
+        if ids:
+            row_feat = np.concatenate([vectors[i][0] for i in ids]).astype(np.int32)
+            row_w = np.concatenate([vectors[i][1] for i in ids]).astype(np.float32)
+        else:
+            row_feat, row_w = np.zeros(0, np.int32), np.zeros(0, np.float32)
+        return cls.from_rows(np.array(ids, dtype=np.int64), row_ptr, row_feat, row_w)
+
+    @classmethod
+    def load(cls, path):
+        return cls(*(np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in cls.ARRAYS))
+
+    def save(self, path, names=ARRAYS):
+        for name in names:
+            np.save(os.path.join(path, name + '.npy'), getattr(self, name))
+
+    def find(self, job_id):
+        i = int(np.searchsorted(self.doc_ids, job_id))
+        return i if i < len(self.doc_ids) and self.doc_ids[i] == job_id else None
+
+    def row(self, i):
+        lo, hi = self.row_ptr[i], self.row_ptr[i + 1]
+        return np.asarray(self.row_feat[lo:hi]), np.asarray(self.row_w[lo:hi])
+
+    def scores(self, feats, weights):
+        """Скалярные произведения запроса со всеми строками сегмента разом."""
+        starts, ends = self.col_ptr[feats], self.col_ptr[feats + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return np.zeros(len(self), dtype=np.float64)
+        idx = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        return np.bincount(self.col_doc[idx], weights=self.col_w[idx] * np.repeat(weights, lengths),
+                           minlength=len(self))
+
+def _read_jobs(conn, batch):
+    last = 0
+    while True:
+        rows = conn.execute("SELECT id, title, description, tags FROM jobs WHERE id > ? ORDER BY id LIMIT ?",
+                            (last, batch)).fetchall()
+        if not rows:
+            return
+        yield from rows
+        last = rows[-1][0]
+
+def build(conn, root, batch=2000, log=print):
+    """Построить индекс по всем вакансиям в новый каталог версии и переключить CURRENT.
+
+    Два прохода по jobs в одной читающей транзакции (снимок согласован с seq
+    журнала): первый считает df и размер, второй пишет векторы в файлы .npy.
+    """
+    started = time.perf_counter()
+    in_txn = conn.in_transaction
+    if not in_txn:
+        conn.execute('BEGIN')
+    try:
+        seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'job_changes'").fetchone()
+        seq = seq[0] if seq else 0
+        df = np.zeros(N_FEATURES, dtype=np.int32)
+        n_docs = nnz = 0
+        for job_id, title, description, tags in _read_jobs(conn, batch):
+            feats, _ = _features(term_counts(title, description, tags))
+            df[feats] += 1
+            n_docs += 1
+            nnz += len(feats)
+        version = f'{seq}-{int(time.time())}'
+        path = os.path.join(root, version)
+        os.makedirs(path, exist_ok=True)
+        doc_ids = np.zeros(n_docs, dtype=np.int64)
+        row_ptr = np.zeros(n_docs + 1, dtype=np.int64)
+        row_feat = np.lib.format.open_memmap(os.path.join(path, 'row_feat.npy'), 'w+', np.int32, (nnz,))
+        row_w = np.lib.format.open_memmap(os.path.join(path, 'row_w.npy'), 'w+', np.float32, (nnz,))
+        i = pos = 0
+        for job_id, title, description, tags in _read_jobs(conn, batch):
+            feats, weights = vectorize(*_features(term_counts(title, description, tags)), df, n_docs)
+            row_feat[pos:pos + len(feats)] = feats
+            row_w[pos:pos + len(feats)] = weights
+            doc_ids[i] = job_id
+            pos += len(feats)
+            i += 1
+            row_ptr[i] = pos
+    finally:
+        if not in_txn:
+            conn.rollback()
+    row_feat.flush()
+    row_w.flush()
+    # row_feat/row_w уже лежат в своих файлах (open_memmap) — перезаписывать их нельзя
+    Segment.from_rows(doc_ids, row_ptr, row_feat, row_w).save(
+        path, [n for n in Segment.ARRAYS if n not in ('row_feat', 'row_w')])
+    np.save(os.path.join(path, 'df.npy'), df)
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'seq': seq, 'n_docs': n_docs, 'nnz': nnz, 'n_features': N_FEATURES}, f)
+    tmp = os.path.join(root, CURRENT + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(root, CURRENT))
+    # старые версии могут быть ещё открыты другими процессами (а в Windows
+    # открытый mmap не удалить) — удаляем то, что получается, остальное в следующий раз
+    for name in os.listdir(root):
+        if name not in (version, CURRENT) and os.path.isdir(os.path.join(root, name)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    log(f'Similar-jobs index v{version}: {n_docs} jobs, {nnz} nonzeros, '
+        f'{time.perf_counter() - started:.1f}s')
+    return version
+
+def current_version(root):
+    try:
+        with open(os.path.join(root, CURRENT), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+class _State:
+    # снимок индекса; sync() создаёт новый, запросы читают старый без блокировок
+    def __init__(self, version, seq, base, alive, delta_vectors, delta, df, n_docs):
+        self.version = version
+        self.seq = seq
+        self.base = base
+        self.alive = alive
+        self.delta_vectors = delta_vectors
+        self.delta = delta
+        self.df = df
+        self.n_docs = n_docs
+
+def _empty_state():
+    empty = Segment.from_vectors({})
+    return _State(None, 0, empty, np.zeros(0, dtype=bool), {}, empty, np.zeros(N_FEATURES, dtype=np.int32), 0)
+
+class SimilarIndex:
+    """Индекс, догоняющий журнал изменений.
+
+    С connect() индекс открывается и обновляется фоновым потоком через
+    соединение, которое тот открывает сам; без него — только явными sync(conn)
+    (CLI, скрипты).
+    """
+
+    def __init__(self, root, connect=None, refresh_interval=5.0, max_delta=20000, log=print):
+        self.root = root
+        self.connect = connect
+        self.refresh_interval = refresh_interval
+        self.max_delta = max_delta
+        self.log = log
+        self._state = None
+        self._lock = threading.Lock()
+        self._warned = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        if connect is not None:
+            self._thread = threading.Thread(target=self._run, name='similar-refresh', daemon=True)
+            self._thread.start()
+
+    @property
+    def version(self):
+        """Версия снимка или None, пока индекс не загружен."""
+        state = self._state
+        return (state.version, state.seq) if state is not None else None
+
+    def refresh_soon(self):
+        """Разбудить фоновый поток: вакансии изменились."""
+        self._wake.set()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        conn = None
+        while not self._stop.is_set():
+            try:
+                if conn is None:
+                    conn = self.connect()
+                self.sync(conn)
+            except Exception as exc:  # поток не должен умирать из-за одной ошибки
+                self.log(f'similar-jobs index refresh failed: {exc}')
+                if conn is not None:
+                    conn.close()
+                    conn = None
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+        if conn is not None:
+            conn.close()
+
+    def _load(self):
+        version = current_version(self.root)
+        if version is None:
+            return _empty_state()
+        path = os.path.join(self.root, version)
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        base = Segment.load(path)
+        df = np.load(os.path.join(path, 'df.npy'))  # в памяти, не mmap: догонка копирует его в новый снимок
+        return _State(version, meta['seq'], base, np.ones(len(base), dtype=bool), {}, Segment.from_vectors({}),
+                      df, meta['n_docs'])
+
+    def sync(self, conn):
+        """Применить изменения из job_changes после версии индекса; вернуть версию."""
+        head = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'job_changes'").fetchone()
+        head = head[0] if head else 0
+        state = self._state
+        if state is not None and state.seq == head and state.version == current_version(self.root):
+            return self.version
+        with self._lock:
+            state = self._state
+            if state is None or state.version != current_version(self.root):
+                state = self._load()
+            if head - state.seq > self.max_delta:
+                if self._warned != state.seq:
+                    self._warned = state.seq
+                    self.log(f'similar-jobs index is {head - state.seq} changes behind; '
+                             f'run `flask --app app build-similar`')
+                self._state = state
+                return self.version
+            horizon = conn.execute('SELECT seq FROM job_changes_horizon WHERE id = 1').fetchone()[0]
+            if state.seq < horizon and self._warned != state.seq:
+                self._warned = state.seq
+                self.log('similar-jobs index is older than the compacted change log; '
+                         'deleted jobs may linger until `flask --app app build-similar`')
+            if head != state.seq:
+                state = self._apply(state, conn.execute(
+                    "SELECT c.seq, c.job_id, jobs.title, jobs.description, jobs.tags, jobs.id IS NOT NULL "
+                    "FROM job_changes c LEFT JOIN jobs ON jobs.id = c.job_id WHERE c.seq > ? AND NOT EXISTS "
+                    "(SELECT 1 FROM job_changes d WHERE d.job_id = c.job_id AND d.seq > c.seq) ORDER BY c.seq",
+                    (state.seq,)).fetchall(), head)
+            self._state = state
+            return self.version
+
+    def _apply(self, state, changes, head):
+        alive = state.alive.copy()
+        vectors = dict(state.delta_vectors)
+        # новый снимок целиком, включая df (1 МБ): сбой посреди догонки оставляет
+        # прежний снимок согласованным с его сегментами
+        df, n_docs = state.df.copy(), state.n_docs
+        for seq, job_id, title, description, tags, exists in changes:
+            old = vectors.pop(job_id, None)
+            if old is None:
+                i = state.base.find(job_id)
+                if i is not None and alive[i]:
+                    alive[i] = False
+                    old = state.base.row(i)
+            if old is not None:
+                df[old[0]] -= 1
+                n_docs -= 1
+            if exists:
+                feats, tf = _features(term_counts(title, description, tags))
+                df[feats] += 1
+                n_docs += 1
+                vectors[job_id] = vectorize(feats, tf, df, n_docs)
+        return _State(state.version, head, state.base, alive, vectors, Segment.from_vectors(vectors), df, n_docs)
+
+    def query(self, job_id, k=5):
+        """[(job_id, косинус)] для k самых похожих вакансий, по убыванию."""
+        state = self._state
+        if state is None:
+            return []
+        vector = state.delta_vectors.get(job_id)
+        if vector is None:
+            i = state.base.find(job_id)
+            if i is None or not state.alive[i]:
+                return []
+            vector = state.base.row(i)
+        feats, weights = vector
+        if len(feats) > QUERY_TERMS:
+            top = np.argpartition(weights, -QUERY_TERMS)[-QUERY_TERMS:]
+            feats, weights = feats[top], weights[top]
+        candidates = []
+        for segment, mask in ((state.base, state.alive), (state.delta, None)):
+            if not len(segment):
+                continue
+            scores = segment.scores(feats, weights)
+            if mask is not None:
+                scores *= mask
+            own = segment.find(job_id)
+            if own is not None:
+                scores[own] = 0.0
+            n = min(k, int(np.count_nonzero(scores)))
+            if n:
+                best = np.argpartition(scores, -n)[-n:]
+                candidates.extend((int(segment.doc_ids[i]), float(scores[i])) for i in best)
+        candidates.sort(key=lambda c: -c[1])
+        return candidates[:k]
@@ -0,0 +1,275 @@
+# suggest.py - подсказки поиска: префиксный индекс по названиям вакансий и тегам
+#
+# Индекс целиком в памяти процесса, поиск по нему не делает ни одного
+# SQL-запроса. Ключи — нормализованный текст (casefold, «ё» -> «е», всё кроме
+# букв и цифр -> пробел), начиная с каждого слова: «Python-разработчик
+# (удалённо)» находится и по «pyt», и по «разраб», и по «удал».
+#
+# Компактность: отсортированные ключи основного сегмента лежат одной строкой
+# (через '\n') плюс массив смещений array('I') и массив номеров записей —
+# без отдельного объекта str на ключ. Новые ключи копятся в маленьком
+# отсортированном списке pending и вливаются в основной сегмент пачкой
+# (слияние двух отсортированных последовательностей, в фоновом потоке).
+#
+# Вес записи: log(1 + число вакансий) плюс бонус за свежесть с периодом
+# полураспада HALF_LIFE_DAYS. Обновление — инкрементально по журналу
+# job_changes (schema.CHANGE_LOG_SCHEMA) фоновым потоком; запрос никогда не
+# ждёт базу, а до первой загрузки просто возвращает пустой список.
+
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+
+TITLE, TAG = 0, 1
+KINDS = ('title', 'tag')
+HALF_LIFE_DAYS = 14.0
+RECENCY_WEIGHT = 1.5
+SCAN_LIMIT = 2000          # ключей в диапазоне, которые перебираем напрямую; шире — кэш топа по префиксу
+CACHED_TOP = 20            # столько лучших записей храним для широких префиксов
+MERGE_AT = 4096            # pending вливается в основной сегмент с этого размера
+
+_NON_WORD = re.compile(r'[^0-9a-zа-я]+')
+
+def normalize(text):
+    return _NON_WORD.sub(' ', (text or '').casefold().replace('ё', 'е')).strip()
+
+def _keys(text):
+    # ключ на каждое слово: 'python разработчик', 'разработчик'
+    norm = normalize(text)
+    starts = [0] + [m.end() for m in re.finditer(' ', norm)]
+    return [norm[i:] for i in starts] if norm else []
+
+def _day(created):
+    # 'YYYY-MM-DD HH:MM:SS' (CURRENT_TIMESTAMP) -> номер дня
+    if not created:
+        return 0.0
+    try:
+        dt = datetime.strptime(created[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return 0.0
+    return dt.timestamp() / 86400
+
+class _Keys:
+    """Неизменяемый отсортированный набор (ключ, запись) в одной строке."""
+
+    def __init__(self, pairs):
+        # pairs — отсортированный итератор (key, entry)
+        parts, offsets, entries = [], array('I'), array('I')
+        pos = 0
+        for key, entry in pairs:
+            offsets.append(pos)
+            entries.append(entry)
+            parts.append(key)
+            pos += len(key) + 1
+        offsets.append(pos)
+        self.blob = '\n'.join(parts) + '\n'
+        self.offsets = offsets
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def __iter__(self):
+        return zip(self.blob.split('\n'), self.entries)
+
+    def range(self, prefix):
+        n = len(prefix)
+        head = lambda i: self.blob[self.offsets[i]:min(self.offsets[i] + n, self.offsets[i + 1] - 1)]
+        lo = bisect.bisect_left(range(len(self)), prefix, key=head)
+        hi = bisect.bisect_right(range(len(self)), prefix, lo=lo, key=head)
+        return lo, hi
+
+class SuggestIndex:
+    """Префиксный индекс с фоновым обновлением.
+
+    connect() открывает соединение с БД для фонового потока; lookup() в
+    потоке запроса работает только с памятью.
+    """
+
+    def __init__(self, connect, refresh_interval=5.0, log=print):
+        self.connect = connect
+        self.refresh_interval = refresh_interval
+        self.log = log
+        self.ready = False
+        self._reset()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='suggest-refresh', daemon=True)
+        self._thread.start()
+
+    def _reset(self):
+        self.seq = 0
+        # записи: параллельные массивы, номер записи — индекс
+        self._text = []                  # отображаемый текст (последнее написание)
+        self._kind = bytearray()
+        self._count = array('i')
+        self._last = array('f')          # день последней вакансии с этой записью
+        self._entry = {}                 # (kind, нормализованный текст) -> запись
+        self._tags = {}                  # тег (как в tag_counts) -> запись
+        self._job_title = array('i')     # id вакансии -> запись её названия (-1 — нет)
+        self._main = _Keys(())
+        self._pending = []
+        self._new_keys = []
+        self._top = {}
+
+    # ----- запросы -----
+    def lookup(self, q, limit=8):
+        """[(текст, вид)] лучших записей, где какое-то слово начинается с q."""
+        prefix = normalize(q)
+        if not prefix or not self.ready:
+            return []
+        today = time.time() / 86400
+        main, pending, top = self._main, self._pending, self._top
+        lo, hi = main.range(prefix)
+        if hi - lo > SCAN_LIMIT:
+            # свежесть зависит от даты — кэш топа живёт до конца суток (или до обновления индекса)
+            candidates = top.get((prefix, int(today)))
+            if candidates is None:
+                candidates = self._best((main.entries[i] for i in range(lo, hi)), CACHED_TOP, today)
+                top[(prefix, int(today))] = candidates
+        else:
+            candidates = main.entries[lo:hi]
+        i = bisect.bisect_left(pending, (prefix,))
+        extra = []
+        while i < len(pending) and pending[i][0].startswith(prefix):
+            extra.append(pending[i][1])
+            i += 1
+        best = self._best(list(candidates) + extra, limit, today)
+        return [(self._text[e], KINDS[self._kind[e]]) for e in best]
+
+    def _score(self, entry, today):
+        return (math.log1p(self._count[entry])
+                + RECENCY_WEIGHT * 0.5 ** (max(today - self._last[entry], 0.0) / HALF_LIFE_DAYS))
+
+    def _best(self, entries, k, today):
+        unique = {e for e in entries if self._count[e] > 0}
+        return heapq.nlargest(k, unique, key=lambda e: self._score(e, today))
+
+    # ----- обновление -----
+    def refresh_soon(self):
+        """Разбудить фоновый поток: появились новые вакансии."""
+        self._wake.set()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        conn = None
+        while not self._stop.is_set():
+            try:
+                if conn is None:
+                    conn = self.connect()
+                    self._load(conn)
+                    self.ready = True
+                else:
+                    self._sync(conn)
+            except Exception as exc:  # поток не должен умирать из-за одной ошибки
+                self.log(f'suggest index refresh failed: {exc}')
+                if conn is not None:
+                    conn.close()
+                    conn = None
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+        if conn is not None:
+            conn.close()
+
+    def _add(self, kind, text, count, day):
+        norm = normalize(text)
+        if not norm:
+            return -1
+        entry = self._entry.get((kind, norm))
+        if entry is None:
+            entry = len(self._text)
+            self._entry[(kind, norm)] = entry
+            self._text.append(text.strip())
+            self._kind.append(kind)
+            self._count.append(0)
+            self._last.append(0.0)
+            if kind == TAG:
+                self._tags[text] = entry
+            for key in _keys(text):
+                bisect.insort(self._new_keys, (key, entry))
+        elif kind == TITLE:
+            self._text[entry] = text.strip()
+        self._count[entry] += count
+        if day > self._last[entry]:
+            self._last[entry] = day
+        return entry
+
+    def _set_job_title(self, job_id, entry):
+        if job_id >= len(self._job_title):
+            self._job_title.extend([-1] * (job_id + 1 - len(self._job_title) + 1024))
+        self._job_title[job_id] = entry
+
+    def _load(self, conn):
+        started = time.perf_counter()
+        self._reset()  # повторная загрузка после ошибки начинается с нуля
+        conn.execute('BEGIN')  # один снимок для seq и данных
+        try:
+            head = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'job_changes'").fetchone()
+            last = 0
+            while True:
+                rows = conn.execute("SELECT id, title, created FROM jobs WHERE id > ? ORDER BY id LIMIT 5000",
+                                    (last,)).fetchall()
+                if not rows:
+                    break
+                for job_id, title, created in rows:
+                    self._set_job_title(job_id, self._add(TITLE, title, 1, _day(created)))
+                last = rows[-1][0]
+            for tag, n, created in conn.execute(
+                    "SELECT t.tag, t.n, (SELECT MAX(jobs.created) FROM job_tags jt JOIN jobs ON jobs.id = jt.job_id "
+                    "                    WHERE jt.tag = t.tag) FROM tag_counts t"):
+                self._add(TAG, tag, n, _day(created))
+        finally:
+            conn.rollback()
+        self._main = _Keys(self._new_keys)
+        self._new_keys = []
+        self._pending = []
+        self._top = {}
+        self.seq = head[0] if head else 0
+        self.log(f'suggest index loaded: {len(self._text)} entries, {len(self._main)} keys, '
+                 f'{time.perf_counter() - started:.2f}s')
+
+    def _sync(self, conn):
+        head = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'job_changes'").fetchone()
+        head = head[0] if head else 0
+        if head == self.seq:
+            return
+        changes = conn.execute(
+            "SELECT c.job_id, jobs.title, jobs.created, jobs.tags FROM job_changes c "
+            "LEFT JOIN jobs ON jobs.id = c.job_id WHERE c.seq > ? AND NOT EXISTS "
+            "(SELECT 1 FROM job_changes d WHERE d.job_id = c.job_id AND d.seq > c.seq) ORDER BY c.seq",
+            (self.seq,)).fetchall()
+        # теги: счётчики берём из агрегата tag_counts (он маленький), свежесть — из новых вакансий
+        tag_counts = dict(conn.execute('SELECT tag, n FROM tag_counts').fetchall())
+        self._new_keys = list(self._pending)
+        for job_id, title, created, tags in changes:
+            old = self._job_title[job_id] if job_id < len(self._job_title) else -1
+            if old >= 0:
+                self._count[old] -= 1
+                self._set_job_title(job_id, -1)
+            if title is not None:
+                self._set_job_title(job_id, self._add(TITLE, title, 1, _day(created)))
+                for tag in (tags or '').split(','):
+                    if tag.strip():
+                        self._add(TAG, tag.strip().casefold(), 0, _day(created))
+        for tag, entry in self._tags.items():
+            self._count[entry] = tag_counts.get(tag, 0)
+        if len(self._new_keys) >= MERGE_AT:
+            self._main = _Keys(heapq.merge(iter(self._main), self._new_keys))
+            self._pending = []
+        else:
+            self._pending = self._new_keys
+        self._new_keys = []
+        self._top = {}
+        self.seq = head
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py читает окружение и открывает БД при импорте: до него — временная БД,
+# дешёвый хэш паролей в потоке запроса и никаких фоновых почтовых потоков
+_TMP = tempfile.mkdtemp(prefix='jobboard-tests-')
+os.environ.update({
+    'JOBS_DB': os.path.join(_TMP, 'jobs.db'),
+    'SIMILAR_INDEX_DIR': os.path.join(_TMP, 'similar'),
+    'HASH_WORKERS': '0',
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'MAIL_WORKERS': '0',
+    'FLASK_SECRET': 'test',
+})
+
+
+@pytest.fixture
+def jobboard(tmp_path):
+    """Модуль app.py на свежей демо-БД (init_db) в tmp_path."""
+    import app as jobboard
+    saved = dict(jobboard.app.config)
+    jobboard.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False,
+                               DATABASE=str(tmp_path / 'jobs.db'), ARCHIVE_DATABASE=None,
+                               SIMILAR_INDEX_DIR=str(tmp_path / 'similar'))
+    jobboard.init_db()
+    for cache in (jobboard.fragment_cache, jobboard.user_cache, jobboard.similar_cache):
+        cache.clear()
+    # индекс похожих загружается в фоне и меняет ETag страницы вакансии —
+    # дожидаемся его, чтобы валидаторы в тестах были стабильны
+    index = jobboard.get_similar_index()
+    deadline = time.monotonic() + 5
+    while index.version is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield jobboard
+    for worker in (jobboard._similar, jobboard._suggest, jobboard._writer):
+        if worker is not None:
+            worker.close()
+    jobboard._similar = jobboard._suggest = jobboard._writer = None
+    jobboard.app.config.clear()
+    jobboard.app.config.update(saved)
+
+
+@pytest.fixture
+def client(jobboard):
+    return jobboard.app.test_client()
+
+
+@pytest.fixture
+def db(jobboard):
+    """Отдельное соединение с БД теста — записи «из другого процесса»."""
+    conn = sqlite3.connect(jobboard.app.config['DATABASE'])
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def login(client):
+    def login(username, password='password123'):
+        response = client.post('/login', data={'username': username, 'password': password})
+        assert response.status_code == 302
+        client.get('/')  # забрать флэш «Вход выполнен»
+    return login
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import archive
+
+LATER = datetime.now(timezone.utc) + timedelta(days=10)
+
+
+@pytest.fixture
+def archived(jobboard, db):
+    """Перенести в архив все демо-вакансии (через 10 дней простоя)."""
+    path = jobboard.archive_path()
+    conn = jobboard.open_connection(jobboard.app.config['DATABASE'])
+    try:
+        db.execute("UPDATE jobs SET title = 'Курьер (вело)' WHERE id = 2")  # правка до переноса — в архивной копии
+        db.commit()
+        moved = archive.archive_jobs(conn, path, after_days=7, log=lambda *a: None, now=LATER)
+    finally:
+        conn.close()
+    return path, moved
+
+
+def test_move(archived, db):
+    path, (jobs, responses, _) = archived
+    assert (jobs, responses) == (5, 2)
+    assert db.execute('SELECT COUNT(*) FROM jobs').fetchone()[0] == 0
+    assert db.execute('SELECT COUNT(*) FROM responses').fetchone()[0] == 0
+    db.execute('ATTACH DATABASE ? AS archive', (path,))
+    assert db.execute('SELECT title FROM archive.jobs WHERE id = 2').fetchone()[0] == 'Курьер (вело)'
+    assert db.execute('SELECT COUNT(*) FROM archive.responses WHERE archived_at IS NOT NULL').fetchone()[0] == 2
+    # для остальной системы перенос — удаление
+    assert db.execute("SELECT COUNT(*) FROM job_changes WHERE op = 'delete'").fetchone()[0] == 5
+    assert db.execute("SELECT COUNT(*) FROM jobs_fts WHERE jobs_fts MATCH 'бариста'").fetchone()[0] == 0
+
+
+def test_second_run_moves_nothing(jobboard, archived):
+    conn = jobboard.open_connection(jobboard.app.config['DATABASE'])
+    try:
+        assert archive.archive_jobs(conn, archived[0], after_days=7, log=lambda *a: None, now=LATER)[:2] == (0, 0)
+    finally:
+        conn.close()
+
+
+def test_fresh_jobs_stay(jobboard, db):
+    conn = jobboard.open_connection(jobboard.app.config['DATABASE'])
+    try:
+        assert archive.archive_jobs(conn, jobboard.archive_path(), after_days=7, log=lambda *a: None)[:2] == (0, 0)
+    finally:
+        conn.close()
+    assert db.execute('SELECT COUNT(*) FROM jobs').fetchone()[0] == 5
+
+
+def test_job_page_falls_through_to_archive(client, archived):
+    response = client.get('/job/1')
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert 'Бариста (подработка)' in page and 'Вакансия в архиве' in page
+    assert 'Есть опыт, могу по вечерам.' in page
+    etag = response.headers['ETag']
+    assert client.get('/job/1', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/job/999').status_code == 404
+
+
+def test_job_page_without_archive_is_404(client, db):
+    db.execute('DELETE FROM jobs WHERE id = 5')
+    db.commit()
+    assert client.get('/job/5').status_code == 404
+
+
+def test_profile_lists_archived_rows(client, archived):
+    page = client.get('/profile/employer1').get_data(as_text=True)
+    assert 'Контент-менеджер' in page and 'архив' in page
+    page = client.get('/profile/worker1').get_data(as_text=True)
+    assert 'Бариста (подработка)' in page
@@ -0,0 +1,62 @@
+import schema
+
+
+def changes(client, since, limit=100):
+    response = client.get(f'/api/jobs/changes?since={since}&limit={limit}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_snapshot_then_deltas(client, db):
+    snapshot = changes(client, 0)
+    assert [c['id'] for c in snapshot['changes']] == [1, 2, 3, 4, 5]
+    assert {c['op'] for c in snapshot['changes']} == {'upsert'}
+
+    db.execute("INSERT INTO jobs (author_id, title, description) VALUES (1, 'Новая', 'd')")
+    db.execute("UPDATE jobs SET title = 'Бариста (полный день)' WHERE id = 1")
+    db.execute("UPDATE jobs SET title = 'Бариста (ночь)' WHERE id = 1")
+    db.execute('DELETE FROM responses WHERE job_id = 2')
+    db.execute('DELETE FROM jobs WHERE id = 2')
+    db.commit()
+
+    delta = changes(client, snapshot['cursor'])
+    by_id = {c['id']: c for c in delta['changes']}
+    assert sorted(by_id) == [1, 2, 6]  # одна запись на вакансию
+    assert by_id[1]['op'] == 'upsert' and by_id[1]['job']['title'] == 'Бариста (ночь)'
+    assert by_id[2] == {'seq': by_id[2]['seq'], 'op': 'delete', 'id': 2, 'job': None}
+    assert changes(client, delta['cursor'])['changes'] == []
+
+
+def test_pages_follow_next(client):
+    first = changes(client, 0, limit=2)
+    second = client.get(first['next']).get_json()
+    assert [c['id'] for c in first['changes'] + second['changes']] == [1, 2, 3, 4]
+
+
+def test_not_modified_until_the_log_moves(client, db):
+    etag = client.get('/api/jobs/changes?since=0').headers['ETag']
+    assert client.get('/api/jobs/changes?since=0', headers={'If-None-Match': etag}).status_code == 304
+    db.execute('DELETE FROM jobs WHERE id = 4')
+    db.commit()
+    assert client.get('/api/jobs/changes?since=0', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_cursor_before_compaction_horizon_is_gone(client, db):
+    cursor = changes(client, 0)['cursor']
+    db.execute('DELETE FROM responses WHERE job_id = 2')
+    db.execute('DELETE FROM jobs WHERE id = 2')
+    db.execute("UPDATE job_changes SET changed = datetime('now', '-40 days') WHERE op = 'delete'")
+    db.commit()
+    removed, horizon = schema.compact_job_changes(db, retention_days=30)
+    assert removed == 2 and horizon > cursor  # перекрытый upsert и само удаление
+
+    gone = client.get(f'/api/jobs/changes?since={cursor}')
+    assert gone.status_code == 410
+    assert gone.get_json()['horizon'] == horizon
+    resync = client.get(gone.get_json()['resync']).get_json()
+    assert [c['id'] for c in resync['changes']] == [1, 3, 4, 5]
+    assert changes(client, horizon)['changes'] == []
+
+
+def test_cursor_from_the_future_is_gone(client):
+    assert client.get('/api/jobs/changes?since=1000').status_code == 410
@@ -0,0 +1,50 @@
+import similar
+
+
+def test_job_detail_304_then_200_after_new_response(client, db):
+    first = client.get('/job/1')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert client.get('/job/1', headers={'If-None-Match': etag}).status_code == 304
+
+    db.execute("INSERT INTO responses (job_id, user_id, text) VALUES (1, 2, 'ещё отклик')")
+    db.commit()
+    after = client.get('/job/1', headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != etag
+    assert 'ещё отклик' in after.get_data(as_text=True)
+
+
+def test_index_304_then_200_after_new_job(client, db):
+    etag = client.get('/').headers['ETag']
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+    db.execute("INSERT INTO jobs (author_id, title, description) VALUES (1, 'Новая вакансия', 'описание')")
+    db.commit()
+    after = client.get('/', headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert 'Новая вакансия' in after.get_data(as_text=True)
+
+
+def test_etag_depends_on_viewer(client, login):
+    anonymous = client.get('/job/1')
+    assert 'private' in anonymous.headers['Cache-Control']
+    login('worker1')
+    response = client.get('/job/1', headers={'If-None-Match': anonymous.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != anonymous.headers['ETag']
+
+
+def test_etag_follows_similar_index_version(client, monkeypatch):
+    monkeypatch.setattr(similar.SimilarIndex, 'version', property(lambda self: ('a', 1)))
+    etag = client.get('/job/1').headers['ETag']
+    assert client.get('/job/1', headers={'If-None-Match': etag}).status_code == 304
+    monkeypatch.setattr(similar.SimilarIndex, 'version', property(lambda self: ('a', 2)))
+    assert client.get('/job/1', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_if_modified_since_alone_revalidates_only_public_responses(client):
+    page = client.get('/job/1')
+    assert client.get('/job/1', headers={'If-Modified-Since': page.headers['Last-Modified']}).status_code == 200
+    feed = client.get('/api/jobs')
+    assert 'public' in feed.headers['Cache-Control']
+    assert client.get('/api/jobs', headers={'If-Modified-Since': feed.headers['Last-Modified']}).status_code == 304
@@ -0,0 +1,47 @@
+import csv
+import gzip
+import io
+
+
+def rows(response):
+    text = response.get_data().decode('utf-8')
+    assert text.startswith('\ufeff') or not text
+    return list(csv.reader(io.StringIO(text.lstrip('\ufeff'))))
+
+
+def test_export_requires_employer(client, login):
+    assert client.get('/export/responses.csv').status_code == 403
+    login('worker1')
+    assert client.get('/export/responses.csv').status_code == 403
+
+
+def test_responses_export(client, login, db):
+    db.execute("INSERT INTO responses (job_id, user_id, text, contact) VALUES (2, 2, '=HYPERLINK(\"x\")', '+7 900')")
+    db.commit()
+    login('employer1')
+    response = client.get('/export/responses.csv')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+    table = rows(response)
+    assert table[0] == ['id', 'job_id', 'job_title', 'applicant', 'contact', 'text', 'created']
+    assert [r[0] for r in table[1:]] == ['1', '2', '3']
+    injected = table[-1]
+    assert injected[4] == "'+7 900" and injected[5].startswith("'=")
+
+
+def test_export_resumes_after_id(client, login):
+    login('employer1')
+    full = rows(client.get('/export/jobs.csv'))
+    assert len(full) == 6
+    rest = client.get('/export/jobs.csv?after=3').get_data().decode('utf-8')
+    assert not rest.startswith('\ufeff')  # продолжение — без BOM и заголовка
+    assert list(csv.reader(io.StringIO(rest))) == full[4:]
+
+
+def test_export_gzip(client, login):
+    login('employer1')
+    plain = client.get('/export/jobs.csv').get_data()
+    packed = client.get('/export/jobs.csv', headers={'Accept-Encoding': 'gzip'})
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(packed.get_data()) == plain
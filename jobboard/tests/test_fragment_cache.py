@@ -0,0 +1,49 @@
+import pytest
+
+
+@pytest.fixture
+def renders(jobboard, monkeypatch):
+    """Счётчик рендеров фрагментов: ленты и тела вакансии."""
+    calls = []
+    load_cards = jobboard._load_job_cards
+    monkeypatch.setattr(jobboard, '_load_job_cards', lambda *a: calls.append('cards') or load_cards(*a))
+    render = jobboard.render_template
+
+    def counting_render(name, **context):
+        if name == '_job_body.html':
+            calls.append('body')
+        return render(name, **context)
+    monkeypatch.setattr(jobboard, 'render_template', counting_render)
+    return calls
+
+
+def test_unchanged_pages_come_from_cache(client, renders):
+    assert client.get('/').status_code == 200
+    assert client.get('/').status_code == 200
+    assert client.get('/job/1').status_code == 200
+    assert client.get('/job/1').status_code == 200
+    assert renders == ['cards', 'body']
+
+
+def test_new_job_through_the_app_shows_up(client, login, renders):
+    client.get('/')
+    login('employer1')
+    client.post('/add', data={'title': 'Сварщик', 'description': 'Сварка металлоконструкций'})
+    assert 'Сварщик' in client.get('/').get_data(as_text=True)
+    assert renders.count('cards') >= 2
+
+
+def test_writes_from_another_connection_invalidate(client, db, renders):
+    assert 'Бариста' in client.get('/').get_data(as_text=True)
+    assert 'Бариста' in client.get('/job/1').get_data(as_text=True)
+    db.execute("UPDATE jobs SET title = 'Старший бариста' WHERE id = 1")
+    db.commit()
+    assert 'Старший бариста' in client.get('/').get_data(as_text=True)
+    assert 'Старший бариста' in client.get('/job/1').get_data(as_text=True)
+
+
+def test_author_profile_change_invalidates_job_body(client, db):
+    client.get('/job/1')
+    db.execute("UPDATE users SET avatar = 'https://example.com/a.png' WHERE username = 'employer1'")
+    db.commit()
+    assert 'https://example.com/a.png' in client.get('/job/1').get_data(as_text=True)
@@ -0,0 +1,14 @@
+def test_metrics_open_to_localhost_only(client):
+    assert client.get('/metrics').status_code == 200  # тестовый клиент ходит с 127.0.0.1
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.7'}).status_code == 403
+
+
+def test_metrics_token(jobboard, client):
+    jobboard.app.config['METRICS_TOKEN'] = 'secret'
+    outside = {'REMOTE_ADDR': '203.0.113.7'}
+    ok = client.get('/metrics', environ_base=outside, headers={'Authorization': 'Bearer secret'})
+    assert ok.status_code == 200
+    assert 'jobboard_requests_total' in ok.get_data(as_text=True)
+    assert client.get('/metrics', environ_base=outside, headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    # неверный токен не выручает и локальный адрес
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
@@ -0,0 +1,67 @@
+import pytest
+
+
+@pytest.fixture
+def jobs(db):
+    # 25 вакансий поверх 5 демо: часть с одинаковым created — порядок решает id
+    db.executemany("INSERT INTO jobs (author_id, title, description, created) VALUES (1, ?, 'd', ?)",
+                   [(f'job {i}', f'2024-01-{1 + i // 3:02d} 10:00:00') for i in range(25)])
+    db.commit()
+    return [r['id'] for r in db.execute('SELECT id FROM jobs ORDER BY created DESC, id DESC')]
+
+
+def walk(client, url):
+    pages = []
+    while url:
+        body = client.get(url).get_json()
+        pages.append(body)
+        url = body['next']
+    return pages
+
+
+def test_cursor_walk_returns_every_row_once(client, jobs):
+    pages = walk(client, '/api/jobs?limit=7')
+    seen = [job['id'] for page in pages for job in page['jobs']]
+    assert seen == jobs
+    assert [len(page['jobs']) for page in pages] == [7, 7, 7, 7, 2]
+    assert pages[0]['prev'] is None and pages[-1]['next'] is None
+
+
+def test_prev_cursor_returns_previous_page(client, jobs):
+    pages = walk(client, '/api/jobs?limit=7')
+    for before, page in zip(pages, pages[1:]):
+        back = client.get(page['prev']).get_json()
+        assert [j['id'] for j in back['jobs']] == [j['id'] for j in before['jobs']]
+
+
+def test_new_jobs_do_not_shift_later_pages(client, db, jobs):
+    first = client.get('/api/jobs?limit=10').get_json()
+    db.execute("INSERT INTO jobs (author_id, title, description) VALUES (1, 'свежая', 'd')")
+    db.commit()
+    rest = walk(client, first['next'])
+    seen = [j['id'] for j in first['jobs']] + [j['id'] for page in rest for j in page['jobs']]
+    assert seen == jobs
+
+
+def test_salary_sort_cursor(client, db):
+    db.executemany("INSERT INTO jobs (author_id, title, description, salary_min, salary_max, salary_currency, "
+                   "salary_period) VALUES (1, ?, 'd', ?, ?, 'RUB', 'month')",
+                   [(f's{i}', 1000 * (i % 4), 1000 * (i % 4)) for i in range(10)])
+    db.commit()
+    pages = walk(client, '/api/jobs?limit=3&sort=salary&currency=RUB&period=month')
+    rows = [j for page in pages for j in page['jobs']]
+    assert len({j['id'] for j in rows}) == len(rows)
+    tops = [j['salary_max'] or j['salary_min'] for j in rows]
+    assert tops == sorted(tops, reverse=True)
+
+
+@pytest.mark.parametrize('cursor', ['garbage', 'WyJ4Il0'])  # не base64-JSON; ["x"]
+def test_bad_cursor_is_400(client, cursor):
+    assert client.get(f'/api/jobs?cursor={cursor}').status_code == 400
+    assert client.get(f'/?cursor={cursor}').status_code == 400
+
+
+def test_index_pages_link_by_cursor(client, jobs):
+    page = client.get('/?limit=10').get_data(as_text=True)
+    assert 'cursor=' in page
+    assert f'/job/{jobs[0]}"' in page and f'/job/{jobs[10]}"' not in page
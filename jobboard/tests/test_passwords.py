@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import hash_prefix, needs_rehash  # noqa: E402
+
+
+@pytest.mark.parametrize('method, stored', [
+    ('scrypt', 'scrypt:32768:8:1'),
+    ('scrypt:32768:8:1', 'scrypt:32768:8:1'),
+    ('pbkdf2', 'pbkdf2:sha256'),
+    ('pbkdf2:sha256', 'pbkdf2:sha256'),
+    ('pbkdf2:sha256:1000', 'pbkdf2:sha256:1000'),
+])
+def test_short_method_matches_its_own_hashes(method, stored):
+    pwhash = generate_password_hash('secret', method=method)
+    assert hash_prefix(method).startswith(stored)
+    assert not needs_rehash(pwhash, method)
+
+
+@pytest.mark.parametrize('old, new', [
+    ('pbkdf2:sha256:1000', 'scrypt'),
+    ('scrypt:16384:8:1', 'scrypt:32768:8:1'),
+    ('pbkdf2:sha256:1000', 'pbkdf2:sha256:2000'),
+    ('scrypt', 'pbkdf2:sha256'),
+])
+def test_other_method_or_parameters_need_rehash(old, new):
+    assert needs_rehash(generate_password_hash('secret', method=old), new)
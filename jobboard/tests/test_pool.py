@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def pool(jobboard):
+    return jobboard.ConnectionPool(jobboard.app.config['DATABASE'], 2)
+
+
+def test_connections_are_reused_and_tuned(pool):
+    conn = pool.acquire()
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+
+def test_release_rolls_back_and_discard_closes(pool):
+    conn = pool.acquire()
+    conn.execute("INSERT INTO users (username, password) VALUES ('tmp', 'x')")
+    pool.release(conn)
+    assert conn.execute("SELECT COUNT(*) FROM users WHERE username = 'tmp'").fetchone()[0] == 0
+    conn = pool.acquire()
+    pool.release(conn, discard=True)
+    assert pool.acquire() is not conn
+
+
+def test_acquire_times_out_when_exhausted(jobboard, pool):
+    held = [pool.acquire(), pool.acquire()]
+    with pytest.raises(jobboard.PoolTimeout):
+        pool.acquire(timeout=0.05)
+    pool.release(held.pop())
+    pool.release(pool.acquire(timeout=0.05))
+
+
+def test_stream_pool_is_read_only(jobboard):
+    pool = jobboard.get_stream_pool()
+    conn = pool.acquire()
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0] == 5
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM jobs")
+    finally:
+        pool.release(conn)
+
+
+def test_page_is_503_when_pool_is_exhausted(jobboard, client):
+    jobboard.app.config.update(DB_POOL_SIZE=1, DB_POOL_TIMEOUT=0.05)
+    pool = jobboard.get_pool()
+    conn = pool.acquire()
+    try:
+        assert client.get('/job/1').status_code == 503
+    finally:
+        pool.release(conn)
+    assert client.get('/job/1').status_code == 200
+
+
+def test_stalled_streams_use_their_own_pool(jobboard, client):
+    jobboard.app.config.update(DB_POOL_SIZE=1, STREAM_POOL_SIZE=2, STREAM_POOL_TIMEOUT=0.05)
+    streams = [client.get('/api/jobs?format=ndjson', buffered=False) for _ in range(2)]
+    try:
+        for response in streams:
+            assert response.status_code == 200
+            next(iter(response.response))  # клиент прочитал начало и «завис»
+        assert client.get('/api/jobs?format=ndjson').status_code == 503
+        assert client.get('/profile/employer1').status_code == 200
+        assert client.get('/job/1').status_code == 200
+    finally:
+        for response in streams:
+            response.close()
+    assert len(client.get('/api/jobs?format=ndjson').get_data(as_text=True).splitlines()) == 5
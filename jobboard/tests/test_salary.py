@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schema import parse_salary  # noqa: E402
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('от 170 ₽/ч', (170, None, 'RUB', 'hour')),
+    ('50 000–80 000 ₽', (50000, 80000, 'RUB', 'month')),
+    ('80-120 тыс.', (80000, 120000, 'RUB', 'month')),
+    ('до 100к', (None, 100000, 'RUB', 'month')),
+    ('$3000-4000', (3000, 4000, 'USD', 'month')),
+    ('60000', (60000, 60000, 'RUB', 'month')),
+    ('по договорённости', (None, None, None, None)),
+    # график работы перед суммой — не зарплата
+    ('5/2, 60 000 ₽', (60000, 60000, 'RUB', 'month')),
+    ('график 2/2, 80 000 ₽', (80000, 80000, 'RUB', 'month')),
+    ('опыт 3 года, 90 000', (90000, 90000, 'RUB', 'month')),
+    ('смена 12 часов, 2500 в день', (2500, 2500, 'RUB', 'day')),
+])
+def test_parse_salary(text, expected):
+    assert parse_salary(text) == expected
+
+
+def test_schedule_alone_is_not_a_salary():
+    assert parse_salary('график 5/2') == (None, None, None, None)
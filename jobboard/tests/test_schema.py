@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema  # noqa: E402
+
+
+def quiet(*args):
+    pass
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def make_db(path, version):
+    conn = connect(path)
+    schema.migrate(conn, target=version, log=quiet)
+    return conn
+
+
+def test_migrate_from_baseline(tmp_path):
+    conn = make_db(str(tmp_path / 'jobs.db'), 1)
+    conn.execute("INSERT INTO users (username, password) VALUES ('u', 'x')")
+    conn.execute("INSERT INTO jobs (author_id, title, description, tags, salary) "
+                 "VALUES (1, 'Python developer', 'Flask', 'python,flask', '80-120 тыс.')")
+    conn.execute("INSERT INTO responses (job_id, user_id, text) VALUES (1, 1, 'hi')")
+    conn.commit()
+    assert schema.migrate(conn, log=quiet) == schema.LATEST_VERSION
+    assert schema.pending_migrations(conn) == []
+    job = conn.execute('SELECT * FROM jobs').fetchone()
+    assert (job['salary_min'], job['salary_max'], job['response_count']) == (80000, 120000, 1)
+    assert [r[0] for r in conn.execute('SELECT tag FROM job_tags ORDER BY tag')] == ['flask', 'python']
+    assert conn.execute("SELECT rowid FROM jobs_fts WHERE jobs_fts MATCH 'python'").fetchall()
+    # повторный запуск ничего не делает
+    assert schema.migrate(conn, log=quiet) == schema.LATEST_VERSION
+
+
+def test_online_upgrade_defers_vacuum_but_applies_later_migrations(tmp_path):
+    conn = make_db(str(tmp_path / 'jobs.db'), 9)
+    conn.execute("INSERT INTO users (username, password) VALUES ('u', 'x')")
+    # так старый парсер разбирал «график 5/2»
+    conn.execute("INSERT INTO jobs (author_id, title, description, salary, salary_min, salary_max, "
+                 "salary_currency, salary_period) VALUES (1, 't', 'd', 'график 5/2', 5, 2, 'RUB', 'month')")
+    conn.commit()
+
+    assert schema.migrate(conn, log=quiet, offline=False) == schema.LATEST_VERSION
+    job = conn.execute('SELECT salary_min, salary_max, salary_currency, salary_period FROM jobs').fetchone()
+    assert tuple(job) == (None, None, None, None)
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2
+    assert [m[0] for m in schema.pending_migrations(conn)] == [10]
+    # при следующем старте отложенная миграция снова не применяется
+    assert schema.migrate(conn, log=quiet, offline=False) == schema.LATEST_VERSION
+    assert schema.deferred_migrations(conn) == {10}
+
+    # `flask db-upgrade`
+    assert schema.migrate(conn, log=quiet) == schema.LATEST_VERSION
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    assert schema.pending_migrations(conn) == []
+
+
+def test_startup_upgrade_of_unversioned_baseline(tmp_path):
+    # БД из версии до миграций: таблицы есть, user_version = 0
+    conn = connect(str(tmp_path / 'jobs.db'))
+    for sql in schema.BASE_SCHEMA:
+        conn.execute(sql)
+    conn.execute("INSERT INTO users (username, password, is_employer) VALUES ('e', 'x', 1)")
+    conn.executemany("INSERT INTO jobs (author_id, title, description, tags) VALUES (1, ?, 'd', 'python')",
+                     [(f'job {i}',) for i in range(10)])
+    conn.commit()
+    assert schema.schema_version(conn) == 0
+
+    assert schema.migrate(conn, log=quiet, offline=False) == schema.LATEST_VERSION
+    indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_jobs_created_id', 'idx_responses_job', 'idx_jobs_author'} <= indexes
+    assert conn.execute("SELECT n FROM tag_counts WHERE tag = 'python'").fetchone()[0] == 10
+    assert conn.execute('SELECT COUNT(*) FROM job_changes').fetchone()[0] == 10
+    assert schema.deferred_migrations(conn) == {10}
+
+
+def test_schema_newer_than_code_is_refused(tmp_path):
+    conn = make_db(str(tmp_path / 'jobs.db'), schema.LATEST_VERSION)
+    conn.execute(f'PRAGMA user_version = {schema.LATEST_VERSION + 1}')
+    with pytest.raises(schema.SchemaTooNew):
+        schema.migrate(conn, log=quiet)
@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema  # noqa: E402
+import similar  # noqa: E402
+
+JOBS = [
+    ('Python developer', 'Backend on Flask and Django', 'python,flask'),
+    ('Python backend engineer', 'Flask APIs, SQLite', 'python,flask'),
+    ('Barista', 'Coffee shop, flexible hours', 'coffee'),
+]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'jobs.db'))
+    schema.migrate(conn, log=lambda *a: None)
+    conn.execute("INSERT INTO users (username, password) VALUES ('u', 'x')")
+    conn.executemany("INSERT INTO jobs (author_id, title, description, tags) VALUES (1, ?, ?, ?)", JOBS)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_build_sync_and_query(conn, tmp_path):
+    root = str(tmp_path / 'index')
+    similar.build(conn, root, log=lambda *a: None)
+    index = similar.SimilarIndex(root, log=lambda *a: None)
+    index.sync(conn)
+    assert [job for job, _ in index.query(1)][0] == 2
+
+    conn.execute("INSERT INTO jobs (author_id, title, description, tags) "
+                 "VALUES (1, 'Senior Python developer', 'Flask backend', 'python,flask')")
+    conn.execute('DELETE FROM jobs WHERE id = 2')
+    conn.commit()
+    index.sync(conn)
+    ranked = [job for job, _ in index.query(1)]
+    assert 2 not in ranked and ranked[0] == 4
+
+
+def test_failed_sync_keeps_previous_snapshot(conn, tmp_path, monkeypatch):
+    root = str(tmp_path / 'index')
+    similar.build(conn, root, log=lambda *a: None)
+    index = similar.SimilarIndex(root, log=lambda *a: None)
+    index.sync(conn)
+    version, df = index.version, index._state.df.copy()
+
+    conn.execute('DELETE FROM jobs WHERE id = 3')
+    conn.execute("INSERT INTO jobs (author_id, title, description, tags) VALUES (1, 'Cook', 'Kitchen', 'food')")
+    conn.commit()
+
+    def broken(*args):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(similar, 'vectorize', broken)
+    with pytest.raises(RuntimeError):
+        index.sync(conn)
+    assert index.version == version
+    assert np.array_equal(index._state.df, df)
+
+    monkeypatch.undo()
+    index.sync(conn)
+    assert index.version != version
+    assert index._state.n_docs == 3
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+import suggest
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def index(jobboard):
+    path = jobboard.app.config['DATABASE']
+    index = suggest.SuggestIndex(lambda: jobboard.open_connection(path), refresh_interval=0.05,
+                                 log=lambda *a: None)
+    wait_for(lambda: index.ready)
+    yield index
+    index.close()
+
+
+def texts(index, q):
+    return [text for text, _ in index.lookup(q)]
+
+
+def test_prefix_of_any_word(index):
+    assert sorted(index.lookup('бари')) == [('Бариста (подработка)', 'title'), ('бариста', 'tag')]
+    assert 'Python-разработчик (удалённо)' in texts(index, 'удал')
+    assert ('python', 'tag') in index.lookup('pyth')
+    assert index.lookup('') == [] and index.lookup('zzz') == []
+
+
+def test_follows_inserts_and_deletes(index, db):
+    db.execute("INSERT INTO jobs (author_id, title, description) VALUES (1, 'Сварщик НАКС', 'd')")
+    db.execute('DELETE FROM responses WHERE job_id = 2')
+    db.execute('DELETE FROM jobs WHERE id = 2')
+    db.commit()
+    index.refresh_soon()
+    wait_for(lambda: texts(index, 'свар'))
+    assert texts(index, 'свар') == ['Сварщик НАКС']
+    assert texts(index, 'курь') == []  # и название, и тег «курьер» без вакансий
+
+
+def test_api_suggest(jobboard, client):
+    wait_for(lambda: jobboard.get_suggest_index().ready)
+    response = client.get('/api/suggest?q=Бари&limit=1')
+    assert response.get_json() == {'q': 'Бари', 'suggestions': [{'text': 'Бариста (подработка)', 'kind': 'title'}]}
+    assert 'public' in response.headers['Cache-Control']
+    assert client.get('/api/suggest?q=x&limit=abc').status_code == 400
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def writer(jobboard):
+    writer = jobboard.GroupCommitWriter(jobboard.app.config['DATABASE'], batch_size=16, delay=0.01, queue_size=100)
+    yield writer
+    writer.close()
+
+
+def insert_user(name):
+    def run(conn):
+        return conn.execute("INSERT INTO users (username, password) VALUES (?, 'x')", (name,)).lastrowid
+    return run
+
+
+def test_concurrent_writes_are_all_committed(writer, db):
+    results = {}
+
+    def submit(i):
+        results[i] = writer.submit(insert_user(f'user{i}'), timeout=5)
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(40)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(results.values())) == 40
+    assert db.execute("SELECT COUNT(*) FROM users WHERE username LIKE 'user%'").fetchone()[0] == 40
+
+
+def test_failed_operation_rolls_back_only_itself(writer, db):
+    def broken(conn):
+        conn.execute("INSERT INTO users (username, password) VALUES ('half', 'x')")
+        raise ValueError('boom')
+    writer.submit(insert_user('before'), timeout=5)
+    with pytest.raises(ValueError):
+        writer.submit(broken, timeout=5)
+    writer.submit(insert_user('after'), timeout=5)
+    names = {r[0] for r in db.execute('SELECT username FROM users')}
+    assert {'before', 'after'} <= names and 'half' not in names
+
+
+def test_constraint_error_reaches_the_caller(jobboard, writer):
+    with pytest.raises(jobboard.sqlite3.IntegrityError):
+        writer.submit(insert_user('employer1'), timeout=5)
+
+
+def test_routes_write_through_the_writer(jobboard, client, login, db):
+    jobboard.app.config['DB_WRITER'] = True
+    login('worker1')
+    client.post('/respond/2', data={'text': 'через писателя'})
+    assert db.execute("SELECT COUNT(*) FROM responses WHERE text = 'через писателя'").fetchone()[0] == 1
+    assert jobboard._writer is not None